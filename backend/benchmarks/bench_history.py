@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark conversation history memory and per-turn overhead.
+
+Compares the original representation (a list of per-message dicts,
+copied into a new `messages` list every turn, with context size summed
+over every message) against ChatSession's compact MessageNode store.
+Message text is identical in both, so memory is reported as overhead
+per message on top of the text itself.
+
+Run from anywhere:
+    python3 backend/benchmarks/bench_history.py [message_count]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from core.history import ConversationTree  # noqa: E402
+from core.logger import ChatLogger  # noqa: E402
+
+SYSTEM_MESSAGE = {"role": "system", "content": "# Persona\nYou are a helpful assistant.\n" * 20}
+REPEATS = 50
+
+
+def make_contents(count: int) -> list[tuple[str, str]]:
+    """Return (role, content) pairs resembling a long chat session."""
+    pairs = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        pairs.append((role, f"message {i} " * 12))
+    return pairs
+
+
+def measure_overhead(build, contents) -> float:
+    """Return bytes per message allocated by build(), excluding the text."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build(contents)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current / len(contents)
+
+
+def build_dict_history(contents):
+    return [{"role": role, "content": content} for role, content in contents]
+
+
+def build_tree_history(contents):
+    tree = ConversationTree()
+    for role, content in contents:
+        tree.append(role, content)
+    tree.nodes()
+    return tree
+
+
+def dict_turn(history):
+    """Per-turn work in the original code: payload plus context size."""
+    messages = [SYSTEM_MESSAGE]
+    messages.extend(history)
+    context_chars = sum(len(m["content"]) for m in messages)
+    return messages, context_chars
+
+
+def tree_turn(tree):
+    """Per-turn work with the node store: payload plus context size."""
+    messages = [SYSTEM_MESSAGE]
+    messages.extend(tree.nodes())
+    context_tokens = tree.token_count()
+    return messages, context_tokens
+
+
+def dict_render(history, logger):
+    """Log and markdown rendering in the original code."""
+    log_text = "\n".join(f"{m['role'].capitalize()}:\n{m['content']}\n" for m in history)
+    return log_text, logger.format_conversation(history)
+
+
+def tree_render(tree, logger):
+    """Log and markdown rendering with the node store."""
+    nodes = tree.nodes()
+    return "\n".join(node.as_text() for node in nodes), logger.format_conversation(nodes)
+
+
+def time_ms(func, *args) -> float:
+    """Return average milliseconds per call over REPEATS calls."""
+    func(*args)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / REPEATS
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    logger = ChatLogger(".")
+    contents = make_contents(count)
+
+    rows = [
+        (
+            "Overhead per message (B)",
+            measure_overhead(build_dict_history, contents),
+            measure_overhead(build_tree_history, contents),
+        )
+    ]
+
+    history = build_dict_history(contents)
+    tree = build_tree_history(contents)
+    rows.append(("Per-turn payload (ms)", time_ms(dict_turn, history), time_ms(tree_turn, tree)))
+    rows.append(("Log + markdown (ms)", time_ms(dict_render, history, logger), time_ms(tree_render, tree, logger)))
+
+    print(f"Messages: {count}")
+    print(f"{'':<26}{'list of dicts':>16}{'MessageNode':>16}")
+    for label, before, after in rows:
+        print(f"{label:<26}{before:>16.2f}{after:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Startup-time regression benchmark.
+
+Launches fresh interpreters and reports the median of several runs for:
+    - interpreter    : `python -c pass` (baseline, subtracted below)
+    - import main    : importing main.py, over the baseline
+    - first prompt   : `main.py --startup-benchmark` until the first prompt
+                       could be shown (banner printed, prompt_toolkit
+                       loaded), over the baseline
+    - one-shot mode  : the modules the --prompt path imports (main and
+                       core.client), over the baseline
+
+The in-process figures printed by --startup-benchmark (import time, time
+to prompt and when the background default prompt finished) are shown
+too. The script exits with status 1 if a median exceeds its budget.
+
+Run from anywhere:
+    python3 backend/benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+BUDGETS_MS = {
+    "import main": 100,
+    "first prompt": 250,
+    "one-shot mode": 100,
+}
+
+
+def wall_ms(args) -> tuple[float, str]:
+    """Run a command in SRC and return (elapsed ms, stdout)."""
+    start = time.perf_counter()
+    result = subprocess.run(args, cwd=SRC, capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) * 1000, result.stdout
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    python = sys.executable
+    commands = {
+        "interpreter": [python, "-c", "pass"],
+        "import main": [python, "-c", "import main"],
+        "first prompt": [python, "main.py", "--startup-benchmark"],
+        "one-shot mode": [python, "-c", "import main, core.client"],
+    }
+
+    samples = {name: [] for name in commands}
+    reports = []
+    for _ in range(runs):
+        for name, args in commands.items():
+            elapsed, stdout = wall_ms(args)
+            samples[name].append(elapsed)
+            if name == "first prompt":
+                reports.append(json.loads(stdout.strip().splitlines()[-1]))
+
+    baseline = statistics.median(samples["interpreter"])
+    print(f"Runs: {runs}   interpreter baseline: {baseline:.1f} ms")
+    print(f"{'':<16}{'median':>10}{'budget':>10}")
+
+    failed = False
+    for name in BUDGETS_MS:
+        value = statistics.median(samples[name]) - baseline
+        budget = BUDGETS_MS[name]
+        status = "" if value <= budget else "  OVER BUDGET"
+        failed = failed or value > budget
+        print(f"{name:<16}{value:>9.1f}ms{budget:>8}ms{status}")
+
+    print()
+    for key in ("imports_ms", "to_prompt_ms", "defaults_ready_ms"):
+        print(f"{key:<20}{statistics.median(r[key] for r in reports):>8.1f} ms (in process)")
+    print(f"{'modules loaded':<20}{reports[-1]['modules']:>8}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
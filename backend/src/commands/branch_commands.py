@@ -0,0 +1,156 @@
+"""Conversation branching command handlers.
+
+These helpers implement the flows for:
+    - /turns              : list the user turns on the active branch
+    - /fork <k> [name]    : branch off after turn k
+    - /edit <k>           : re-ask user turn k with new text on a new branch
+    - /branch [name]      : list branches, or switch to one
+    - /branch_delete name : forget a branch
+    - /save               : save the active branch through ChatLogger
+
+Branches share their common prefix (see core.history), so forking is
+cheap no matter how long the conversation is. Turns are numbered from
+the start of the conversation, including turns spilled to disk.
+"""
+
+from utils.ui import (
+    print_success,
+    print_error,
+    print_warning,
+    print_section_header,
+    get_user_input,
+)
+
+
+def _preview(text: str, width: int = 60) -> str:
+    """Return the first line of text, shortened to width characters."""
+    line = text.strip().splitlines()[0] if text.strip() else ""
+    return line if len(line) <= width else line[: width - 3] + "..."
+
+
+def handle_turns(chat) -> None:
+    """Handle /turns: list user turns on the active branch with numbers."""
+    turns = chat.history.user_turns()
+    offset = chat.history.spilled_turns()
+    if not turns and not offset:
+        print_warning("No turns on this branch yet.")
+        return
+
+    print_section_header(f"Turns on branch '{chat.history.active}'")
+    if offset:
+        print(f"(turns 1-{offset} are on disk; see /h_search)")
+    for index, node in enumerate(turns, start=offset + 1):
+        print(f"{index}. {_preview(node.content)}")
+
+
+def handle_fork(chat, args: str) -> None:
+    """Handle /fork <k> [name]: branch the conversation after turn k."""
+    parts = args.split(maxsplit=1)
+    if not parts or not parts[0].isdigit():
+        print_error("Usage: /fork [turn_number] [branch_name]")
+        return
+
+    name = parts[1].strip() if len(parts) > 1 else None
+    try:
+        branch = chat.history.fork(int(parts[0]), name)
+    except ValueError as e:
+        print_error(str(e))
+        return
+
+    print_success(f"Forked after turn {parts[0]} into branch '{branch}'.")
+
+
+def handle_edit(chat, args: str) -> str | None:
+    """Handle /edit <k>: replace user turn k on a new branch.
+
+    The original prompt is shown, the user enters the new text, and a
+    branch is started just before turn k. The new text is returned so
+    the caller sends it to the model as a normal prompt.
+
+    Returns:
+        The edited prompt to send, or None if editing was cancelled.
+    """
+    if not args.isdigit():
+        print_error("Usage: /edit [turn_number]")
+        return None
+
+    turns = chat.history.user_turns()
+    offset = chat.history.spilled_turns()
+    turn = int(args)
+    if not offset < turn <= offset + len(turns):
+        if turns:
+            print_error(f"Turn must be between {offset + 1} and {offset + len(turns)}.")
+        else:
+            print_error("No turns in memory to edit.")
+        return None
+
+    print("Original prompt:")
+    print("-" * 50)
+    print(turns[turn - offset - 1].content)
+    print("-" * 50)
+
+    new_prompt = get_user_input("\nEdited prompt:\n")
+    if not new_prompt:
+        print_warning("Edit cancelled.")
+        return None
+
+    branch, _ = chat.history.edit(turn)
+    print_success(f"Editing turn {turn} on new branch '{branch}'.")
+    return new_prompt
+
+
+def handle_branch(chat, args: str) -> None:
+    """Handle /branch [name]: list branches or switch to one."""
+    name = args.strip()
+    if name:
+        try:
+            chat.history.switch(name)
+        except KeyError:
+            print_error(f"Branch '{name}' not found.")
+            return
+        print_success(f"Switched to branch '{name}' ({len(chat.history)} messages).")
+        return
+
+    print_section_header("Branches")
+    for branch, count, active in chat.history.list_branches():
+        marker = "*" if active else " "
+        print(f"{marker} {branch} ({count} messages)")
+
+
+def handle_branch_delete(chat, args: str) -> None:
+    """Handle /branch_delete <name>: remove a branch that is not active."""
+    name = args.strip()
+    if not name:
+        print_error("Usage: /branch_delete [branch_name]")
+        return
+
+    try:
+        chat.history.delete_branch(name)
+    except KeyError:
+        print_error(f"Branch '{name}' not found.")
+        return
+    except ValueError as e:
+        print_error(str(e))
+        return
+
+    print_success(f"Deleted branch '{name}'.")
+
+
+def handle_save(retriever, chat, logger) -> None:
+    """Handle /save: write the active branch to a new chat file.
+
+    Spilled messages are streamed from disk, so the full branch is saved
+    without loading it back into memory.
+    """
+    if not chat.history.nodes() and not chat.spilled_count():
+        print_warning("Nothing to save on this branch.")
+        return
+
+    subject = chat.current_subject or retriever.default_subject
+    try:
+        path = logger.save_chat(subject, chat.iter_full_history())
+    except FileNotFoundError as e:
+        print_error(f"Error: {e}")
+        return
+
+    print_success(f"Saved branch '{chat.history.active}' to {path.name} in '{subject}'.")
@@ -5,11 +5,18 @@ chat session and its stored conversations, including:
 
     - /status        : Show current persona, subject, and model info
     - /clear         : Clear in-memory conversation history
+    - /fresh         : Re-ask the last prompt, skipping the response caches
+    - /compare       : Ask several models the same prompt side by side
+    - /regenerate    : Replace the last answer with one of n new candidates
+    - /h_search      : Search the whole conversation, spilled turns included
+    - /window        : Show or set the in-memory history window
     - /c_history     : List and preview chats across all subjects
     - /c_history_<s> : List and preview chats for a specific subject
     - /c_delete      : Delete a chat by index
     - /c_move        : Move a chat between subjects
+    - /swap          : Switch between llama3 and qwen2.5-coder
     - /pref_streaming: Toggle streaming preference
+    - /render        : Streaming frame rate and markdown styling
     - /exit          : Exit the application cleanly
 
 These functions are invoked by CommandHandler and interact with
@@ -24,6 +31,7 @@ from utils.ui import (
     print_warning,
     print_section_header,
     get_confirmation,
+    get_user_input,
     display_chat_history,
 )
 
@@ -43,7 +51,11 @@ def handle_status(chat, text_streaming: bool) -> None:
     print(f"Persona: {persona}")
     print(f"Subject: {subject}")
     print(f"Model:   {model}")
+    router = getattr(chat, "router", None)
+    if router is not None:
+        print(f"Routing: {router.small_model} -> {router.large_model}")
     print(f"Streaming: {'on' if text_streaming else 'off'}")
+    print(f"Messages: {len(chat.history.nodes())} in memory, {chat.spilled_count()} on disk")
 
 
 def handle_clear_history(chat) -> None:
@@ -56,7 +68,198 @@ def handle_clear_history(chat) -> None:
     print_success("Conversation history cleared.")
 
 
-def _select_chat_from_list(chats):
+def handle_fresh(chat) -> str | None:
+    """Handle /fresh: drop the last exchange and re-send its prompt uncached.
+
+    Args:
+        chat: ChatSession whose last prompt should be regenerated.
+
+    Returns:
+        The prompt to send again, or None if there is nothing to redo.
+    """
+    prompt = chat.pop_last_exchange()
+    if prompt is None:
+        print_warning("No previous prompt to regenerate.")
+        return None
+
+    chat.skip_cache_once = True
+    chat.last_cache_hit = None
+    print_success("Generating a fresh answer.")
+    return prompt
+
+
+def _format_metrics(metrics) -> str:
+    """Format TTFT/throughput figures for a compare or regenerate result."""
+    if not metrics:
+        return ""
+    ttft = f"{metrics['ttft']:.2f}s" if metrics["ttft"] is not None else "n/a"
+    return (
+        f"TTFT {ttft}, total {metrics['duration']:.2f}s, "
+        f"{metrics['tokens']} tokens @ {metrics['tokens_per_s']:.1f} tok/s"
+    )
+
+
+def _print_candidate(index: int, label: str, result) -> None:
+    """Print one finished candidate answer with its metrics."""
+    print_section_header(f"[{index}] {label}")
+    if result["error"]:
+        print_error(result["error"])
+        return
+    print(result["response"])
+    print(f"\n({_format_metrics(result['metrics'])})")
+
+
+def _choose_candidate(results) -> dict | None:
+    """Ask the user which successful result to keep."""
+    if len(results) == 1 and not results[0]["error"]:
+        return results[0] if get_confirmation("\nKeep this answer?") else None
+
+    choice = input("\nKeep which answer? (number, or Enter to discard all): ").strip()
+    if not choice:
+        print_warning("No answer kept.")
+        return None
+    if not choice.isdigit() or not (1 <= int(choice) <= len(results)):
+        print_error("Invalid selection. No answer kept.")
+        return None
+
+    selected = results[int(choice) - 1]
+    if selected["error"]:
+        print_error("That model failed. No answer kept.")
+        return None
+    return selected
+
+
+def handle_compare(chat, args: str) -> None:
+    """Handle /compare: send one prompt to several models concurrently.
+
+    Format: /compare model_a model_b [...]
+
+    The user is asked for the prompt, every model receives the same
+    system prompt and history, and each answer is printed as soon as its
+    model finishes along with TTFT and tokens/s. The chosen answer (if
+    any) is then added to conversation history.
+
+    Args:
+        chat: ChatSession providing system prompt, history, and options.
+        args: Model names after the command.
+    """
+    models = list(dict.fromkeys(args.split()))
+    if len(models) < 2:
+        print_error("Usage: /compare model_a model_b [...]")
+        return
+
+    prompt = get_user_input("\nCompare prompt:\n")
+    if not prompt:
+        print_warning("Compare cancelled.")
+        return
+
+    print(f"\nSending to {', '.join(models)}...")
+    results = chat.compare(
+        prompt,
+        models,
+        on_result=lambda i, result: _print_candidate(i + 1, result["label"], result),
+    )
+
+    selected = _choose_candidate(results)
+    if selected is not None:
+        chat.keep_exchange(prompt, selected["response"])
+        print_success(f"Kept answer from {selected['model']}.")
+
+
+def handle_regenerate(chat, args: str) -> None:
+    """Handle /regenerate [n]: sample n new answers to the last prompt.
+
+    The last assistant reply is dropped (the user prompt is not re-sent
+    or duplicated), n candidates are generated concurrently with
+    different seeds/temperatures, and each is shown as it finishes. The
+    chosen candidate replaces the old reply; if none is chosen, the old
+    reply is restored.
+
+    Args:
+        chat: ChatSession to regenerate in.
+        args: Optional candidate count (default 2, max 8).
+    """
+    if args and not args.isdigit():
+        print_error("Usage: /regenerate [n]")
+        return
+
+    n = int(args) if args else 2
+    if not 1 <= n <= 8:
+        print_error("Number of candidates must be between 1 and 8.")
+        return
+
+    print(f"\nGenerating {n} candidate{'s' if n > 1 else ''} with {chat.model}...")
+    results, dropped = chat.regenerate(
+        n,
+        on_result=lambda i, result: _print_candidate(i + 1, result["label"], result),
+    )
+    if results is None:
+        print_warning("No previous prompt to regenerate.")
+        return
+
+    selected = _choose_candidate(results)
+    if selected is not None:
+        chat.add_message("assistant", selected["response"])
+        print_success("Kept the selected answer.")
+    elif dropped is not None:
+        chat.add_message("assistant", dropped)
+        print_warning("Restored the previous answer.")
+
+
+def handle_history_search(chat, query: str) -> None:
+    """Handle /h_search <text>: find messages on the active branch.
+
+    Spilled messages are searched lazily from the on-disk segment, so this
+    works for sessions far larger than the in-memory window.
+
+    Args:
+        chat: ChatSession to search.
+        query: Text to look for (case-insensitive).
+    """
+    if not query:
+        print_error("Usage: /h_search [text]")
+        return
+
+    matches = chat.search_history(query)
+    if not matches:
+        print_warning(f"No messages contain '{query}'.")
+        return
+
+    print_section_header(f"Messages containing '{query}'")
+    for number, role, content in matches:
+        line = content.strip().splitlines()[0] if content.strip() else ""
+        print(f"#{number} {role.capitalize()}: {line[:70]}")
+
+
+def handle_window(chat, args: str) -> None:
+    """Handle /window [n|off]: show or change the in-memory history window.
+
+    Args:
+        chat: ChatSession whose window is changed.
+        args: New window size in messages, "off", or empty to show it.
+    """
+    args = args.strip().lower()
+    if not args:
+        window = chat.window_messages or "off"
+        print(f"Window: {window} ({len(chat.history.nodes())} in memory, {chat.spilled_count()} on disk)")
+        return
+
+    if args == "off":
+        chat.set_window(None)
+        print_success("History window disabled; new messages stay in memory.")
+        return
+
+    if not args.isdigit() or int(args) < 4:
+        print_error("Usage: /window [n|off] (n >= 4)")
+        return
+
+    if chat.set_window(int(args)):
+        print_success(f"History window set to {args} messages.")
+    else:
+        print_error("Spilling is not configured for this session.")
+
+
+def _select_chat_from_list(chats, catalog=None, subject_name=None):
     """Helper to let the user pick a chat from a list by index.
 
     Args:
@@ -64,6 +267,9 @@ def _select_chat_from_list(chats):
                (subject_name, chat_filename, file_path)
                For /c_history_<subject> this is:
                (chat_filename, file_path)
+        catalog: Optional ChatCatalog; generated titles are shown when
+               available.
+        subject_name: Subject of the chats in the two-element form.
 
     Returns:
         The selected tuple from `chats`, or None if selection was cancelled
@@ -75,11 +281,14 @@ def _select_chat_from_list(chats):
 
     for idx, entry in enumerate(chats, start=1):
         if len(entry) == 3:
-            subject_name, chat_filename, _ = entry
-            print(f"{idx}. [{subject_name}] {chat_filename}")
+            entry_subject, chat_filename, _ = entry
+            line = f"{idx}. [{entry_subject}] {chat_filename}"
         else:
+            entry_subject = subject_name
             chat_filename, _ = entry
-            print(f"{idx}. {chat_filename}")
+            line = f"{idx}. {chat_filename}"
+        title = catalog.title(entry_subject, chat_filename) if catalog is not None else None
+        print(f"{line} - {title}" if title else line)
 
     choice = input("\nEnter number to view (or press Enter to cancel): ").strip()
     if not choice:
@@ -111,7 +320,7 @@ def handle_chat_history(retriever, chat) -> None:
     """
     print_section_header("All Chats")
     chats = retriever.list_all_chats()
-    selected = _select_chat_from_list(chats)
+    selected = _select_chat_from_list(chats, retriever.catalog)
     if not selected:
         return
 
@@ -140,7 +349,7 @@ def handle_chat_history_by_subject(retriever, chat, subject_name: str) -> None:
 
     print_section_header(f"Chats for subject: {subject_name}")
     chats = retriever.list_chats_by_subject(subject_name)
-    selected = _select_chat_from_list(chats)
+    selected = _select_chat_from_list(chats, retriever.catalog, subject_name)
     if not selected:
         return
 
@@ -180,7 +389,7 @@ def handle_delete_chat(retriever, chat, idx: str) -> None:
         selected = chats[index - 1]
     else:
         print_section_header("Delete Chat")
-        selected = _select_chat_from_list(chats)
+        selected = _select_chat_from_list(chats, retriever.catalog)
         if not selected:
             return
 
@@ -217,7 +426,7 @@ def handle_chat_move(retriever, chat, _unused) -> None:
         return
 
     print_section_header("Move Chat")
-    selected = _select_chat_from_list(chats)
+    selected = _select_chat_from_list(chats, retriever.catalog)
     if not selected:
         return
 
@@ -241,6 +450,72 @@ def handle_chat_move(retriever, chat, _unused) -> None:
         print_error(f"Failed to move chat '{chat_filename}'.")
 
 
+def handle_swap(chat, args: str) -> None:
+    """Handle /swap [model]: change the chat model.
+
+    Formats:
+        /swap           -> toggle llama3 <-> qwen2.5-coder
+        /swap llama3    -> set explicitly
+        /swap qwen      -> set explicitly (short alias)
+
+    Args:
+        chat: ChatSession whose model is changed.
+        args: Text after the command name.
+    """
+    target = args.strip().lower()
+    if not target:
+        new_model = "qwen2.5-coder:32b" if chat.model == "llama3" else "llama3"
+    elif target in ("llama3", "llama"):
+        new_model = "llama3"
+    elif target in ("qwen2.5-coder", "qwen"):
+        new_model = "qwen2.5-coder"
+    else:
+        print("Unknown model. Use: llama3 or qwen2.5-coder.")
+        return
+
+    chat.set_model(new_model)
+
+
+def handle_render(handler, args: str) -> None:
+    """Handle /render: show or change how streamed replies are drawn.
+
+    Formats:
+        /render                -> show the current settings
+        /render fps <n>        -> redraw at most n times per second (0 = every chunk)
+        /render markdown on|off -> style headings, code and bold text
+
+    Args:
+        handler: CommandHandler holding render_fps and render_markdown.
+        args: Text after the command name.
+    """
+    parts = args.lower().split()
+    action = parts[0] if parts else ""
+    value = parts[1] if len(parts) > 1 else ""
+
+    if action == "fps":
+        if not value.isdigit():
+            print_error("Usage: /render fps <n>")
+            return
+        handler.render_fps = int(value)
+        print_success(f"Streaming redraws limited to {value} per second." if handler.render_fps else "Streaming redraws on every chunk.")
+        return
+
+    if action == "markdown":
+        if value not in ("on", "off"):
+            print_error("Usage: /render markdown on|off")
+            return
+        handler.render_markdown = value == "on"
+        print_success(f"Markdown styling {'enabled' if handler.render_markdown else 'disabled'}.")
+        return
+
+    if action:
+        print_error("Usage: /render [fps <n> | markdown on|off]")
+        return
+
+    fps = handler.render_fps or "every chunk"
+    print(f"Render: {fps} fps, markdown {'on' if handler.render_markdown else 'off'}")
+
+
 def handle_streaming_toggle(current_value: bool) -> bool:
     """Toggle the streaming preference and report the new state.
 
@@ -0,0 +1,482 @@
+"""Performance and diagnostics command handlers.
+
+This module contains helpers for commands that inspect or tune how the
+app spends its time, including:
+
+    - /profile on|off|dump : cProfile/tracemalloc hooks around the REPL
+    - /cache               : Opt-in response cache controls and stats
+    - /cache semantic      : Embedding-based cache for paraphrased prompts
+    - /route               : Automatic small/large model routing
+    - /summarize           : Background summaries of old chats and turns
+    - /jobs                : Idle-time background job queue
+    - /gen                 : Per-model generation profiles
+    - /stats               : Token usage and latency per subject/persona/model/day
+
+These functions are invoked by CommandHandler.
+"""
+
+import time
+
+from core.cache import ResponseCache
+from core.router import ModelRouter
+from core.summarizer import Summarizer
+from utils.ui import (
+    print_success,
+    print_error,
+    print_warning,
+    print_section_header,
+)
+
+
+def handle_profile(profiler, args: str) -> None:
+    """Handle /profile: start, stop, or dump the session profiler.
+
+    Formats:
+        /profile on       -> profile turns and command handling
+        /profile on mem   -> same, plus tracemalloc snapshots
+        /profile off      -> stop collecting (data is kept until dumped)
+        /profile dump     -> write pstats/summary files under the data dir
+        /profile          -> show whether profiling is active
+
+    Args:
+        profiler: SessionProfiler owned by the CommandHandler.
+        args: Text after the command name.
+    """
+    parts = args.lower().split()
+    action = parts[0] if parts else ""
+
+    if action == "on":
+        trace_memory = len(parts) > 1 and parts[1] in ("mem", "memory")
+        profiler.start(trace_memory=trace_memory)
+        extra = " with memory tracing" if trace_memory else ""
+        print_success(f"Profiling enabled{extra}. Use '/profile dump' to write results.")
+        return
+
+    if action == "off":
+        profiler.stop()
+        print_success("Profiling disabled.")
+        return
+
+    if action == "dump":
+        written = profiler.dump()
+        if not written:
+            print_warning("Nothing to dump. Use '/profile on' first.")
+            return
+        print_section_header("Profile")
+        for path in written:
+            print(f"• {path}")
+        return
+
+    if action:
+        print_error("Usage: /profile on [mem] | off | dump")
+        return
+
+    state = "on" if profiler.enabled else "off"
+    memory = " (memory tracing)" if profiler.trace_memory else ""
+    print(f"Profiling: {state}{memory}")
+    print(profiler.format_section_times())
+
+
+def handle_cache(retriever, chat, args: str) -> None:
+    """Handle /cache: manage the exact-match response cache.
+
+    Formats:
+        /cache on      -> attach a cache stored under data/cache/responses
+        /cache off     -> detach the caches (entries stay on disk)
+        /cache semantic on [threshold] | off
+                       -> attach or detach the semantic (paraphrase) cache
+        /cache bypass  -> toggle caching for the current subject
+        /cache clear   -> delete all cached responses
+        /cache / stats -> show hit rate and disk usage
+
+    Args:
+        retriever: SubjectRetriever, used to locate the data directory.
+        chat: ChatSession whose response_cache is managed.
+        args: Text after the command name.
+    """
+    action = args.lower().strip()
+
+    if action.startswith("semantic"):
+        _handle_semantic_cache(retriever, chat, action[len("semantic"):].split())
+        return
+
+    if action == "on":
+        if chat.response_cache is None:
+            chat.response_cache = ResponseCache(retriever.basepath / "cache" / "responses")
+        print_success("Response cache enabled.")
+        return
+
+    if action == "off":
+        chat.response_cache = None
+        if chat.semantic_cache is not None:
+            chat.semantic_cache.save()
+        chat.semantic_cache = None
+        print_success("Response cache disabled.")
+        return
+
+    cache = chat.response_cache
+    if cache is None:
+        if action in ("", "stats"):
+            print("Response cache: off (use '/cache on' to enable)")
+            _print_semantic_stats(chat)
+        else:
+            print_warning("Response cache is off. Use '/cache on' first.")
+        return
+
+    if action == "bypass":
+        subject = chat.current_subject or retriever.default_subject
+        if cache.toggle_bypass(subject):
+            print_success(f"Caching bypassed for subject '{subject}'.")
+        else:
+            print_success(f"Caching re-enabled for subject '{subject}'.")
+        return
+
+    if action == "clear":
+        removed = cache.clear()
+        if chat.semantic_cache is not None:
+            chat.semantic_cache.clear()
+        print_success(f"Cleared {removed} cached responses.")
+        return
+
+    if action in ("", "stats"):
+        stats = cache.stats()
+        print_section_header("Response cache")
+        print(f"Hits:      {stats['hits']}")
+        print(f"Misses:    {stats['misses']}")
+        print(f"Bypassed:  {stats['bypassed']}")
+        print(f"Hit rate:  {stats['hit_rate']:.0%}")
+        print(f"Entries:   {stats['entries']} ({stats['bytes'] / 1024:.1f} KiB)")
+        if stats["bypass_subjects"]:
+            print(f"Bypassed subjects: {', '.join(stats['bypass_subjects'])}")
+        _print_semantic_stats(chat)
+        return
+
+    print_error("Usage: /cache on | off | stats | bypass | clear | semantic on [threshold] | semantic off")
+
+
+def _handle_semantic_cache(retriever, chat, parts) -> None:
+    """Handle '/cache semantic on [threshold]' and '/cache semantic off'."""
+    action = parts[0] if parts else ""
+
+    if action == "off":
+        if chat.semantic_cache is not None:
+            chat.semantic_cache.save()
+        chat.semantic_cache = None
+        print_success("Semantic cache disabled.")
+        return
+
+    if action != "on":
+        print_error("Usage: /cache semantic on [threshold] | off")
+        return
+
+    threshold = None
+    if len(parts) > 1:
+        try:
+            threshold = float(parts[1])
+        except ValueError:
+            print_error("Threshold must be a number between 0 and 1.")
+            return
+        if not 0 < threshold <= 1:
+            print_error("Threshold must be a number between 0 and 1.")
+            return
+
+    if chat.semantic_cache is None:
+        try:
+            from core.semantic_cache import SemanticCache
+        except ImportError as e:
+            print_error(f"Semantic cache needs numpy installed ({e}).")
+            return
+        chat.semantic_cache = SemanticCache(retriever.basepath / "cache" / "semantic")
+
+    if threshold is not None:
+        chat.semantic_cache.threshold = threshold
+    print_success(f"Semantic cache enabled (threshold {chat.semantic_cache.threshold:.2f}).")
+
+
+def _print_semantic_stats(chat) -> None:
+    """Print semantic cache counters, if the semantic cache is attached."""
+    semantic = chat.semantic_cache
+    if semantic is None:
+        return
+    stats = semantic.stats()
+    print(
+        f"Semantic:  {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%}), {stats['entries']} entries, "
+        f"threshold {stats['threshold']:.2f}, model {stats['embed_model']}"
+    )
+
+
+def handle_route(chat, args: str) -> None:
+    """Handle /route: manage automatic small/large model routing.
+
+    Formats:
+        /route on [small] [large] -> route each prompt automatically
+        /route off                -> go back to the /swap model
+        /route set <name> <value> -> tune a threshold (see /route stats)
+        /route / stats            -> per-route counts and latencies
+
+    Args:
+        chat: ChatSession whose router is managed.
+        args: Text after the command name.
+    """
+    parts = args.split()
+    action = parts[0].lower() if parts else ""
+
+    if action == "on":
+        if chat.router is None:
+            chat.router = ModelRouter()
+        if len(parts) > 1:
+            chat.router.small_model = parts[1]
+        if len(parts) > 2:
+            chat.router.large_model = parts[2]
+        print_success(
+            f"Routing enabled: {chat.router.small_model} (small) -> {chat.router.large_model} (large)."
+        )
+        return
+
+    if action == "off":
+        chat.router = None
+        print_success(f"Routing disabled. Using model: {chat.model}")
+        return
+
+    router = chat.router
+    if router is None:
+        print("Routing: off (use '/route on' to enable)")
+        return
+
+    if action == "set":
+        if len(parts) != 3 or parts[1] not in ModelRouter.TUNABLE or not parts[2].isdigit():
+            print_error(f"Usage: /route set <{'|'.join(ModelRouter.TUNABLE)}> <number>")
+            return
+        setattr(router, parts[1], int(parts[2]))
+        print_success(f"{parts[1]} set to {parts[2]}.")
+        return
+
+    if action in ("", "stats"):
+        print_section_header("Routing")
+        print(f"Small model: {router.small_model}")
+        print(f"Large model: {router.large_model}")
+        for name in ModelRouter.TUNABLE:
+            print(f"{name}: {getattr(router, name)}")
+        print()
+        print(router.format_stats())
+        return
+
+    print_error("Usage: /route on [small] [large] | off | stats | set <name> <value>")
+
+
+def handle_summarize(retriever, chat, args: str, idle=None, scheduler=None) -> None:
+    """Handle /summarize: manage background summarization of old history.
+
+    Formats:
+        /summarize on [model]  -> summarize old chat logs and spilled turns
+        /summarize off         -> include old chat logs verbatim again
+        /summarize model <m>   -> model used for new summaries
+        /summarize             -> show summarizer status
+
+    Args:
+        retriever: SubjectRetriever whose prompt building uses summaries.
+        chat: ChatSession whose spilled turns are summarized.
+        args: Text after the command name.
+        idle: Idle event shared with the JobScheduler, if any.
+        scheduler: JobScheduler that queues summaries for every subject
+            in idle time when summarization is turned on.
+    """
+    parts = args.split()
+    action = parts[0].lower() if parts else ""
+
+    if action == "on":
+        if chat.summarizer is None:
+            chat.summarizer = Summarizer(retriever.basepath / "cache" / "summaries", idle=idle)
+            chat.summarizer.profiles = chat.profiles
+            retriever.summarizer = chat.summarizer
+        if len(parts) > 1:
+            chat.summarizer.model = parts[1]
+        _rebuild_system_prompt(retriever, chat)
+        if scheduler is not None:
+            from core.background_jobs import subject_summaries_job
+
+            scheduler.submit("subject_summaries", subject_summaries_job, retriever)
+        print_success(f"Summarization enabled (model {chat.summarizer.model}).")
+        return
+
+    if action == "off":
+        chat.summarizer = None
+        retriever.summarizer = None
+        _rebuild_system_prompt(retriever, chat)
+        print_success("Summarization disabled. Old chat logs are included in full.")
+        return
+
+    summarizer = chat.summarizer
+    if summarizer is None:
+        print("Summarization: off (use '/summarize on' to enable)")
+        return
+
+    if action == "model":
+        if len(parts) != 2:
+            print_error("Usage: /summarize model <name>")
+            return
+        summarizer.model = parts[1]
+        print_success(f"Summaries will use {parts[1]}.")
+        return
+
+    if action == "":
+        _, missing = chat.spilled_summary()
+        print_section_header("Summarization")
+        print(f"Model: {summarizer.model}")
+        print(f"Chat log budget: {retriever.chat_log_budget} chars")
+        print(f"Pending: {summarizer.pending_count()}")
+        print(f"Written this session: {summarizer.completed} ({summarizer.failed} failed)")
+        print(f"Failed, waiting to retry: {summarizer.backing_off_count()}")
+        print(f"Spilled batches without a summary: {missing}")
+        return
+
+    print_error("Usage: /summarize on [model] | off | model <name>")
+
+
+def _rebuild_system_prompt(retriever, chat) -> None:
+    """Rebuild the session's system prompt so its chat logs follow the summarizer setting."""
+    if chat.current_persona or chat.current_subject:
+        chat.set_system_prompt(retriever.build_system_prompt(chat.current_persona, chat.current_subject))
+
+
+def handle_jobs(scheduler, args: str) -> None:
+    """Handle /jobs: show or control idle-time background jobs.
+
+    Formats:
+        /jobs          -> list jobs with status and progress
+        /jobs pause    -> keep jobs paused even while idle
+        /jobs resume   -> let jobs run during idle time again
+
+    Args:
+        scheduler: JobScheduler owned by the app (None if unavailable).
+        args: Text after the command name.
+    """
+    if scheduler is None:
+        print_warning("Background jobs are not available.")
+        return
+
+    action = args.strip().lower()
+    if action == "pause":
+        scheduler.hold(True)
+        print_success("Background jobs paused. Use '/jobs resume' to continue.")
+        return
+
+    if action == "resume":
+        scheduler.hold(False)
+        print_success("Background jobs will continue while you are idle.")
+        return
+
+    if action:
+        print_error("Usage: /jobs [pause|resume]")
+        return
+
+    print_section_header("Background Jobs")
+    jobs = scheduler.snapshot()
+    if not jobs:
+        print("No jobs yet.")
+        return
+    for name, record in jobs:
+        line = f"{name:<20} {record['status']:<12} {record['steps']:>5} steps"
+        if record.get("progress"):
+            line += f"  {record['progress']}"
+        print(line)
+        if record.get("error"):
+            print(f"{'':<20} {record['error']}")
+    if scheduler.held:
+        print("\nJobs are paused (use '/jobs resume').")
+
+
+def handle_gen(chat, args: str) -> None:
+    """Handle /gen: show or reload per-model generation profiles.
+
+    Formats:
+        /gen        -> options sent with the last request and the profile file
+        /gen reload -> re-read the profile file
+
+    Args:
+        chat: ChatSession whose profiles are shown.
+        args: Text after the command name.
+    """
+    profiles = chat.profiles
+    if profiles is None:
+        print_warning("Generation profiles are not available.")
+        return
+
+    action = args.strip().lower()
+    if action == "reload":
+        profiles.reload()
+        print_success(f"Reloaded generation profiles from {profiles.path}.")
+        return
+
+    if action:
+        print_error("Usage: /gen [reload]")
+        return
+
+    print_section_header("Generation Profiles")
+    print(f"File: {profiles.path}{'' if profiles.path.exists() else ' (missing)'}")
+    print(f"num_ctx buckets: {', '.join(str(size) for size in profiles.buckets)}")
+    if chat.last_options is None:
+        print("No request sent yet.")
+        return
+    options = ", ".join(f"{key}={value}" for key, value in sorted(chat.last_options.items()))
+    print(f"Last request ({chat.last_options_model}): {options or 'model defaults'}")
+
+
+def parse_stats_args(args: str) -> tuple[tuple[str, ...], str | None]:
+    """Parse '/stats' arguments into (group-by dimensions, since date).
+
+    Raises:
+        ValueError: On an unknown word or a bad day count.
+    """
+    from core.usage import DIMENSIONS
+
+    by = []
+    since = None
+    parts = args.lower().split()
+    i = 0
+    while i < len(parts):
+        word = parts[i]
+        if word == "days":
+            if i + 1 == len(parts) or not parts[i + 1].isdigit():
+                raise ValueError("'days' needs a number")
+            since = time.strftime("%Y-%m-%d", time.localtime(time.time() - (int(parts[i + 1]) - 1) * 86400))
+            i += 2
+            continue
+        if word not in DIMENSIONS:
+            raise ValueError(f"Unknown word '{word}'")
+        if word not in by:
+            by.append(word)
+        i += 1
+    return tuple(by) or ("subject",), since
+
+
+def handle_stats(retriever, args: str) -> None:
+    """Handle /stats: token usage and latency from the per-turn usage logs.
+
+    Formats:
+        /stats                      -> per subject
+        /stats model day            -> per model and day (any of subject,
+                                       persona, model, day)
+        /stats persona days 7       -> per persona over the last 7 days
+
+    Args:
+        retriever: SubjectRetriever carrying the usage rollup.
+        args: Text after the command name.
+    """
+    from core.usage import format_report
+
+    rollup = retriever.usage_rollup
+    if rollup is None:
+        print_warning("Usage statistics are not available.")
+        return
+
+    try:
+        by, since = parse_stats_args(args)
+    except ValueError as e:
+        print_error(f"{e}. Usage: /stats [subject] [persona] [model] [day] [days N]")
+        return
+
+    title = "Usage by " + ", ".join(by) + (f" since {since}" if since else "")
+    print_section_header(title)
+    print(format_report(rollup.report(by, since), by))
@@ -0,0 +1,256 @@
+"""Table-driven slash command registry.
+
+Every command is one row in a table: its name, the handler as a
+"module:function" string, and which CommandHandler attributes the
+handler takes. Handler modules are imported the first time one of their
+commands runs, so adding commands costs nothing at startup or on
+normal chat turns.
+
+A row's params name CommandHandler attributes to pass positionally;
+two pseudo-params are also accepted:
+    - "args"    : the text after the command name
+    - "context" : the CommandHandler itself
+
+A row's result says how the handler's return value is used:
+    - None        : ignored
+    - "prompt"    : a prompt to send to the model (or None)
+    - "exit"      : True if the app should exit
+    - "streaming" : the new text_streaming preference
+    - "auto"      : None, a prompt string, or a (should_exit, prompt) tuple
+
+Third-party commands are discovered through the "local_chat.commands"
+entry point group: the entry point name is the command name and its
+value a "module:function" handler called as handler(context, args)
+with an "auto" result. Entry points are only scanned when an unknown
+command is typed or /help is shown.
+"""
+
+from importlib import import_module
+
+PLUGIN_GROUP = "local_chat.commands"
+
+BUILTIN_COMMANDS = [
+    # name, target, params, result
+    ("exit", "commands.chat_commands:handle_exit", ("chat", "logger"), "exit"),
+    ("help", "commands.registry:print_help", ("registry",), None),
+    ("pref_streaming", "commands.chat_commands:handle_streaming_toggle", ("text_streaming",), "streaming"),
+    ("render", "commands.chat_commands:handle_render", ("context", "args"), None),
+    ("p", "commands.subject_commands:handle_list_personas", ("retriever",), None),
+    ("s", "commands.subject_commands:handle_list_subjects", ("retriever",), None),
+    ("s_inst", "commands.subject_commands:handle_view_subject", ("retriever", "chat"), None),
+    ("p_inst", "commands.subject_commands:handle_view_persona", ("retriever", "chat"), None),
+    ("profile", "commands.perf_commands:handle_profile", ("profiler", "args"), None),
+    ("cache", "commands.perf_commands:handle_cache", ("retriever", "chat", "args"), None),
+    ("route", "commands.perf_commands:handle_route", ("chat", "args"), None),
+    ("summarize", "commands.perf_commands:handle_summarize", ("retriever", "chat", "args", "idle", "scheduler"), None),
+    ("jobs", "commands.perf_commands:handle_jobs", ("scheduler", "args"), None),
+    ("gen", "commands.perf_commands:handle_gen", ("chat", "args"), None),
+    ("stats", "commands.perf_commands:handle_stats", ("retriever", "args"), None),
+    ("status", "commands.chat_commands:handle_status", ("chat", "text_streaming"), None),
+    ("clear", "commands.chat_commands:handle_clear_history", ("chat",), None),
+    ("fresh", "commands.chat_commands:handle_fresh", ("chat",), "prompt"),
+    ("compare", "commands.chat_commands:handle_compare", ("chat", "args"), None),
+    ("regenerate", "commands.chat_commands:handle_regenerate", ("chat", "args"), None),
+    ("turns", "commands.branch_commands:handle_turns", ("chat",), None),
+    ("fork", "commands.branch_commands:handle_fork", ("chat", "args"), None),
+    ("edit", "commands.branch_commands:handle_edit", ("chat", "args"), "prompt"),
+    ("branch_delete", "commands.branch_commands:handle_branch_delete", ("chat", "args"), None),
+    ("branch", "commands.branch_commands:handle_branch", ("chat", "args"), None),
+    ("save", "commands.branch_commands:handle_save", ("retriever", "chat", "logger"), None),
+    ("h_search", "commands.chat_commands:handle_history_search", ("chat", "args"), None),
+    ("window", "commands.chat_commands:handle_window", ("chat", "args"), None),
+    ("c_history", "commands.chat_commands:handle_chat_history", ("retriever", "chat"), None),
+    ("s_new", "commands.subject_commands:handle_new_subject", ("retriever", "chat", "args"), None),
+    ("attach", "commands.subject_commands:handle_attach", ("retriever", "chat", "args"), None),
+    ("p_new", "commands.subject_commands:handle_new_persona", ("retriever", "chat", "args"), None),
+    ("p_delete", "commands.subject_commands:handle_delete_persona", ("retriever", "chat", "args"), None),
+    ("s_delete", "commands.subject_commands:handle_delete_subject", ("retriever", "chat", "args"), None),
+    ("c_delete", "commands.chat_commands:handle_delete_chat", ("retriever", "chat", "args"), None),
+    ("c_move", "commands.chat_commands:handle_chat_move", ("retriever", "chat", "args"), None),
+    ("swap", "commands.chat_commands:handle_swap", ("chat", "args"), None),
+    ("session", "commands.session_commands:handle_session", ("sessions", "args"), None),
+    ("resume", "commands.session_commands:handle_resume", ("sessions",), None),
+    ("cancel", "commands.session_commands:handle_cancel", ("sessions", "args"), None),
+]
+
+# Commands whose argument is glued to the name, e.g. /c_history_<subject>.
+BUILTIN_PREFIX_COMMANDS = [
+    ("c_history_", "commands.chat_commands:handle_chat_history_by_subject", ("retriever", "chat", "args"), None),
+]
+
+
+def parse_command(line: str) -> tuple[str, str] | None:
+    """Split a slash command line into (name, args) in one step.
+
+    Returns:
+        (name, args) with the name as typed (without '/') and args
+        stripped, or None if the line is not a slash command.
+    """
+    if not line.startswith("/"):
+        return None
+    parts = line[1:].split(maxsplit=1)
+    if not parts:
+        return "", ""
+    return parts[0], parts[1].strip() if len(parts) > 1 else ""
+
+
+class Command:
+    """One registry row; the handler is imported on first run."""
+
+    __slots__ = ("name", "target", "params", "result", "plugin", "_handler")
+
+    def __init__(self, name: str, target, params=(), result=None, plugin: bool = False):
+        """Create a command.
+
+        Args:
+            name: Command name without the leading '/'.
+            target: "module:function" string, an entry point, or a callable.
+            params: CommandHandler attribute names (or "args"/"context").
+            result: How the return value is used (see module docstring).
+            plugin: True for commands discovered through entry points.
+        """
+        self.name = name
+        self.target = target
+        self.params = params
+        self.result = result
+        self.plugin = plugin
+        self._handler = target if callable(target) and not hasattr(target, "load") else None
+
+    def handler(self):
+        """Return the handler function, importing it on first use."""
+        if self._handler is None:
+            if isinstance(self.target, str):
+                module_name, _, attr = self.target.partition(":")
+                self._handler = getattr(import_module(module_name), attr)
+            else:
+                self._handler = self.target.load()
+        return self._handler
+
+    def run(self, context, args: str) -> tuple[bool, str | None]:
+        """Call the handler and translate its result for handle_command."""
+        values = []
+        for param in self.params:
+            if param == "args":
+                values.append(args)
+            elif param == "context":
+                values.append(context)
+            else:
+                values.append(getattr(context, param))
+        value = self.handler()(*values)
+
+        if self.result == "prompt":
+            return False, value
+        if self.result == "exit":
+            return bool(value), None
+        if self.result == "streaming":
+            context.text_streaming = value
+            return False, None
+        if self.result == "auto":
+            if isinstance(value, tuple):
+                return value
+            return False, value or None
+        return False, None
+
+
+class CommandRegistry:
+    """Exact-name table plus a short list of prefix commands."""
+
+    def __init__(self, load_builtins: bool = True):
+        """Create a registry, optionally with the built-in commands."""
+        self.commands = {}
+        self.prefix_commands = []
+        self._plugins_loaded = False
+        if load_builtins:
+            for name, target, params, result in BUILTIN_COMMANDS:
+                self.register(name, target, params, result)
+            for name, target, params, result in BUILTIN_PREFIX_COMMANDS:
+                self.register(name, target, params, result, prefix=True)
+
+    def register(self, name: str, target, params=("context", "args"), result="auto",
+                 prefix: bool = False, plugin: bool = False) -> Command:
+        """Add (or replace) a command.
+
+        Args:
+            name: Command name without '/', matched case-insensitively.
+            target: Handler as "module:function", entry point or callable.
+            params: Arguments to pass (see module docstring).
+            result: How the return value is used.
+            prefix: Match any command that starts with name; the rest of
+                the name becomes the start of args.
+            plugin: Mark the command as coming from a plugin.
+
+        Returns:
+            The registered Command.
+        """
+        command = Command(name.lower(), target, params, result, plugin)
+        if prefix:
+            self.prefix_commands = [c for c in self.prefix_commands if c.name != command.name]
+            self.prefix_commands.append(command)
+            self.prefix_commands.sort(key=lambda c: len(c.name), reverse=True)
+        else:
+            self.commands[command.name] = command
+        return command
+
+    def load_plugins(self) -> int:
+        """Register commands from installed entry points (once).
+
+        Built-in commands are never replaced by plugins.
+
+        Returns:
+            Number of plugin commands added.
+        """
+        if self._plugins_loaded:
+            return 0
+        self._plugins_loaded = True
+
+        from importlib.metadata import entry_points
+
+        added = 0
+        for entry_point in entry_points(group=PLUGIN_GROUP):
+            name = entry_point.name.lower()
+            if name not in self.commands:
+                self.register(name, entry_point, plugin=True)
+                added += 1
+        return added
+
+    def _lookup(self, name: str):
+        command = self.commands.get(name)
+        if command is not None:
+            return command, None
+        for command in self.prefix_commands:
+            if name.startswith(command.name):
+                return command, len(command.name)
+        return None, None
+
+    def resolve(self, name: str, args: str) -> tuple[Command | None, str]:
+        """Find the command for a parsed line, loading plugins on a miss.
+
+        Returns:
+            (command, args) where args includes any text glued to a
+            prefix command's name, or (None, args) if nothing matches.
+        """
+        lowered = name.lower()
+        command, cut = self._lookup(lowered)
+        if command is None and not self._plugins_loaded:
+            self.load_plugins()
+            command, cut = self._lookup(lowered)
+        if command is not None and cut is not None:
+            args = f"{name[cut:]} {args}".strip()
+        return command, args
+
+    def plugin_names(self) -> list[str]:
+        """Names of plugin commands, sorted."""
+        return sorted(name for name, command in self.commands.items() if command.plugin)
+
+
+def print_help(registry: CommandRegistry) -> None:
+    """Handle /help: print built-in commands, then any plugin commands."""
+    from utils.ui import print_commands
+
+    print_commands()
+    registry.load_plugins()
+    names = registry.plugin_names()
+    if names:
+        print("Plugin commands")
+        for name in names:
+            print(f"• /{name}")
@@ -0,0 +1,167 @@
+"""Named session command handlers.
+
+These helpers implement the flows for:
+    - /session [list]        : list open sessions
+    - /session new <name>    : open a session with the current settings
+    - /session switch <name> : make another session active
+    - /session close [name]  : close a session (default: the active one)
+    - /resume                : restore the sessions saved by the previous run
+    - /cancel [all]          : stop the active (or every) session's reply
+
+Sessions keep generating while another one is active; replies finished
+in the background are shown when you switch back.
+"""
+
+import time
+
+from utils.ui import (
+    print_success,
+    print_error,
+    print_warning,
+    print_section_header,
+    display_chat_history,
+)
+
+
+def _status(session) -> str:
+    """Describe what a session's prompt queue is doing."""
+    pending = session.queue.pending_count
+    if not pending:
+        return "idle"
+    if pending == 1:
+        return "generating"
+    return f"generating, {pending - 1} queued"
+
+
+def handle_session(sessions, args: str) -> None:
+    """Handle /session: list, open, switch or close named sessions.
+
+    Args:
+        sessions: SessionManager owned by the REPL.
+        args: Text after the command name.
+    """
+    if sessions is None:
+        print_warning("Named sessions are only available in the interactive chat.")
+        return
+
+    parts = args.split()
+    action = parts[0].lower() if parts else "list"
+    name = parts[1] if len(parts) > 1 else ""
+
+    if action == "list":
+        print_section_header("Sessions")
+        for session in sessions.sessions.values():
+            chat = session.chat
+            marker = "*" if session is sessions.active else " "
+            messages = len(chat.history.nodes()) + chat.spilled_count()
+            unseen = f", {session.unseen} unread" if session.unseen else ""
+            print(
+                f"{marker} {session.name:<16} {chat.current_persona or '-'}/{chat.current_subject or '-'}"
+                f"  {chat.model}  {messages} messages  ({_status(session)}{unseen})"
+            )
+        return
+
+    if action == "new":
+        if not name:
+            print_error("Usage: /session new <name>")
+            return
+        try:
+            session = sessions.new(name)
+        except ValueError as e:
+            print_error(str(e))
+            return
+        sessions.switch(name)
+        print_success(f"Opened session '{session.name}' ({session.chat.current_persona}/{session.chat.current_subject}, {session.chat.model}).")
+        return
+
+    if action == "switch":
+        if not name:
+            print_error("Usage: /session switch <name>")
+            return
+        try:
+            session = sessions.switch(name)
+        except KeyError:
+            print_error(f"No session named '{name}'. Use /session list.")
+            return
+        print_success(f"Switched to session '{name}' ({_status(session)}).")
+        if session.unseen:
+            display_chat_history(session.chat.history.nodes()[-2 * session.unseen:])
+            session.unseen = 0
+        return
+
+    if action == "close":
+        name = name or sessions.active.name
+        try:
+            sessions.close(name)
+        except KeyError:
+            print_error(f"No session named '{name}'. Use /session list.")
+            return
+        except ValueError as e:
+            print_error(str(e))
+            return
+        print_success(f"Closed session '{name}'. Its transcript stays in {sessions.autosave_path(name)}.")
+        print(f"Active session: {sessions.active.name}")
+        return
+
+    print_error("Usage: /session [list] | new <name> | switch <name> | close [name]")
+
+
+def handle_cancel(sessions, args: str) -> None:
+    """Handle /cancel: stop a reply and drop the prompts queued after it.
+
+    Args:
+        sessions: SessionManager owned by the REPL.
+        args: "all" to cancel every session, otherwise only the active one.
+    """
+    if sessions is None:
+        print_warning("Nothing to cancel outside the interactive chat.")
+        return
+
+    if args.strip().lower() == "all":
+        targets = list(sessions.sessions.values())
+    else:
+        targets = [sessions.active]
+    busy = [session for session in targets if session.queue.busy]
+    if not busy:
+        print_warning("No reply is being generated.")
+        return
+    for session in busy:
+        dropped = session.queue.cancel()
+        print_success(f"Stopping the reply in session '{session.name}' ({dropped} queued prompt(s) dropped).")
+
+
+def handle_resume(sessions) -> None:
+    """Handle /resume: restore the sessions snapshotted by the previous run.
+
+    Persona, subject, model, system prompt and the active branch of each
+    saved session are restored; a session of the same name is replaced.
+
+    Args:
+        sessions: SessionManager owned by the REPL.
+    """
+    if sessions is None:
+        print_warning("Resume is only available in the interactive chat.")
+        return
+
+    snapshot = sessions.load_previous_snapshot()
+    if snapshot is None:
+        print_warning("No snapshot from a previous run was found.")
+        return
+    report_restore(sessions, snapshot)
+
+
+def report_restore(sessions, snapshot: dict) -> None:
+    """Restore a snapshot into sessions and print what happened."""
+    start = time.perf_counter()
+    results = sessions.restore(snapshot)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for name, fresh in results:
+        chat = sessions.sessions[name].chat
+        if fresh is None:
+            print_warning(f"Session '{name}' is generating; not restored.")
+            continue
+        note = "" if fresh else " (persona/subject files changed, system prompt rebuilt)"
+        messages = len(chat.history.nodes()) + chat.spilled_count()
+        print_success(f"Restored session '{name}': {chat.current_persona}/{chat.current_subject}, {chat.model}, {messages} messages{note}")
+    print(f"Active session: {sessions.active.name} (restored in {elapsed:.1f} ms)")
@@ -6,8 +6,11 @@ These helpers implement the interactive flows for:
     - creating new personas and subjects
     - switching persona/subject inline
     - deleting personas, subjects, and handling fallbacks
+    - attaching documents to a subject's knowledge store
 """
 
+from pathlib import Path
+
 from utils.ui import (
     print_success,
     print_error,
@@ -332,3 +335,50 @@ def handle_delete_subject(retriever, chat, subject_name: str) -> bool:
     else:
         print_error(f"Failed to delete subject '{subject_name}'.")
     return success
+
+
+def handle_attach(retriever, chat, args: str) -> None:
+    """Handle /attach: add documents to the current subject's knowledge store.
+
+    Formats:
+        /attach <path> -> ingest a file, or every text file in a directory
+        /attach        -> list the subject's documents
+
+    Only the passages relevant to each prompt are sent to the model.
+    """
+    if retriever.knowledge is None:
+        print_warning("Document attachments are not available.")
+        return
+
+    from core.knowledge import ingest_paths
+
+    subject_name = chat.current_subject or retriever.default_subject
+    store = retriever.knowledge.store(subject_name)
+    path = args.strip().strip('"')
+
+    if not path:
+        documents = store.documents
+        if not documents:
+            print(f"No documents attached to '{subject_name}'. Use /attach <path>.")
+            return
+        print(f"Documents in '{subject_name}':")
+        for source, doc in documents.items():
+            print(f"• {doc['name']} ({doc['chunks']} chunks)  {source}")
+        return
+
+    found = False
+    for file_path, result, error in ingest_paths(store, [Path(path).expanduser()]):
+        found = True
+        if error is not None:
+            print_error(f"{file_path}: {error}")
+        elif result["status"] == "unchanged":
+            print_warning(f"{file_path.name} is already attached and unchanged.")
+        elif result["status"] == "duplicate":
+            print_warning(f"{file_path.name} has the same content as an attached document; skipped.")
+        else:
+            print_success(
+                f"{result['status'].capitalize()} {file_path.name} to '{subject_name}': "
+                f"{result['chunks']} chunks ({result['duplicates']} duplicate chunks skipped)."
+            )
+    if not found:
+        print_error(f"No text or markdown files found at {path}.")
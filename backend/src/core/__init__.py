@@ -5,11 +5,27 @@ local chat app so callers can import them from a single place:
     - SubjectRetriever: manages personas, subjects, and system prompts
     - ChatSession: wraps the Ollama chat API and tracks history
     - ChatLogger: persists conversations to disk as markdown
+
+The classes are imported on first access, so importing one core
+submodule does not load the others.
 """
 
-from .retriever import SubjectRetriever
-from .chat import ChatSession
-from .logger import ChatLogger
+from importlib import import_module
+
 from .version import __version__
 
+_EXPORTS = {
+    "SubjectRetriever": ".retriever",
+    "ChatSession": ".chat",
+    "ChatLogger": ".logger",
+}
+
 __all__ = ["SubjectRetriever", "ChatSession", "ChatLogger", "__version__"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
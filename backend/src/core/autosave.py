@@ -0,0 +1,189 @@
+"""Single background writer for autosave files.
+
+Sessions hand finished text to AutosaveWriter.write and return at once;
+one daemon thread writes the files. Writes are coalesced per path, so a
+burst of updates to the same file costs one disk write. Whole-file
+writes replace the file atomically through a temporary file; appends
+(AutosaveWriter.append) cut the file at a byte offset and write only
+the new tail.
+
+BranchFile keeps a file mirroring a session's active branch current
+through appends, so saving a turn costs the size of the turn rather
+than of the whole conversation.
+"""
+
+import threading
+from pathlib import Path
+
+TAIL_NODES = 64
+
+
+class AutosaveWriter:
+    """Write the latest text for each path on one background thread."""
+
+    def __init__(self):
+        """Create the writer and start its thread."""
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._writing = False
+        self._stopping = False
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def write(self, path: Path | str, text: str) -> None:
+        """Queue text to be written to path, replacing any queued text."""
+        with self._condition:
+            self._pending[Path(path)] = (None, text.encode("utf-8"))
+            self._condition.notify_all()
+
+    def append(self, path: Path | str, offset: int, text: str) -> None:
+        """Queue text to be written at byte offset of path, dropping what follows.
+
+        Merged with a write or append still queued for the same path, so
+        the file ends up as if every call had been applied in order.
+        """
+        data = text.encode("utf-8")
+        path = Path(path)
+        with self._condition:
+            pending = self._pending.get(path)
+            if pending is not None:
+                start, queued = pending
+                if start is None or offset >= start:
+                    data = queued[: offset - (start or 0)] + data
+                    offset = start
+            self._pending[path] = (offset, data)
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every queued write has finished.
+
+        Returns:
+            True if nothing is left to write, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self) -> None:
+        """Finish queued writes and stop the thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending:
+                    return
+                path, (offset, data) = self._pending.popitem()
+                self._writing = True
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if offset is None:
+                    tmp_path = path.with_suffix(path.suffix + ".tmp")
+                    tmp_path.write_bytes(data)
+                    tmp_path.replace(path)
+                else:
+                    with open(path, "r+b" if path.exists() else "w+b") as f:
+                        if f.seek(0, 2) < offset:
+                            raise OSError("file is shorter than expected")
+                        f.truncate(offset)
+                        f.seek(offset)
+                        f.write(data)
+                self.written += 1
+            except OSError as e:
+                self.failed += 1
+                print(f"[autosave] Could not write {path.name}: {e}")
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class BranchFile:
+    """A file mirroring a session's active branch, kept current by appending.
+
+    render(message, first) returns one message's text (first is True
+    for the first message of the branch). update() finds the last
+    message already in the file that is still on the branch, cuts the
+    file after it and appends the messages that follow: a new turn
+    appends only that turn, and a replaced partial reply rewrites only
+    the reply. When no written message is on the branch any more (a
+    branch switch, cleared or reloaded history), the file is rewritten
+    from the full history.
+    """
+
+    def __init__(self, writer: AutosaveWriter, path: Path | str, render):
+        self.writer = writer
+        self.path = Path(path)
+        self.render = render
+        self.size = 0
+        self.count = 0
+        self._written = False
+        self._tail = {}
+
+    def reset(self) -> None:
+        """Rewrite the whole file on the next update."""
+        self._written = False
+        self._tail = {}
+
+    def update(self, chat) -> None:
+        """Bring the file up to date with chat's active branch."""
+        nodes = chat.history.nodes()
+        base = None
+        if self._written and self._tail:
+            lowest = min(entry[0].depth for entry in self._tail.values())
+            index = len(nodes)
+            while index > 0 and nodes[index - 1].depth >= lowest:
+                entry = self._tail.get(id(nodes[index - 1]))
+                if entry is not None and entry[0] is nodes[index - 1]:
+                    base = index
+                    break
+                index -= 1
+
+        if base is None:
+            parts = []
+            size = 0
+            self._tail = {}
+            for count, message in enumerate(chat.iter_full_history(), start=1):
+                text = self.render(message, count == 1)
+                parts.append(text)
+                size += len(text.encode("utf-8"))
+                if not isinstance(message, dict):
+                    self._remember(message, size)
+            self.writer.write(self.path, "".join(parts))
+            self.size, self.count = size, len(parts)
+            self._written = True
+            self._trim()
+            return
+
+        node = nodes[base - 1]
+        offset = self._tail[id(node)][1]
+        new = nodes[base:]
+        if offset == self.size and not new:
+            return
+        # Entries past the cut belong to messages that are being replaced
+        self._tail = {key: entry for key, entry in self._tail.items() if entry[1] <= offset}
+        parts = []
+        size = offset
+        for message in new:
+            text = self.render(message, message.depth == 1)
+            parts.append(text)
+            size += len(text.encode("utf-8"))
+            self._remember(message, size)
+        self.writer.append(self.path, offset, "".join(parts))
+        self.size = size
+        self.count = nodes[-1].depth
+        self._trim()
+
+    def _remember(self, node, size: int) -> None:
+        """Record that node's text ends at byte size of the file."""
+        self._tail[id(node)] = (node, size)
+
+    def _trim(self) -> None:
+        """Keep only the last TAIL_NODES written messages."""
+        if len(self._tail) > TAIL_NODES:
+            keep = sorted(self._tail.items(), key=lambda item: item[1][1])[-TAIL_NODES:]
+            self._tail = dict(keep)
@@ -0,0 +1,126 @@
+"""Built-in idle-time jobs for the JobScheduler.
+
+Each job is a generator function taking the scheduler's persistent
+state dict first; every `yield` is a step boundary where the job may be
+paused (see core.jobs).
+
+    - warm_model        : load the chat model so the first reply is fast
+    - chat_catalog      : index chat files and, if asked to, title a few
+    - subject_summaries : queue summaries of over-budget subject logs
+"""
+
+from core.catalog import ChatCatalog
+from core.client import get_client
+from core.corpus import chat_file_summary, scan_corpus
+from core.history import estimate_tokens
+
+TITLE_PROMPT = (
+    "Write a short, specific title (at most 8 words) for the following chat. "
+    "Reply with the title only.\n\n"
+)
+TITLE_SOURCE_CHARS = 4000
+DEFAULT_MAX_TITLES = 0
+CATALOG_STEP_FILES = 64
+
+
+def warm_model_job(state: dict, chat, ready=None):
+    """Load the chat model into memory with an empty request.
+
+    The options are those the first chat request will use, since Ollama
+    reloads the model if num_ctx differs. If ready (the thread building
+    the default system prompt) is given, it is joined first so num_ctx
+    and the persona's profile match the first turn.
+    """
+    if ready is not None:
+        ready.join()
+    model = chat.model
+    get_client().generate(model=model, prompt="", options=chat.options_for(model))
+    state["last_model"] = model
+    yield f"loaded {model}"
+
+
+def chat_catalog_job(state: dict, retriever, catalog: ChatCatalog, model: str,
+                     max_titles: int = DEFAULT_MAX_TITLES):
+    """Index every chat file, then title up to max_titles untitled ones.
+
+    Files are re-scanned only when their size or mtime changed, on a
+    process pool (see core.corpus); a changed file also loses its old
+    title. Each title is a model call, so titling is off unless
+    max_titles is set (main.py --titles N), and a run writes at most
+    that many. The catalog is saved at every step, so a job stopped
+    part-way re-scans only the files it had not reached, and titles are
+    saved as soon as each one is written.
+    """
+    chats = retriever.list_all_chats()
+    keys = []
+    changed = []
+    stats = {}
+    for subject_name, chat_filename, path in chats:
+        key = ChatCatalog.key(subject_name, chat_filename)
+        keys.append(key)
+        stat = path.stat()
+        entry = catalog.entries.get(key)
+        if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            continue
+        stats[key] = {"mtime": stat.st_mtime, "size": stat.st_size}
+        changed.append((key, path))
+
+    # Parsed in parallel; closing the scan (job stopped) drops unstarted batches
+    scan = scan_corpus(changed, chat_file_summary)
+    try:
+        for done, (key, result, error) in enumerate(scan, start=1):
+            catalog.update(key, title=None, **stats[key], **(result or {"messages": 0, "preview": "", "tokens": 0}))
+            if done % CATALOG_STEP_FILES == 0 or done == len(changed):
+                # Saved before each step, so a job stopped here skips these files next run
+                catalog.save()
+                yield f"indexed {done}/{len(changed)}"
+    finally:
+        scan.close()
+    catalog.remove_missing(keys)
+    catalog.save()
+
+    titled = 0
+    for subject_name, chat_filename, path in chats:
+        if titled >= max_titles:
+            break
+        key = ChatCatalog.key(subject_name, chat_filename)
+        if catalog.entries.get(key, {}).get("title"):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read(TITLE_SOURCE_CHARS)
+        messages = [{"role": "user", "content": TITLE_PROMPT + text}]
+        options = None
+        if retriever.profiles is not None:
+            options = retriever.profiles.options_for(model, prompt_tokens=estimate_tokens(messages[0]["content"]), command="title")
+        response = get_client().chat(model=model, messages=messages, options=options)
+        lines = response["message"]["content"].strip().strip('"').splitlines()
+        catalog.update(key, title=lines[0][:80] if lines else catalog.entries[key]["preview"])
+        catalog.save()
+        titled += 1
+        yield f"titled {key}"
+
+
+def subject_summaries_job(state: dict, retriever):
+    """Queue summaries for every subject whose logs exceed the budget.
+
+    Building a subject's prompt history queues any missing summaries on
+    the retriever's summarizer, which then writes them in idle time.
+    """
+    if retriever.summarizer is None:
+        return
+    for subject_name in retriever.list_subjects():
+        if subject_name != retriever.default_subject:
+            retriever.load_chat_history_for_prompt(subject_name)
+            yield f"checked {subject_name}"
+
+
+def start_default_jobs(scheduler, retriever, chat, catalog: ChatCatalog,
+                       max_titles: int = DEFAULT_MAX_TITLES, defaults=None) -> None:
+    """Submit the built-in jobs to the scheduler.
+
+    See chat_catalog_job for max_titles; defaults is the thread loading
+    the default persona and subject, if it is still running.
+    """
+    scheduler.submit("warm_model", warm_model_job, chat, defaults)
+    scheduler.submit("chat_catalog", chat_catalog_job, retriever, catalog, chat.model, max_titles)
+    scheduler.submit("subject_summaries", subject_summaries_job, retriever)
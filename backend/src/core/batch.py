@@ -0,0 +1,184 @@
+"""Headless batch processing of prompt files.
+
+run_batch sends every prompt from an input file (or stdin) through its
+own ChatSession configured with one system prompt and model, using a
+bounded thread pool, and writes one JSON line per prompt as soon as it
+finishes. Output records carry per-item timings. Items with the same
+prompt that run at the same time share one generation (see
+core.coalesce). Completed IDs already
+present in the output file are skipped, so an interrupted batch can be
+re-run with the same arguments to finish the rest.
+
+Input formats (mixed freely, one item per line):
+    {"id": "q1", "prompt": "..."}   JSONL; "id" defaults to the line number
+    plain text                     one prompt per line
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from core.chat import ChatSession
+from core.coalesce import SingleFlight
+
+
+def read_prompts(stream):
+    """Yield (item_id, prompt) pairs from a JSONL or plain-text stream.
+
+    Blank lines are skipped. Lines starting with '{' are parsed as JSON
+    objects with a "prompt" (or "text") field and an optional "id".
+
+    Raises:
+        ValueError: If a JSON line is invalid or has no prompt.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        text = line.strip()
+        if not text:
+            continue
+        if text.startswith("{"):
+            try:
+                item = json.loads(text)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: invalid JSON ({e})") from e
+            prompt = item.get("prompt") or item.get("text")
+            if not prompt:
+                raise ValueError(f"Line {line_number}: missing 'prompt'")
+            yield str(item.get("id", line_number)), prompt
+        else:
+            yield str(line_number), text
+
+
+def completed_ids(output_path) -> set[str]:
+    """Return IDs that finished without error in an existing output file."""
+    done = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("error") is None and "id" in record:
+                    done.add(str(record["id"]))
+    except OSError:
+        pass
+    return done
+
+
+def run_item(item_id: str, prompt: str, system_prompt: str, model: str, persona: str, subject: str,
+             profiles=None, flights=None, knowledge=None, usage=None) -> dict:
+    """Answer one prompt in a fresh ChatSession and time it.
+
+    profiles, if given, is the GenerationProfiles the session sizes its
+    request options from; flights is the SingleFlight shared by the
+    batch, so identical prompts in flight share one generation;
+    knowledge is the KnowledgeBase that supplies reference passages, and
+    usage the UsageLog each turn is recorded in.
+
+    Returns:
+        Output record with id, prompt, response, error, model, ttft,
+        duration and started (UTC ISO timestamp).
+    """
+    session = ChatSession(model=model)
+    session.set_system_prompt(system_prompt)
+    session.set_subject_info(persona, subject)
+    session.profiles = profiles
+    session.flights = flights
+    session.knowledge = knowledge
+    session.usage = usage
+
+    started = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    for chunk in session.send_message_stream(prompt):
+        if first_token_at is None and chunk:
+            first_token_at = time.perf_counter()
+        parts.append(chunk)
+    end = time.perf_counter()
+
+    error = session.last_error
+    return {
+        "id": item_id,
+        "prompt": prompt,
+        "response": None if error else "".join(parts),
+        "error": error,
+        "model": model,
+        "ttft": round(first_token_at - start, 3) if first_token_at and not error else None,
+        "duration": round(end - start, 3),
+        "started": started,
+    }
+
+
+def run_batch(items, output, system_prompt: str, model: str, persona: str, subject: str,
+              workers: int = 4, skip_ids=(), on_progress=None, profiles=None,
+              flights=None, knowledge=None, usage=None) -> tuple[int, int, int]:
+    """Process items with at most `workers` requests in flight.
+
+    Items are pulled lazily from the iterable, so very large inputs (or
+    stdin) are never loaded all at once. Each record is written and
+    flushed as soon as its item finishes, in completion order.
+
+    Args:
+        items: Iterable of (item_id, prompt) pairs.
+        output: Writable text stream for JSONL records.
+        system_prompt: System prompt used for every item.
+        model: Ollama model name.
+        persona: Persona name recorded on each session.
+        subject: Subject name recorded on each session.
+        workers: Maximum number of concurrent requests.
+        skip_ids: IDs to skip (already completed).
+        on_progress: Optional callback(done, failed, skipped) after each item.
+        profiles: Optional GenerationProfiles shared by every item.
+        flights: SingleFlight that coalesces identical prompts in flight
+            (a new one is used if omitted).
+        knowledge: Optional KnowledgeBase for per-prompt reference passages.
+        usage: Optional UsageLog for per-turn token and latency records.
+
+    Returns:
+        (done, failed, skipped) counts.
+    """
+    skip_ids = set(skip_ids)
+    if flights is None:
+        flights = SingleFlight()
+    done = failed = skipped = 0
+    in_flight = set()
+
+    def collect(finished):
+        nonlocal done, failed
+        for future in finished:
+            record = future.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            done += 1
+            if record["error"] is not None:
+                failed += 1
+            if on_progress is not None:
+                on_progress(done, failed, skipped)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        try:
+            for item_id, prompt in items:
+                if item_id in skip_ids:
+                    skipped += 1
+                    continue
+                if len(in_flight) >= workers:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                in_flight.add(pool.submit(
+                    run_item, item_id, prompt, system_prompt, model, persona, subject,
+                    profiles, flights, knowledge, usage,
+                ))
+            collect(wait(in_flight).done)
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    return done, failed, skipped
+
+
+def print_progress(done: int, failed: int, skipped: int) -> None:
+    """Report batch progress on stderr (stdout may carry the results)."""
+    print(f"\r[batch] {done} done, {failed} failed, {skipped} skipped", end="", file=sys.stderr, flush=True)
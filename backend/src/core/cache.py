@@ -0,0 +1,250 @@
+"""On-disk response cache for repeated prompts.
+
+ResponseCache stores assistant replies keyed on a hash of everything that
+determines a generation: model name, generation options, system prompt,
+and the message list. Options that only size the runtime (num_ctx, which
+grows with the conversation, and num_thread) are left out of the key. Entries are small JSON files grouped into
+two-character shard folders. A file's modification time doubles as its
+last-access time, which drives LRU eviction by total size and by age.
+
+The cache keeps running totals of its entry count and size, so a write
+only scans the folder when the size budget is exceeded, or once every
+EVICT_INTERVAL seconds to expire old entries (and to pick up entries
+written by other processes).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+EVICT_INTERVAL = 3600.0
+EVICT_TARGET = 0.9
+# Options that change how a model runs but not what it writes
+RUNTIME_OPTIONS = ("num_ctx", "num_thread")
+
+
+class ResponseCache:
+    """Exact-match cache of model responses with LRU eviction."""
+
+    def __init__(
+        self,
+        cache_dir: Path | str,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+    ):
+        """Create a cache rooted at cache_dir.
+
+        Args:
+            cache_dir: Directory that holds the cache entry files.
+            max_bytes: Total size budget; least recently used entries are
+                removed once it is exceeded.
+            max_age: Seconds since last use after which an entry expires.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bypass_subjects = set()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self._count = None
+        self._bytes = None
+        self._evicted_at = 0.0
+
+    @staticmethod
+    def make_key(model: str, options, system_prompt: str, messages) -> str:
+        """Return a stable hash for one generation request.
+
+        Args:
+            model: Ollama model name.
+            options: Generation options dict (or None); RUNTIME_OPTIONS
+                are ignored.
+            system_prompt: System prompt text.
+            messages: List of message dicts sent to the model.
+
+        Returns:
+            Hex digest identifying the request.
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "options": {k: v for k, v in (options or {}).items() if k not in RUNTIME_OPTIONS},
+                "system": system_prompt,
+                "messages": [(m["role"], m["content"]) for m in messages],
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_bypassed(self, subject: str | None) -> bool:
+        """Return True if caching is switched off for the given subject."""
+        return subject in self.bypass_subjects
+
+    def toggle_bypass(self, subject: str) -> bool:
+        """Flip the bypass flag for a subject.
+
+        Returns:
+            True if the subject is now bypassed, False otherwise.
+        """
+        if subject in self.bypass_subjects:
+            self.bypass_subjects.discard(subject)
+            return False
+        self.bypass_subjects.add(subject)
+        return True
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        """Look up a cached response and mark it as recently used.
+
+        Args:
+            key: Key produced by make_key.
+
+        Returns:
+            The cached response text, or None on a miss or expired entry.
+        """
+        path = self._entry_path(key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.max_age:
+                path.unlink()
+                self._account(-1, -stat.st_size)
+                self.misses += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry.get("response")
+
+    def put(self, key: str, response: str, **meta) -> None:
+        """Store a response; evict old entries if over budget or due.
+
+        Args:
+            key: Key produced by make_key.
+            response: Assistant response text.
+            **meta: Extra fields saved with the entry (model, subject, ...).
+        """
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                old_size = path.stat().st_size
+            except OSError:
+                old_size = None
+            data = json.dumps({"response": response, "created": time.time(), **meta}, ensure_ascii=False).encode("utf-8")
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            size = len(data)
+        except OSError as e:
+            print(f"⚠ Could not write response cache entry: {e}")
+            return
+
+        if old_size is None:
+            self._account(1, size)
+        else:
+            self._account(0, size - old_size)
+        with self._lock:
+            due = (
+                self._bytes is None
+                or self._bytes > self.max_bytes
+                or time.monotonic() - self._evicted_at >= EVICT_INTERVAL
+            )
+        if due:
+            self.evict()
+
+    def _account(self, count: int, size: int) -> None:
+        """Adjust the running totals (ignored until the first scan)."""
+        with self._lock:
+            if self._bytes is not None:
+                self._count += count
+                self._bytes += size
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cache entry on disk."""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def evict(self) -> int:
+        """Remove expired entries and, if the cache is over max_bytes, the
+        least recently used ones until it is down to EVICT_TARGET of it
+        (so the next writes do not trigger another scan). Resets the
+        running totals.
+
+        Returns:
+            Number of entries removed.
+        """
+        now = time.time()
+        removed = 0
+        live = []
+
+        for path, size, mtime in self._entries():
+            if now - mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                live.append((mtime, size, path))
+        expired = removed
+
+        total = sum(size for _, size, _ in live)
+        if total > self.max_bytes:
+            live.sort()
+            for _, size, path in live:
+                if total <= self.max_bytes * EVICT_TARGET:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        with self._lock:
+            self._count = len(live) - (removed - expired)
+            self._bytes = total
+            self._evicted_at = time.monotonic()
+        return removed
+
+    def clear(self) -> int:
+        """Delete every cache entry and reset the counters.
+
+        Returns:
+            Number of entries removed.
+        """
+        removed = 0
+        for path, _, _ in list(self._entries()):
+            path.unlink(missing_ok=True)
+            removed += 1
+        self.hits = self.misses = self.bypassed = 0
+        with self._lock:
+            self._count, self._bytes = 0, 0
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and on-disk usage."""
+        entries = list(self._entries())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "bypass_subjects": sorted(self.bypass_subjects),
+        }
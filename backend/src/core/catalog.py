@@ -0,0 +1,81 @@
+"""Cached metadata and titles for saved chat files.
+
+ChatCatalog keeps one entry per chat_*.md file (message count, first
+prompt, size and mtime) plus an optional model-written title, in a
+single JSON file. Entries are refreshed by background jobs (see
+core.background_jobs) so listing chats never has to open every file.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+
+class ChatCatalog:
+    """JSON-backed index of chat files keyed by 'subject/filename'."""
+
+    def __init__(self, path: Path | str):
+        """Create a catalog backed by path.
+
+        The file is read on first access to `entries`, not here, so
+        creating a catalog at startup costs nothing.
+
+        Args:
+            path: Location of the catalog JSON file.
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @property
+    def entries(self) -> dict:
+        """Catalog entries, loaded from disk on first access."""
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            self._entries = json.load(f)
+                    except (OSError, ValueError):
+                        self._entries = {}
+        return self._entries
+
+    @staticmethod
+    def key(subject_name: str, chat_filename: str) -> str:
+        """Return the catalog key for a chat file."""
+        return f"{subject_name}/{chat_filename}"
+
+    def get(self, subject_name: str, chat_filename: str) -> dict | None:
+        """Return the entry for a chat file, or None if not indexed."""
+        return self.entries.get(self.key(subject_name, chat_filename))
+
+    def title(self, subject_name: str, chat_filename: str) -> str | None:
+        """Return the generated title for a chat file, if any."""
+        entry = self.get(subject_name, chat_filename)
+        return entry.get("title") if entry else None
+
+    def update(self, key: str, **fields) -> None:
+        """Create or update the entry for key."""
+        entries = self.entries
+        with self._lock:
+            entries.setdefault(key, {}).update(fields)
+
+    def remove_missing(self, keys) -> int:
+        """Drop entries whose key is not in keys; return how many."""
+        keys = set(keys)
+        entries = self.entries
+        with self._lock:
+            stale = [key for key in entries if key not in keys]
+            for key in stale:
+                del entries[key]
+        return len(stale)
+
+    def save(self) -> None:
+        """Write the catalog to disk."""
+        entries = self.entries
+        with self._lock:
+            data = json.dumps(entries, indent=2)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        tmp_path.replace(self.path)
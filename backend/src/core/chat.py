@@ -1,4 +1,14 @@
-import ollama
+import sys
+import time
+
+from core.client import chunk_metrics, get_client
+from core.coalesce import request_key
+from core.history import ConversationTree, estimate_tokens
+from core.spill import SpillStore
+from core.summarizer import content_key
+from core.compare import compare_models, sample_candidates
+
+RECENT_CONTEXT_MESSAGES = 4
 
 
 class ChatSession:
@@ -7,6 +17,16 @@ class ChatSession:
     This class tracks conversation history, the current system prompt,
     and active persona/subject metadata. It provides helper methods to
     send messages (with or without streaming) and to switch models.
+
+    History is kept in a ConversationTree so past turns can be forked or
+    edited into branches that share their common prefix;
+    conversation_history returns the active branch as a list of dicts.
+    With a memory window enabled, older turns are spilled to disk and
+    only the window is kept in memory and sent to the model. If a
+    summarizer is attached, each spilled batch is summarized in the
+    background and the finished summaries are sent in its place. With a
+    knowledge base attached, the passages of the subject's documents
+    relevant to each prompt are added to the system message.
     """
 
     def __init__(self, model: str = "llama3"):
@@ -15,11 +35,45 @@ class ChatSession:
         Args:
             model: Name of the Ollama model to use for this session.
         """
-        self.conversation_history = []
+        self.history = ConversationTree()
         self.system_prompt = ""
+        self._system_message = None
         self.current_persona = None
         self.current_subject = None
         self.model = model
+        self.options = None
+        self.profiles = None
+        self.last_options = None
+        self.last_options_model = None
+        self.flights = None
+        self.knowledge = None
+        self._reference = ""
+        self.usage = None
+        self.response_cache = None
+        self.semantic_cache = None
+        self.last_cache_hit = None
+        self.last_error = None
+        self.skip_cache_once = False
+        self.router = None
+        self.last_route = None
+        self.window_messages = None
+        self.spill_store = None
+        self._spill_path = None
+        self.summarizer = None
+        self._summary_key = None
+        self.checkpoint_interval = 2.0
+        self.on_checkpoint = None
+        self.cancel_event = None
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel_event (if attached) asks the running reply to stop."""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    @property
+    def conversation_history(self) -> list[dict]:
+        """Messages on the active branch, as a new list of dicts."""
+        return self.history.as_dicts()
 
     def set_system_prompt(self, prompt: str) -> None:
         """Set the system prompt for this session.
@@ -38,6 +92,7 @@ class ChatSession:
         """
         self.current_persona = persona
         self.current_subject = subject
+        self._reference = ""
 
     def add_message(self, role: str, content: str) -> None:
         """Add a message to the conversation history.
@@ -46,7 +101,158 @@ class ChatSession:
             role: Message sender role ("user" or "assistant").
             content: Message text content.
         """
-        self.conversation_history.append({"role": role, "content": content})
+        self.history.append(role, content)
+        self._maybe_spill()
+
+    def enable_spill(self, spill_path, window_messages: int = 200) -> None:
+        """Keep at most window_messages in memory, spilling older ones.
+
+        Args:
+            spill_path: Segment file used for spilled messages.
+            window_messages: In-memory window size (None disables spilling
+                for future messages; already spilled ones stay on disk).
+        """
+        self.window_messages = window_messages
+        self._spill_path = spill_path
+        self._maybe_spill()
+
+    def set_window(self, window_messages: int | None) -> bool:
+        """Change the in-memory window size (None keeps everything).
+
+        Returns:
+            False if no spill file was configured with enable_spill.
+        """
+        if window_messages is not None and self._spill_path is None:
+            return False
+        self.window_messages = window_messages
+        self._maybe_spill()
+        return True
+
+    def _maybe_spill(self) -> None:
+        """Spill old messages once the in-memory window is exceeded.
+
+        Spilling trims the window to three quarters of its size so the
+        segment file is written in batches rather than on every message.
+        """
+        if not self.window_messages or len(self.history.nodes()) <= self.window_messages:
+            return
+        if self.spill_store is None:
+            self.spill_store = SpillStore(self._spill_path)
+        if self.history.spill(self.spill_store, self.window_messages * 3 // 4):
+            self._request_spill_summary()
+
+    def _request_spill_summary(self) -> None:
+        """Queue a background summary of the batch that was just spilled."""
+        marker = self.history.spilled_marker()
+        if self.summarizer is None or marker is None:
+            return
+        text = "\n".join(
+            f"{role.capitalize()}: {content}"
+            for role, content in self.spill_store.iter_records([(marker.start, marker.count)])
+        )
+        marker.digest = content_key(text)
+        self.summarizer.request(marker.digest, text)
+
+    def spilled_summary(self) -> tuple[str, int]:
+        """Return finished summaries of the spilled turns on the active branch.
+
+        Only summaries already on disk are used; batches still being
+        summarized are counted but never waited for.
+
+        Returns:
+            (summary_text, missing) where missing is the number of spilled
+            batches without a summary yet.
+        """
+        marker = self.history.spilled_marker()
+        if marker is None or self.summarizer is None:
+            return "", 0
+
+        parts = []
+        missing = 0
+        for batch in marker.markers():
+            summary = self.summarizer.get(batch.digest) if batch.digest else None
+            if summary is None:
+                missing += 1
+            else:
+                parts.append(summary)
+        return "\n\n".join(parts), missing
+
+    def spilled_count(self) -> int:
+        """Number of active-branch messages currently held on disk."""
+        marker = self.history.spilled_marker()
+        return marker.depth if marker is not None else 0
+
+    def iter_full_history(self):
+        """Yield every message on the active branch, spilled ones included.
+
+        Spilled messages are read lazily from the segment file and yielded
+        as dicts; in-memory messages are yielded as MessageNodes.
+        """
+        marker = self.history.spilled_marker()
+        if marker is not None and self.spill_store is not None:
+            for role, content in self.spill_store.iter_records(marker.ranges()):
+                yield {"role": role, "content": content}
+        yield from self.history.nodes()
+
+    def search_history(self, query: str) -> list[tuple[int, str, str]]:
+        """Find messages containing query on the active branch.
+
+        Returns:
+            List of (message_number, role, content), 1-based, oldest first.
+        """
+        matches = []
+        offset = 0
+        marker = self.history.spilled_marker()
+        if marker is not None and self.spill_store is not None:
+            for position, role, content in self.spill_store.search(query, marker.ranges()):
+                matches.append((position + 1, role, content))
+            offset = marker.depth
+
+        needle = query.lower()
+        for position, node in enumerate(self.history.nodes(), start=offset + 1):
+            if needle in node.content.lower():
+                matches.append((position, node.role, node.content))
+        return matches
+
+    def close(self) -> None:
+        """Release resources held by the session (the spill segment file).
+
+        Unsaved semantic cache entries are written first; the cache may be
+        shared with other sessions, and saving it again is a no-op.
+        """
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
+        if self.spill_store is not None:
+            self.spill_store.close()
+            self.spill_store = None
+
+    def spawn(self, spill_path=None) -> "ChatSession":
+        """Return a new session with this one's settings and no history.
+
+        Persona, subject, system prompt, model and options are copied;
+        the response caches, router, summarizer, knowledge base, usage
+        log and in-flight request coalescing are shared.
+
+        Args:
+            spill_path: Segment file for the new session's spilled turns,
+                used with this session's window size.
+        """
+        chat = ChatSession(model=self.model)
+        chat.set_system_prompt(self.system_prompt)
+        chat.set_subject_info(self.current_persona, self.current_subject)
+        chat.options = self.options
+        chat.profiles = self.profiles
+        chat.flights = self.flights
+        chat.knowledge = self.knowledge
+        chat.usage = self.usage
+        chat.response_cache = self.response_cache
+        chat.semantic_cache = self.semantic_cache
+        chat.router = self.router
+        chat.summarizer = self.summarizer
+        chat.checkpoint_interval = self.checkpoint_interval
+        if spill_path is not None:
+            chat.enable_spill(spill_path, self.window_messages)
+        return chat
 
     def get_full_context(self) -> dict:
         """Return the full context payload for API calls.
@@ -59,42 +265,286 @@ class ChatSession:
             "history": self.conversation_history,
         }
 
+    def _build_messages(self) -> list:
+        """Build the message list sent to Ollama for the next request.
+
+        History nodes are passed as-is (they act as read-only role/content
+        mappings), so neither message content nor per-message dicts are
+        copied; only the list of references is new. Summaries of spilled
+        turns, when available, and reference passages for the current
+        prompt are appended to the system message.
+        """
+        messages = []
+        summary, _ = self.spilled_summary()
+        reference = self._reference
+        if self.system_prompt or summary or reference:
+            key = (self.system_prompt, summary, reference)
+            system = self._system_message
+            if system is None or self._summary_key != key:
+                content = self.system_prompt
+                if summary:
+                    content += f"\n\n# Summary of Earlier Conversation\n{summary}"
+                if reference:
+                    content += f"\n\n# Reference Material\n{reference}"
+                system = self._system_message = {"role": "system", "content": content}
+                self._summary_key = key
+            messages.append(system)
+        messages.extend(self.history.nodes())
+        return messages
+
+    def _update_reference(self, user_message: str) -> None:
+        """Select the knowledge passages sent with the next request."""
+        if self.knowledge is not None:
+            self._reference = self.knowledge.reference_for(self.current_subject, user_message)
+
+    def _prompt_tokens(self, messages) -> int:
+        """Estimate the tokens in a message list built by _build_messages."""
+        tokens = self.history.window_token_count()
+        for message in messages:
+            if isinstance(message, dict):
+                tokens += estimate_tokens(message["content"])
+        return tokens
+
+    def _record_usage(self, model: str, messages, metrics: dict | None, cached: bool = False,
+                      escalated: bool = False) -> None:
+        """Append one generation to the usage log, if attached (see core.usage)."""
+        if self.usage is None:
+            return
+        metrics = dict(metrics or {})
+        if not metrics.get("prompt_tokens") and not cached:
+            metrics["prompt_tokens"] = self._prompt_tokens(messages)
+        self.usage.record(self.current_persona, self.current_subject, model, metrics, cached, escalated)
+
+    def _record_generations(self, messages, generations) -> None:
+        """Record the usage of one turn's generations.
+
+        generations holds (model, metrics) per finished generation
+        (see _complete and _stream_content); all but the last were
+        escalated, so the turn counts as one message.
+        """
+        for i, (model, metrics) in enumerate(generations):
+            self._record_usage(model, messages, metrics, escalated=i < len(generations) - 1)
+
+    def _record_results(self, messages, results) -> None:
+        """Record the usage of every finished /compare or /regenerate result."""
+        for result in results:
+            if result["error"] is None:
+                self._record_usage(result["model"], messages, result["metrics"])
+
+    def options_for(self, model: str, messages=None, command: str = "chat") -> dict | None:
+        """Return the Ollama options for a request to model.
+
+        With generation profiles attached, options come from the profile
+        for this model, persona, subject and command, with num_ctx sized
+        to messages (by default, what the next request would send; see
+        core.profiles). The session's own options, if set, override the
+        profile. Nothing is recorded, so this can size requests that are
+        not sent as chat turns (e.g. model warm-up).
+        """
+        if self.profiles is None:
+            return self.options
+        if messages is None:
+            messages = self._build_messages()
+        tokens = self._prompt_tokens(messages)
+        options = self.profiles.options_for(model, self.current_persona, self.current_subject, tokens, command)
+        if self.options:
+            options.update(self.options)
+        return options
+
+    def request_options(self, model: str, messages, command: str = "chat") -> dict | None:
+        """Return the options for a request being sent (see options_for).
+
+        The result is kept in last_options (and model in
+        last_options_model) for /gen.
+        """
+        options = self.options_for(model, messages, command)
+        self.last_options = options
+        self.last_options_model = model
+        return options
+
+    def _chat(self, model: str, messages, stream: bool = False, on_join=None):
+        """Call the Ollama chat API with this session's options.
+
+        With flights (a SingleFlight) attached, a streamed request that
+        is identical to one already in flight reads that request's
+        chunks instead of starting another generation (and on_join is
+        called).
+        """
+        options = self.request_options(model, messages)
+        if stream and self.flights is not None:
+            return self.flights.stream(
+                request_key(model, messages, options),
+                lambda: get_client().chat(model=model, messages=messages, stream=True, options=options),
+                on_join,
+            )
+        return get_client().chat(model=model, messages=messages, stream=stream, options=options)
+
+    def _select_model(self, user_message: str, messages) -> tuple[str, str | None]:
+        """Pick the model for this request, consulting the router if set.
+
+        Returns:
+            (model, route) where route is None when routing is off.
+        """
+        if self.router is None:
+            self.last_route = None
+            return self.model, None
+
+        context_chars = len(self.system_prompt) + 4 * self.history.window_token_count()
+        route, reason = self.router.classify(user_message, context_chars)
+        model = self.router.model_for(route)
+        self.last_route = {"route": route, "reason": reason, "model": model}
+        return model, route
+
+    def _record_route(self, route: str | None, start: float) -> None:
+        """Report a finished routed request to the router."""
+        if route is not None:
+            self.last_route["route"] = route
+            if route == "escalated":
+                self.last_route["model"] = self.router.large_model
+            self.router.record(route, time.perf_counter() - start)
+
+    def _cache_context(self, model: str) -> tuple:
+        """Return the context the semantic cache matches prompts in.
+
+        (persona, subject, model, digest) where digest covers the last
+        RECENT_CONTEXT_MESSAGES messages before the current prompt, so a
+        follow-up question only matches prompts asked after the same
+        exchange ("" for the first prompt of a conversation).
+        """
+        recent = self.history.nodes()[-(RECENT_CONTEXT_MESSAGES + 1):-1]
+        digest = content_key("\n".join(f"{node.role}: {node.content}" for node in recent)) if recent else ""
+        return (self.current_persona, self.current_subject, model, digest)
+
+    def _lookup_cache(self, user_message: str, messages, model: str):
+        """Check the exact and semantic caches for a stored response.
+
+        Sets last_cache_hit to describe the match (or None). After
+        skip_cache_once is set, one request skips the lookups but still
+        returns pending, so its fresh response overwrites the cached ones.
+
+        Args:
+            user_message: The prompt just added to history.
+            messages: Full message list for the request.
+            model: Model that will answer the request.
+
+        Returns:
+            (cached_response, pending) where cached_response is the stored
+            text or None, and pending is passed to _store_cached once a
+            fresh response has been generated.
+        """
+        self.last_cache_hit = None
+        refresh = self.skip_cache_once
+        self.skip_cache_once = False
+
+        key = None
+        cache = self.response_cache
+        if cache is not None:
+            if cache.is_bypassed(self.current_subject):
+                cache.bypassed += 1
+                return None, None
+            key = cache.make_key(model, self.request_options(model, messages), self.system_prompt, messages)
+            cached = None if refresh else cache.get(key)
+            if cached is not None:
+                self.last_cache_hit = {"tier": "exact", "prompt": user_message, "similarity": 1.0}
+                return cached, None
+
+        vector = context = None
+        if self.semantic_cache is not None:
+            context = self._cache_context(model)
+            if refresh:
+                match, vector = None, self.semantic_cache.embed(user_message)
+            else:
+                match, vector = self.semantic_cache.lookup(context, user_message)
+            if match is not None:
+                self.last_cache_hit = {
+                    "tier": "semantic",
+                    "prompt": match["prompt"],
+                    "similarity": match["similarity"],
+                }
+                return match["response"], None
+
+        return None, (key, vector, context, user_message, model)
+
+    def _store_cached(self, pending, response: str) -> None:
+        """Save a freshly generated response in whichever caches are active."""
+        if pending is None:
+            return
+
+        key, vector, context, user_message, model = pending
+        if key is not None and self.response_cache is not None:
+            self.response_cache.put(
+                key,
+                response,
+                model=model,
+                persona=self.current_persona,
+                subject=self.current_subject,
+            )
+        if vector is not None and self.semantic_cache is not None:
+            self.semantic_cache.add(context, user_message, response, vector)
+
     def send_message(self, user_message: str) -> str:
         """Send a message to Ollama and return the full response.
 
         The user's message is appended to history, the system prompt
         is prepended (if set), and the assistant response is stored.
+        When a response cache is attached, an exact (or, with a semantic
+        cache, a close enough) match is returned without calling the model.
+        When a router is attached, the model is chosen per prompt and
+        low-confidence small-model answers are escalated.
 
         Args:
             user_message: The text of the user message to send.
 
         Returns:
             Assistant response content, or an error message string if
-            the call fails.
+            the call fails (the message is also kept in last_error).
         """
+        self.last_error = None
         self.add_message("user", user_message)
+        self._update_reference(user_message)
+        messages = self._build_messages()
+        model, route = self._select_model(user_message, messages)
 
-        messages = []
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-        messages.extend(self.conversation_history)
+        cached, pending = self._lookup_cache(user_message, messages, model)
+        if cached is not None:
+            self._record_usage(model, messages, None, cached=True)
+            self.add_message("assistant", cached)
+            return cached
 
+        generations = []
         try:
-            response = ollama.chat(model=self.model, messages=messages)
-            response_content = response["message"]["content"]
+            start = time.perf_counter()
+            response_content = self._complete(model, messages, generations)
+            if route == "small" and not self.router.is_confident(response_content):
+                route = "escalated"
+                response_content = self._complete(self.router.large_model, messages, generations)
+            self._record_route(route, start)
             self.add_message("assistant", response_content)
+            self._store_cached(pending, response_content)
             return response_content
         except Exception as e:
             error_msg = f"Error communicating with Ollama: {str(e)}"
-            print(f"✗ {error_msg}")
+            self.last_error = error_msg
+            print(f"✗ {error_msg}", file=sys.stderr)
             return error_msg
+        finally:
+            self._record_generations(messages, generations)
 
     def send_message_stream(self, user_message: str):
         """Send a message and yield the response as a stream of chunks.
 
         This behaves like send_message, but yields partial response text
-        as it arrives. The full assistant response is stored in history
-        once streaming completes.
+        as it arrives. Chunks are collected in a list and joined once, so
+        long replies cost linear time. Every checkpoint_interval seconds
+        the partial reply is stored in history (and on_checkpoint is
+        called), and if the stream fails or is abandoned the text
+        generated so far is kept as the reply. Cache hits are yielded as
+        one chunk.
+        If a routed small-model answer is escalated, a notice chunk is
+        yielded and the large model's answer follows; only that answer
+        is kept in history. When cancel_event is set, the stream is
+        closed after the current chunk and the text so far is kept as
+        the reply (it is not cached or escalated).
 
         Args:
             user_message: The text of the user message to send.
@@ -102,54 +552,237 @@ class ChatSession:
         Yields:
             Small string chunks of the assistant response.
         """
+        self.last_error = None
+        if self.cancelled:
+            return
         self.add_message("user", user_message)
-
-        messages = []
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-        messages.extend(self.conversation_history)
-
+        self._update_reference(user_message)
+        messages = self._build_messages()
+        model, route = self._select_model(user_message, messages)
+
+        cached, pending = self._lookup_cache(user_message, messages, model)
+        if cached is not None:
+            self._record_usage(model, messages, None, cached=True)
+            self.add_message("assistant", cached)
+            yield cached
+            return
+
+        user_node = self.history.head
+        parts = []
+        generations = []
+        stored = False
         try:
-            full_response = ""
-            for chunk in ollama.chat(model=self.model, messages=messages, stream=True):
-                content = chunk["message"]["content"]
-                full_response += content
+            start = time.perf_counter()
+            last_checkpoint = start
+            for content in self._stream_content(model, messages, generations):
+                parts.append(content)
                 yield content
-
+                now = time.perf_counter()
+                if now - last_checkpoint >= self.checkpoint_interval:
+                    self._store_partial(user_node, parts)
+                    last_checkpoint = now
+            if self.cancelled:
+                return
+
+            if route == "small" and not self.router.is_confident("".join(parts)):
+                route = "escalated"
+                yield f"\n\n[router] Low-confidence answer, escalating to {self.router.large_model}...\n\n"
+                parts = []
+                for content in self._stream_content(self.router.large_model, messages, generations):
+                    parts.append(content)
+                    yield content
+                    now = time.perf_counter()
+                    if now - last_checkpoint >= self.checkpoint_interval:
+                        self._store_partial(user_node, parts)
+                        last_checkpoint = now
+                if self.cancelled:
+                    return
+
+            self._record_route(route, start)
+            full_response = "".join(parts)
+            self.history.truncate_to(user_node)
             self.add_message("assistant", full_response)
+            stored = True
+            self._store_cached(pending, full_response)
         except Exception as e:
             error_msg = f"Error communicating with Ollama: {str(e)}"
-            print(f"✗ {error_msg}")
+            self.last_error = error_msg
+            print(f"✗ {error_msg}", file=sys.stderr)
             yield error_msg
+        finally:
+            # Keep whatever was generated if the stream failed or was abandoned
+            if not stored:
+                self._store_partial(user_node, parts)
+            self._record_generations(messages, generations)
+
+    def _complete(self, model: str, messages, generations: list) -> str:
+        """Return model's full (non-streamed) reply.
+
+        Its (model, metrics) is appended to generations for
+        _record_generations.
+        """
+        start = time.perf_counter()
+        response = self._chat(model, messages)
+        content = response["message"]["content"]
+        generations.append((model, chunk_metrics(response, start, None, time.perf_counter(), content)))
+        return content
+
+    def _stream_content(self, model: str, messages, generations: list):
+        """Yield the text of each streamed chunk from model.
+
+        When the stream ends, (model, metrics) with TTFT, throughput and
+        tokens is appended to generations for _record_generations, unless
+        the request joined an identical one in flight (whose caller
+        records it). If the session is cancelled, the stream is closed
+        after the chunk being read and what was generated is recorded.
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        last_chunk = None
+        parts = []
+        joined = []
+        stream = self._chat(model, messages, stream=True, on_join=lambda: joined.append(True))
+        try:
+            for chunk in stream:
+                content = chunk["message"]["content"]
+                if content and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                last_chunk = chunk
+                parts.append(content)
+                yield content
+                if self.cancelled:
+                    break
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        if self.usage is not None and not joined:
+            metrics = chunk_metrics(last_chunk, start, first_token_at, time.perf_counter(), "".join(parts))
+            generations.append((model, metrics))
+
+    def _store_partial(self, user_node, parts) -> None:
+        """Make the text generated so far the reply to user_node.
+
+        Any earlier partial reply is replaced (the tree is copy-on-write,
+        so this is a head move plus one new node), and on_checkpoint is
+        called so the partial reply can be autosaved.
+        """
+        self.history.truncate_to(user_node)
+        text = "".join(parts)
+        if text:
+            self.history.append("assistant", text)
+        if self.on_checkpoint is not None:
+            self.on_checkpoint()
+
+    def compare(self, user_message: str, models, on_result=None) -> list[dict]:
+        """Ask several models the same prompt without touching history.
+
+        The system prompt (with the knowledge passages for user_message,
+        as on a normal turn) and current history are sent unchanged to
+        every model. Use keep_exchange to store the chosen answer
+        afterwards.
+
+        Args:
+            user_message: Prompt to send to each model.
+            models: Model names to compare.
+            on_result: Optional callback invoked with (index, result) as
+                each model finishes.
+
+        Returns:
+            Result dicts as returned by core.compare.compare_models.
+        """
+        self._update_reference(user_message)
+        messages = self._build_messages()
+        messages.append({"role": "user", "content": user_message})
+        options = {model: self.request_options(model, messages, "compare") for model in models}
+        results = compare_models(models, messages, self.options, on_result, model_options=options)
+        self._record_results(messages, results)
+        return results
+
+    def regenerate(self, n: int, on_result=None):
+        """Drop the last assistant reply and sample n replacements.
+
+        The request payload is built once from the existing history (which
+        ends with the last user prompt) and shared by every candidate.
+        Pick a candidate with add_message("assistant", ...), or restore the
+        dropped reply if none is kept.
+
+        Args:
+            n: Number of candidates to generate concurrently.
+            on_result: Optional callback invoked with (index, result).
+
+        Returns:
+            (results, dropped_reply) where dropped_reply is the removed
+            assistant text (or None), or (None, None) if there is no user
+            prompt to answer.
+        """
+        dropped = None
+        last = self.history.last()
+        if last is not None and last.role == "assistant":
+            dropped = self.history.pop().content
+
+        last = self.history.last()
+        if last is None or last.role != "user":
+            if dropped is not None:
+                self.add_message("assistant", dropped)
+            return None, None
+
+        messages = self._build_messages()
+        options = self.request_options(self.model, messages, "regenerate")
+        results = sample_candidates(self.model, messages, n, options, on_result)
+        self._record_results(messages, results)
+        return results, dropped
+
+    def keep_exchange(self, user_message: str, response: str) -> None:
+        """Append a user prompt and a chosen assistant reply to history."""
+        self.add_message("user", user_message)
+        self.add_message("assistant", response)
 
     def clear_history(self) -> None:
         """Clear the stored conversation history.
 
-        Useful after switching persona/subject or models.
+        Useful after switching persona/subject or models. All branches
+        and any spilled messages are discarded.
         """
-        self.conversation_history = []
+        self.history = ConversationTree()
+        if self.spill_store is not None:
+            self.spill_store.close()
+            self.spill_store = None
+
+    def pop_last_exchange(self) -> str | None:
+        """Remove the last user prompt and any reply that followed it.
+
+        Returns:
+            The removed user prompt, or None if there is no user message.
+        """
+        for node in reversed(self.history.nodes()):
+            if node.role == "user":
+                self.history.truncate_to(node.parent)
+                return node.content
+        return None
 
     def load_history(self, conversation_history) -> None:
         """Load an existing conversation history into this session.
 
         Args:
             conversation_history: List of message dictionaries to use
-                as the new history.
+                as the new history. The messages are copied into the
+                active branch, so later changes to the list have no effect.
         """
-        self.conversation_history = conversation_history
+        self.history.load(conversation_history)
 
     def get_history_for_logging(self) -> str:
         """Format conversation history as a plain text log string.
 
+        Spilled messages are read back from disk, so the whole active
+        branch is included.
+
         Returns:
             A human‑readable string suitable for writing to log files.
         """
-        log_text = []
-        for msg in self.conversation_history:
-            role = msg["role"].capitalize()
-            content = msg["content"]
-            log_text.append(f"{role}:\n{content}\n")
-        return "\n".join(log_text)
+        return "\n".join(
+            f"{message['role'].capitalize()}:\n{message['content']}\n" for message in self.iter_full_history()
+        )
 
     def set_model(self, model_name: str) -> None:
         """Swap the underlying Ollama model for this session.
@@ -0,0 +1,138 @@
+"""Shared Ollama client.
+
+All model calls go through one process-wide ollama.Client so concurrent
+requests (compare mode, regenerate, background jobs) reuse the same HTTP
+connection pool instead of each opening their own.
+
+The ollama package is imported on first use because it is slow to
+import. stream_chat talks to the same /api/chat endpoint with only the
+standard library, for the one-shot CLI mode where startup time matters
+more than the client's features.
+"""
+
+import json
+import os
+import threading
+
+DEFAULT_HOST = "127.0.0.1:11434"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide Ollama client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import ollama
+
+                _client = ollama.Client()
+    return _client
+
+
+def stream_chat(model: str, messages, options: dict | None = None, timeout: float | None = None):
+    """Stream a chat reply from Ollama without importing the ollama package.
+
+    Uses OLLAMA_HOST (like the ollama client) or the default local server.
+
+    Args:
+        model: Model name.
+        messages: Message mappings with 'role' and 'content'.
+        options: Optional Ollama generation options.
+        timeout: Optional socket timeout in seconds.
+
+    Yields:
+        Response text chunks as they arrive.
+
+    Raises:
+        ConnectionError: If the server cannot be reached.
+        RuntimeError: If the server returns an error.
+    """
+    import http.client
+    from urllib.parse import urlsplit
+
+    host = os.environ.get("OLLAMA_HOST") or DEFAULT_HOST
+    url = urlsplit(host if "://" in host else f"http://{host}")
+    connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    default_port = 443 if url.scheme == "https" else 11434
+    connection = connection_class(url.hostname or "127.0.0.1", url.port or default_port, timeout=timeout)
+
+    payload = {
+        "model": model,
+        "messages": [{"role": m["role"], "content": m["content"]} for m in messages],
+        "stream": True,
+    }
+    if options:
+        payload["options"] = options
+
+    try:
+        try:
+            connection.request(
+                "POST",
+                url.path.rstrip("/") + "/api/chat",
+                body=json.dumps(payload),
+                headers={"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+        except OSError as e:
+            raise ConnectionError(f"Could not reach Ollama at {host}: {e}") from e
+
+        if response.status != 200:
+            detail = response.read(500).decode("utf-8", "replace")
+            raise RuntimeError(f"Ollama returned HTTP {response.status}: {detail}")
+
+        for line in response:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            content = data.get("message", {}).get("content", "")
+            if content:
+                yield content
+            if data.get("done"):
+                break
+    finally:
+        connection.close()
+
+
+def chunk_metrics(chunk, start: float, first_token_at: float | None, end: float, text: str) -> dict:
+    """Compute latency and throughput figures for a finished stream.
+
+    Args:
+        chunk: Final chunk of the stream (carries eval counters when the
+            server reports them), or None.
+        start: perf_counter() value when the request was sent.
+        first_token_at: perf_counter() value of the first non-empty chunk.
+        end: perf_counter() value when the stream finished.
+        text: Full generated text (used to estimate tokens if the server
+            did not report eval_count).
+
+    Returns:
+        Dict with 'ttft', 'duration', 'tokens', 'tokens_per_s',
+        and 'prompt_tokens'.
+    """
+    eval_count = chunk.get("eval_count") if chunk is not None else None
+    eval_duration = chunk.get("eval_duration") if chunk is not None else None
+    prompt_tokens = chunk.get("prompt_eval_count") if chunk is not None else None
+
+    ttft = (first_token_at - start) if first_token_at is not None else None
+    duration = end - start
+
+    if eval_count and eval_duration:
+        tokens = eval_count
+        tokens_per_s = eval_count / (eval_duration / 1e9)
+    else:
+        tokens = max(1, len(text) // 4) if text else 0
+        generating = duration - (ttft or 0.0)
+        tokens_per_s = tokens / generating if generating > 0 else 0.0
+
+    return {
+        "ttft": ttft,
+        "duration": duration,
+        "tokens": tokens,
+        "tokens_per_s": tokens_per_s,
+        "prompt_tokens": prompt_tokens,
+    }
@@ -0,0 +1,137 @@
+"""Single-flight coalescing of identical streaming requests.
+
+When the same prompt is sent with the same model, messages and options
+while an identical request is still streaming (two batch items with the
+same prompt, two sessions asking the same question), SingleFlight
+attaches the second caller to the request already in flight instead of
+starting another generation. Each flight is read from Ollama by one
+pump thread into a shared chunk list; every caller reads that list at
+its own pace, so a caller that joins late first gets the chunks it
+missed and then follows the live stream.
+
+Only requests that are in flight are shared: once a stream finishes,
+the next identical request starts a new generation (use the response
+cache to reuse finished answers). A caller that stops reading does not
+affect the others; the upstream stream is closed when the last caller
+stops.
+"""
+
+import hashlib
+import json
+import threading
+
+
+def request_key(model: str, messages, options: dict | None = None) -> str:
+    """Return the coalescing key for a chat request."""
+    payload = {
+        "model": model,
+        "messages": [[m["role"], m["content"]] for m in messages],
+        "options": options or {},
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One upstream stream and the callers reading it."""
+
+    __slots__ = ("chunks", "done", "error", "readers", "changed")
+
+    def __init__(self, lock: threading.Lock):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.readers = 0
+        self.changed = threading.Condition(lock)
+
+
+class SingleFlight:
+    """Share one upstream stream between identical concurrent requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.started = 0
+        self.joined = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of upstream streams currently running."""
+        return len(self._flights)
+
+    def stream(self, key: str, start, on_join=None):
+        """Yield the chunks of the request identified by key.
+
+        Args:
+            key: Request identity (see request_key).
+            start: Callable returning the upstream chunk iterator; only
+                called if no identical request is in flight.
+            on_join: Optional callable, called if this caller joins a
+                request already in flight, so per-generation bookkeeping
+                (such as usage) is done only by the caller that started it.
+
+        Yields:
+            Upstream chunks, from the first one, in order.
+
+        Raises:
+            Exception: Whatever the upstream stream raised, after the
+                chunks received before the error.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(self._lock)
+                self.started += 1
+                threading.Thread(target=self._pump, args=(key, flight, start), name="coalesce", daemon=True).start()
+            else:
+                self.joined += 1
+                if on_join is not None:
+                    on_join()
+            flight.readers += 1
+
+        position = 0
+        try:
+            while True:
+                with self._lock:
+                    while position == len(flight.chunks) and not flight.done:
+                        flight.changed.wait()
+                    chunks = flight.chunks[position:]
+                    done, error = flight.done, flight.error
+                position += len(chunks)
+                yield from chunks
+                if done and position == len(flight.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                flight.readers -= 1
+                if flight.readers == 0 and self._flights.get(key) is flight:
+                    # Nobody is reading any more: stop and let the next request start fresh
+                    del self._flights[key]
+
+    def _pump(self, key: str, flight: _Flight, start) -> None:
+        """Read the upstream stream into flight until it ends or is abandoned."""
+        upstream = None
+        error = None
+        try:
+            upstream = start()
+            for chunk in upstream:
+                with self._lock:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+                    if flight.readers == 0:
+                        break
+        except Exception as e:
+            error = e
+        finally:
+            close = getattr(upstream, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                flight.error = error
+                flight.done = True
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.changed.notify_all()
+
@@ -0,0 +1,108 @@
+"""Concurrent fan-out of one request to several models or samples.
+
+compare_models sends the same message list to each model on its own
+worker thread through the shared Ollama client; sample_candidates asks
+one model for several answers with different seeds and temperatures.
+Both report each result as soon as it finishes, together with its time
+to first token (TTFT) and generation throughput. The message list is
+built once by the caller and shared read-only by every worker.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.client import get_client, chunk_metrics
+
+
+def _run_one(label: str, model: str, messages, options) -> dict:
+    """Stream one model's answer and measure it."""
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    last_chunk = None
+
+    try:
+        for chunk in get_client().chat(model=model, messages=messages, stream=True, options=options):
+            content = chunk["message"]["content"]
+            if content and first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(content)
+            last_chunk = chunk
+    except Exception as e:
+        return {"label": label, "model": model, "options": options, "response": "", "error": str(e), "metrics": None}
+
+    text = "".join(parts)
+    metrics = chunk_metrics(last_chunk, start, first_token_at, time.perf_counter(), text)
+    return {"label": label, "model": model, "options": options, "response": text, "error": None, "metrics": metrics}
+
+
+def _fan_out(jobs, messages, on_result) -> list[dict]:
+    """Run (label, model, options) jobs concurrently against messages.
+
+    Returns:
+        Result dicts in the same order as jobs.
+    """
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {
+            pool.submit(_run_one, label, model, messages, options): index
+            for index, (label, model, options) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result is not None:
+                on_result(futures[future], result)
+    return results
+
+
+def compare_models(models, messages, options=None, on_result=None, model_options=None) -> list[dict]:
+    """Send the same messages to several models concurrently.
+
+    Args:
+        models: Model names to query.
+        messages: Message list shared (read-only) by every request.
+        options: Optional generation options passed to each request.
+        on_result: Optional callback invoked with (index, result) as
+            soon as each model finishes.
+        model_options: Optional {model: options} used instead of options
+            for the models it lists.
+
+    Returns:
+        Result dicts in the order of `models`, each with 'label', 'model',
+        'options', 'response', 'error', and 'metrics' keys.
+    """
+    model_options = model_options or {}
+    jobs = [(model, model, model_options.get(model, options)) for model in models]
+    return _fan_out(jobs, messages, on_result)
+
+
+def sample_candidates(model: str, messages, n: int, options=None, on_result=None) -> list[dict]:
+    """Request n alternative answers from one model concurrently.
+
+    Each candidate gets its own seed, and temperatures are spread around
+    the session's base temperature so the answers actually differ.
+
+    Args:
+        model: Model to sample from.
+        messages: Message list shared (read-only) by every request.
+        n: Number of candidates.
+        options: Base generation options.
+        on_result: Optional callback invoked with (index, result).
+
+    Returns:
+        Result dicts in candidate order.
+    """
+    base = dict(options or {})
+    base_temperature = base.get("temperature", 0.8)
+    seed = int(time.time())
+
+    jobs = []
+    for i in range(n):
+        candidate_options = dict(base)
+        candidate_options["seed"] = seed + i
+        candidate_options["temperature"] = max(round(base_temperature + 0.1 * (i - (n - 1) / 2), 2), 0.0)
+        label = f"seed {candidate_options['seed']}, temp {candidate_options['temperature']}"
+        jobs.append((label, model, candidate_options))
+
+    return _fan_out(jobs, messages, on_result)
@@ -0,0 +1,152 @@
+"""Parallel scanning of saved chat files.
+
+Whole-corpus work (indexing the chat catalog, counting tokens, rebuilding
+analytics) used to call SubjectRetriever.load_chat_file on every file in
+turn. scan_corpus instead runs a picklable per-file function over the
+files on a process pool, several files per task so inter-process
+traffic stays small, and yields each file's compact result as its batch
+finishes. Callers get progress callbacks and can cancel the scan with an
+Event or by closing the generator; tasks not yet started are dropped.
+
+Small scans run in the calling process, where starting a pool would
+cost more than it saves.
+
+parse_chat_text is the chat-file parser shared by load_chat_file and
+the scan functions; it only parses and neither reads files nor prints.
+"""
+
+import os
+
+from core.history import estimate_tokens
+
+BATCH_FILES = 16
+INLINE_FILES = 64
+
+USER_MARKER = "**user:**"
+ASSISTANT_MARKER = "**assistant:**"
+
+
+def parse_chat_text(text: str) -> list[dict]:
+    """Parse saved chat markdown into role/content message dicts.
+
+    Lines starting with **User:** or **Assistant:** (any case) begin a
+    message; text before the first marker is ignored.
+    """
+    messages = []
+    current_role = None
+    current_content = []
+
+    for line in text.split("\n"):
+        marker = line.strip().lower()
+        if marker.startswith(USER_MARKER) or marker.startswith(ASSISTANT_MARKER):
+            if current_role and current_content:
+                messages.append({"role": current_role, "content": "\n".join(current_content).strip()})
+            current_role = "user" if marker.startswith(USER_MARKER) else "assistant"
+            current_content = []
+        elif current_role is not None:
+            current_content.append(line)
+
+    if current_role and current_content:
+        messages.append({"role": current_role, "content": "\n".join(current_content).strip()})
+    return messages
+
+
+def chat_file_summary(path) -> dict:
+    """Return compact catalog figures for one chat file.
+
+    Returns:
+        {"messages", "preview", "tokens"}: message count, the first line
+        of the first prompt (80 characters) and estimated tokens.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        messages = parse_chat_text(f.read())
+    preview = ""
+    for message in messages:
+        if message["role"] == "user" and message["content"]:
+            preview = message["content"].splitlines()[0].strip()[:80]
+            break
+    return {
+        "messages": len(messages),
+        "preview": preview,
+        "tokens": sum(estimate_tokens(message["content"]) for message in messages),
+    }
+
+
+def _run_batch(function, batch):
+    """Apply function to each (key, path) pair; errors are returned, not raised."""
+    results = []
+    for key, path in batch:
+        try:
+            results.append((key, function(path), None))
+        except Exception as e:
+            results.append((key, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def default_workers() -> int:
+    """Worker processes used when none are requested (CPU count, max 8)."""
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def scan_corpus(files, function=chat_file_summary, workers: int | None = None, batch_files: int = BATCH_FILES,
+                on_progress=None, cancel=None):
+    """Run function over many files in parallel.
+
+    Args:
+        files: Sequence of (key, path) pairs.
+        function: Module-level (picklable) callable(path) -> result.
+        workers: Worker processes (default: default_workers()).
+        batch_files: Files per pool task.
+        on_progress: Optional callback(done, total) after each batch.
+        cancel: Optional threading.Event; when set, no further batches
+            are started and the scan stops after the running ones.
+
+    Yields:
+        (key, result, error) per file in completion order; error is a
+        message (and result None) if function raised for that file.
+    """
+    files = list(files)
+    total = len(files)
+    batches = [files[i:i + batch_files] for i in range(0, total, batch_files)]
+    workers = workers or default_workers()
+    done = 0
+
+    if total <= INLINE_FILES or workers == 1:
+        for batch in batches:
+            if cancel is not None and cancel.is_set():
+                return
+            for item in _run_batch(function, batch):
+                yield item
+            done += len(batch)
+            if on_progress is not None:
+                on_progress(done, total)
+        return
+
+    # Imported here so loading the parser (retriever startup) stays cheap
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    # spawn, not fork: the app runs threads (prompt queue, jobs, autosave)
+    context = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)), mp_context=context)
+    pending = iter(batches)
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < 2 * workers and not (cancel is not None and cancel.is_set()):
+                batch = next(pending, None)
+                if batch is None:
+                    break
+                in_flight[pool.submit(_run_batch, function, batch)] = len(batch)
+            if not in_flight:
+                return
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                count = in_flight.pop(future)
+                for item in future.result():
+                    yield item
+                done += count
+                if on_progress is not None:
+                    on_progress(done, total)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,349 @@
+"""Copy-on-write conversation tree for ChatSession.
+
+Messages are stored as immutable nodes that point at their parent, so a
+conversation is the path from a branch head back to the root. Forking,
+editing a past prompt, or regenerating only moves or adds a head; every
+branch shares its common prefix with the others instead of copying it,
+so memory grows with unique content rather than with branch count.
+
+Nodes are compact: they use __slots__, share interned role strings, and
+keep a running estimated token total for the whole path, so context
+size is known in O(1). A node also behaves as a read-only
+{'role', 'content'} mapping, which lets ChatSession pass nodes straight
+to the Ollama client as the request payload instead of building a dict
+per message every turn. Log and markdown renderings are produced on
+demand rather than stored, so resident memory stays close to the size
+of the message text itself.
+
+When a memory window is set, the oldest messages of a branch are moved
+to a SpillStore and replaced by a SpillMarker (see core.spill); nodes()
+then returns only the in-memory window. Turns are still numbered from
+the start of the conversation: the first in-memory user turn is number
+spilled_turns() + 1.
+"""
+
+import sys
+
+from core.spill import SpillMarker
+
+ROLES = {role: sys.intern(role) for role in ("system", "user", "assistant")}
+_KEYS = ("role", "content")
+_TEXT_LABELS = {role: f"{role.capitalize()}:\n" for role in ROLES}
+_MARKDOWN_LABELS = {role: f"**{role.capitalize()}:**\n" for role in ROLES}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class MessageNode:
+    """One message in the conversation tree."""
+
+    __slots__ = ("role", "content", "parent", "depth", "total_tokens")
+
+    def __init__(self, role: str, content: str, parent=None):
+        """Create a node appended after parent.
+
+        Args:
+            role: Message sender role ("user" or "assistant").
+            content: Message text.
+            parent: Previous MessageNode, or None for the first message.
+        """
+        self.role = ROLES.get(role) or sys.intern(role)
+        self.content = content
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 1
+        self.total_tokens = estimate_tokens(content) + (parent.total_tokens if parent is not None else 0)
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens in this message alone."""
+        return self.total_tokens - (self.parent.total_tokens if self.parent is not None else 0)
+
+    def keys(self):
+        """Mapping protocol: the payload keys ('role', 'content')."""
+        return _KEYS
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def as_dict(self) -> dict:
+        """Return the message as a new {'role', 'content'} dict."""
+        return {"role": self.role, "content": self.content}
+
+    def as_text(self) -> str:
+        """Return the plain-text log form ("Role:\ncontent\n")."""
+        label = _TEXT_LABELS.get(self.role) or f"{self.role.capitalize()}:\n"
+        return f"{label}{self.content}\n"
+
+    def as_markdown(self) -> str:
+        """Return the chat-file markdown form ("**Role:**\ncontent\n")."""
+        label = _MARKDOWN_LABELS.get(self.role) or f"**{self.role.capitalize()}:**\n"
+        return f"{label}{self.content}\n"
+
+
+class ConversationTree:
+    """Named branches over a shared tree of MessageNodes."""
+
+    def __init__(self):
+        """Create an empty tree with a single 'main' branch."""
+        self.branches = {"main": None}
+        self.active = "main"
+        self._path = []
+
+    @property
+    def head(self):
+        """Last node of the active branch (None if it is empty)."""
+        return self.branches[self.active]
+
+    def _set_head(self, node) -> None:
+        self.branches[self.active] = node
+
+    def __len__(self) -> int:
+        head = self.head
+        return head.depth if head is not None else 0
+
+    def append(self, role: str, content: str):
+        """Append a message to the active branch and return its node."""
+        node = MessageNode(role, content, self.head)
+        self._set_head(node)
+        return node
+
+    def nodes(self) -> list:
+        """Return the active branch's nodes from first to last.
+
+        The list is cached and updated incrementally as messages are
+        appended, so callers must not modify it.
+        """
+        head = self.head
+        path = self._path
+        if path and path[-1] is head or head is None and not path:
+            return path
+
+        if head is None:
+            self._path = []
+        elif path and head.parent is path[-1]:
+            path.append(head)
+        elif path and 0 <= head.depth - path[0].depth < len(path) and path[head.depth - path[0].depth] is head:
+            self._path = path[: head.depth - path[0].depth + 1]
+        else:
+            rebuilt = []
+            node = head
+            while node is not None and not isinstance(node, SpillMarker):
+                rebuilt.append(node)
+                node = node.parent
+            rebuilt.reverse()
+            self._path = rebuilt
+        return self._path
+
+    def as_dicts(self) -> list[dict]:
+        """Return the active branch as a new list of message dicts."""
+        return [node.as_dict() for node in self.nodes()]
+
+    def token_count(self) -> int:
+        """Estimated tokens across the active branch, spilled part included."""
+        head = self.head
+        return head.total_tokens if head is not None else 0
+
+    def window_token_count(self) -> int:
+        """Estimated tokens in the in-memory part of the active branch."""
+        path = self.nodes()
+        if not path:
+            return 0
+        base = path[0].parent.total_tokens if path[0].parent is not None else 0
+        return path[-1].total_tokens - base
+
+    def spilled_marker(self):
+        """Return the SpillMarker before the in-memory window, or None."""
+        path = self.nodes()
+        if path:
+            return path[0].parent
+        head = self.head
+        return head if isinstance(head, SpillMarker) else None
+
+    def spill(self, store, keep: int) -> int:
+        """Move all but roughly the last `keep` messages into store.
+
+        The cut is moved forward to the next user message so the window
+        always starts at the beginning of a turn. The first kept node is
+        re-parented onto a SpillMarker; other branches that pass through
+        it see the same spilled prefix.
+
+        Args:
+            store: SpillStore receiving the old messages.
+            keep: Number of recent messages to keep in memory (at least 1).
+
+        Returns:
+            Number of messages spilled.
+        """
+        path = self.nodes()
+        excess = len(path) - max(keep, 1)
+        while 0 < excess < len(path) - 1 and path[excess].role != "user":
+            excess += 1
+        if excess <= 0:
+            return 0
+
+        start = len(store)
+        prev = path[0].parent
+        turns = prev.turns if prev is not None else 0
+        for node in path[:excess]:
+            store.append(node.role, node.content)
+            turns += node.role == "user"
+
+        last = path[excess - 1]
+        path[excess].parent = SpillMarker(prev, start, excess, last.depth, last.total_tokens, turns)
+        self._path = path[excess:]
+        return excess
+
+    def last(self):
+        """Return the last in-memory node of the active branch, or None."""
+        head = self.head
+        return None if isinstance(head, SpillMarker) else head
+
+    def pop(self):
+        """Remove the last message from the active branch.
+
+        Other branches that share the node are unaffected.
+
+        Returns:
+            The removed node, or None if the branch is empty.
+        """
+        node = self.head
+        if node is not None:
+            self._set_head(node.parent)
+        return node
+
+    def truncate_to(self, node) -> None:
+        """Make node (an ancestor on the active branch, or None) the head."""
+        self._set_head(node)
+
+    def load(self, messages) -> None:
+        """Replace the active branch with a copy of a list of message dicts."""
+        self._set_head(None)
+        for msg in messages:
+            self.append(msg["role"], msg["content"])
+
+    def user_turns(self) -> list:
+        """Return the in-memory user nodes on the active branch, in order.
+
+        The first one is turn spilled_turns() + 1.
+        """
+        return [node for node in self.nodes() if node.role == "user"]
+
+    def spilled_turns(self) -> int:
+        """Number of user turns on the active branch held on disk."""
+        marker = self.spilled_marker()
+        return marker.turns if marker is not None else 0
+
+    def _unique_name(self, prefix: str) -> str:
+        index = 1
+        while f"{prefix}-{index}" in self.branches:
+            index += 1
+        return f"{prefix}-{index}"
+
+    def fork(self, turn: int, name: str | None = None) -> str:
+        """Create a branch that keeps the first `turn` turns, and switch to it.
+
+        Args:
+            turn: 1-based user turn number to fork after, counted from the
+                start of the conversation; the branch keeps that turn's
+                prompt and its reply (if any). 0 forks an empty branch.
+                Turns spilled to disk cannot be forked after, except the
+                last one.
+            name: Optional branch name; generated if omitted.
+
+        Returns:
+            Name of the new (now active) branch.
+
+        Raises:
+            ValueError: If the turn number or name is invalid.
+        """
+        turns = self.user_turns()
+        offset = self.spilled_turns()
+        if not 0 <= turn <= offset + len(turns):
+            raise ValueError(f"Turn must be between 0 and {offset + len(turns)}")
+        if 0 < turn < offset:
+            raise ValueError(f"Turns 1-{offset - 1} are on disk; fork after turn {offset} or later")
+
+        name = name or self._unique_name("branch")
+        if name in self.branches:
+            raise ValueError(f"Branch '{name}' already exists")
+
+        if turn == 0:
+            node = None
+        elif turn - offset < len(turns):
+            node = turns[turn - offset].parent
+        else:
+            node = self.head
+
+        self.branches[name] = node
+        self.active = name
+        return name
+
+    def edit(self, turn: int, name: str | None = None) -> tuple[str, str]:
+        """Start a branch just before user turn `turn` so it can be re-asked.
+
+        The edited prompt is not appended here; sending it through
+        ChatSession adds it to the new branch as usual.
+
+        Args:
+            turn: 1-based user turn number to replace, counted from the
+                start of the conversation (it must be in memory).
+            name: Optional branch name; generated if omitted.
+
+        Returns:
+            (branch_name, original_prompt) tuple.
+
+        Raises:
+            ValueError: If the turn number or name is invalid.
+        """
+        turns = self.user_turns()
+        offset = self.spilled_turns()
+        if not 1 <= turn <= offset + len(turns):
+            raise ValueError(f"Turn must be between 1 and {offset + len(turns)}")
+        if turn <= offset:
+            raise ValueError(f"Turns 1-{offset} are on disk; only turns {offset + 1} and later can be edited")
+
+        name = name or self._unique_name("edit")
+        if name in self.branches:
+            raise ValueError(f"Branch '{name}' already exists")
+
+        original = turns[turn - offset - 1]
+        self.branches[name] = original.parent
+        self.active = name
+        return name, original.content
+
+    def switch(self, name: str) -> None:
+        """Make an existing branch the active one.
+
+        Raises:
+            KeyError: If the branch does not exist.
+        """
+        if name not in self.branches:
+            raise KeyError(name)
+        self.active = name
+
+    def delete_branch(self, name: str) -> None:
+        """Remove a branch head. Shared nodes stay alive for other branches.
+
+        Raises:
+            KeyError: If the branch does not exist.
+            ValueError: If it is the active branch.
+        """
+        if name not in self.branches:
+            raise KeyError(name)
+        if name == self.active:
+            raise ValueError("Cannot delete the active branch")
+        del self.branches[name]
+
+    def list_branches(self) -> list[tuple[str, int, bool]]:
+        """Return (name, message_count, is_active) for every branch."""
+        return [
+            (name, node.depth if node is not None else 0, name == self.active)
+            for name, node in self.branches.items()
+        ]
@@ -0,0 +1,171 @@
+"""Idle-time background job scheduler.
+
+Expensive housekeeping (warming models, indexing chats, writing chat
+titles, queueing summaries) runs on a small thread pool while the user
+is reading or typing. A job is a generator function: each `yield` ends
+one step and reports a short progress string. Between steps the job
+waits until the scheduler is idle, so submitting a prompt pauses every
+job at its next step boundary (a model call already in flight is
+allowed to finish).
+
+Each job receives a persistent `state` dict it may update to record
+how far it got. Status, step counts and state are saved to a JSON file,
+so a job re-submitted after a restart picks up its previous state.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SAVE_INTERVAL = 1.0
+
+
+class JobScheduler:
+    """Run registered generator jobs on a thread pool during idle time."""
+
+    def __init__(self, state_path: Path | str, max_workers: int = 2):
+        """Create a scheduler and load saved job progress.
+
+        Args:
+            state_path: JSON file where job status and state are kept.
+            max_workers: Number of jobs that may run at the same time.
+        """
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.idle = threading.Event()
+        self.idle.set()
+        self.held = False
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._executor = None
+        self._last_save = 0.0
+        self.jobs = self._load()
+        for record in self.jobs.values():
+            if record["status"] in ("queued", "running", "paused"):
+                record["status"] = "interrupted"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        """Write job status and state to disk."""
+        with self._lock:
+            self._last_save = time.monotonic()
+            try:
+                data = json.dumps(self.jobs, indent=2, default=str)
+            except RuntimeError:
+                # A job changed its state mid-dump; its next step saves again.
+                return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        tmp_path.replace(self.state_path)
+
+    def _update(self, name: str, **fields) -> None:
+        with self._lock:
+            self.jobs[name].update(fields, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+    def submit(self, name: str, func, *args) -> bool:
+        """Queue a job unless one with the same name is already active.
+
+        Args:
+            name: Unique job name, used for status and saved state.
+            func: Generator function called as func(state, *args).
+            *args: Extra arguments passed to func.
+
+        Returns:
+            True if the job was queued.
+        """
+        with self._lock:
+            record = self.jobs.get(name)
+            if record is not None and record["status"] in ("queued", "running", "paused"):
+                return False
+            state = record["state"] if record is not None else {}
+            self.jobs[name] = {
+                "status": "queued",
+                "steps": 0,
+                "progress": "",
+                "error": None,
+                "state": state,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._executor.submit(self._run, name, func, args)
+        return True
+
+    def _wait_idle(self, name: str) -> bool:
+        """Block until idle; return False if the scheduler is stopping."""
+        if not self.idle.is_set():
+            self._update(name, status="paused")
+            self.idle.wait()
+        if self._stopping:
+            return False
+        self._update(name, status="running")
+        return True
+
+    def _run(self, name: str, func, args) -> None:
+        """Drive one job step by step, saving progress as it goes."""
+        steps = func(self.jobs[name]["state"], *args)
+        try:
+            while self._wait_idle(name):
+                try:
+                    progress = next(steps)
+                except StopIteration:
+                    self._update(name, status="done")
+                    break
+                with self._lock:
+                    record = self.jobs[name]
+                    record["steps"] += 1
+                    record["progress"] = str(progress or "")
+                if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                    self.save()
+            else:
+                self._update(name, status="interrupted")
+        except Exception as e:
+            self._update(name, status="failed", error=f"{e.__class__.__name__}: {e}")
+        finally:
+            steps.close()
+            self.save()
+
+    def pause(self) -> None:
+        """Stop starting new job steps (called when a prompt is submitted)."""
+        self.idle.clear()
+
+    def resume(self) -> None:
+        """Let jobs continue, unless they were held with hold()."""
+        if not self.held:
+            self.idle.set()
+
+    def hold(self, held: bool = True) -> None:
+        """Keep jobs paused until hold(False), regardless of idle time.
+
+        Releasing a hold takes effect the next time the app is idle.
+        """
+        self.held = held
+        if held:
+            self.idle.clear()
+
+    def active_count(self) -> int:
+        """Number of jobs queued, running or paused."""
+        with self._lock:
+            return sum(1 for r in self.jobs.values() if r["status"] in ("queued", "running", "paused"))
+
+    def snapshot(self) -> list[tuple[str, dict]]:
+        """Return (name, record copy) pairs for every known job."""
+        with self._lock:
+            return [(name, dict(record)) for name, record in self.jobs.items()]
+
+    def shutdown(self) -> None:
+        """Stop jobs at their next step boundary and save progress."""
+        self._stopping = True
+        self.idle.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self.save()
@@ -0,0 +1,441 @@
+"""Per-subject knowledge stores for reference documents.
+
+Text and markdown files attached to a subject (/attach, or
+`main.py ingest`) are split into chunks of about chunk_tokens tokens
+and stored under subjects/<subject>/knowledge/:
+
+    chunks.jsonl  one {"source", "text"} record per chunk, append-only
+                  between compactions
+    index.json    documents, chunk offsets/hashes and an inverted index
+
+Every ingest gives the document a new id. Each chunk lists the ids of
+the documents that contain it, so a passage shared by two files stays
+live while either of them does; a chunk is dead once none of its ids is
+the current id of a document, and chunks of a replaced file never come
+back. When more than half the chunks are dead, chunks.jsonl and the
+index are rewritten with only the live ones.
+
+Files are read a line at a time (long lines in bounded pieces) and each
+chunk is written as soon as it is complete, so a large file is never
+held in memory. Chunks are deduplicated by content hash across the
+whole subject, and a file whose content hash matches an ingested file
+adds nothing. Re-attaching a changed file replaces its old chunks.
+
+Retrieval scores chunks against a query with BM25 over the inverted
+index and reads only the chunks it returns, so the prompt carries the
+few passages relevant to the current message instead of every
+document (see SubjectRetriever.build_system_prompt and
+ChatSession.knowledge).
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from pathlib import Path
+
+from core.history import estimate_tokens
+from core.summarizer import content_key
+
+INDEX_VERSION = 3
+DEFAULT_CHUNK_TOKENS = 400
+REFERENCE_TOKENS = 1500
+TEXT_SUFFIXES = (".md", ".markdown", ".txt", ".text", ".rst")
+READ_LIMIT = 1 << 16
+
+WORD = re.compile(r"[a-z0-9]{2,}")
+STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has him his how its may new now "
+    "see who did get let say she too use that with have this will your from they been were what when "
+    "which their there about would could should into than then them these those some such only also "
+    "over just more most other very".split()
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Rewrite the store once more than this fraction of its chunks is dead
+COMPACT_RATIO = 0.5
+
+
+def terms(text: str) -> list[str]:
+    """Lowercase index terms of text (stopwords and 1-letter words dropped)."""
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def read_pieces(f):
+    """Yield lines of a text file, splitting very long lines into pieces."""
+    while True:
+        piece = f.readline(READ_LIMIT)
+        if not piece:
+            return
+        yield piece
+
+
+def iter_chunks(lines, chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
+    """Group lines into chunks of at most about chunk_tokens tokens.
+
+    Chunks end at a blank line or before a markdown heading once they are
+    reasonably full, so paragraphs and sections stay together; a single
+    line longer than the budget is split by characters.
+
+    Yields:
+        Chunk texts (stripped, never empty).
+    """
+    budget = chunk_tokens * 4
+    current = []
+    size = 0
+    for line in lines:
+        if current and (size + len(line) > budget or (line.startswith("#") and size >= budget // 4)):
+            text = "".join(current).strip()
+            if text:
+                yield text
+            current, size = [], 0
+        while len(line) > budget:
+            text = line[:budget].strip()
+            if text:
+                yield text
+            line = line[budget:]
+        current.append(line)
+        size += len(line)
+        if size >= budget // 2 and not line.strip():
+            text = "".join(current).strip()
+            if text:
+                yield text
+            current, size = [], 0
+    text = "".join(current).strip()
+    if text:
+        yield text
+
+
+class KnowledgeStore:
+    """Chunked, indexed reference documents for one subject."""
+
+    def __init__(self, path: Path | str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
+        """Create a store in directory path; nothing is read until first use.
+
+        Args:
+            path: Directory holding chunks.jsonl and index.json.
+            chunk_tokens: Target chunk size for new documents.
+        """
+        self.path = Path(path)
+        self.chunk_tokens = chunk_tokens
+        self._lock = threading.Lock()
+        self._index = None
+        self._hashes = None  # content hash -> id of the live chunk
+
+    @property
+    def chunks_path(self) -> Path:
+        return self.path / "chunks.jsonl"
+
+    @property
+    def index_path(self) -> Path:
+        return self.path / "index.json"
+
+    @property
+    def index(self) -> dict:
+        """The store's index, loaded from disk on first access."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+        return self._index
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == 2:
+                # Version 2 kept a single document id per chunk
+                for chunk in index["chunks"]:
+                    chunk[4] = [chunk[4]]
+                index["version"] = INDEX_VERSION
+            if index.get("version") != INDEX_VERSION:
+                raise ValueError("unsupported index version")
+        except (OSError, ValueError):
+            index = {"version": INDEX_VERSION, "next_id": 1, "docs": {}, "chunks": [], "postings": {}}
+        self._index = index
+        self._refresh_hashes()
+
+    def _live_ids(self) -> set:
+        """Ids of the current ingest of every document."""
+        return {doc["id"] for doc in self._index["docs"].values()}
+
+    @staticmethod
+    def _is_live(chunk, live_ids) -> bool:
+        return any(doc_id in live_ids for doc_id in chunk[4])
+
+    def _refresh_hashes(self) -> None:
+        live = self._live_ids()
+        self._hashes = {
+            chunk[3]: chunk_id for chunk_id, chunk in enumerate(self._index["chunks"]) if self._is_live(chunk, live)
+        }
+
+    def _save(self) -> None:
+        data = json.dumps(self._index, ensure_ascii=False, separators=(",", ":"))
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        tmp_path.replace(self.index_path)
+
+    @property
+    def documents(self) -> dict:
+        """{source: document record} for every ingested file."""
+        return self.index["docs"]
+
+    def ingest(self, file_path: Path | str, on_progress=None) -> dict:
+        """Add a text or markdown file to the store.
+
+        Args:
+            file_path: File to ingest.
+            on_progress: Optional callback(bytes_read) called per chunk.
+
+        Returns:
+            {"source", "status", "chunks", "duplicates"} where status is
+            "added", "replaced", "unchanged" (same file, not modified)
+            or "duplicate" (same content as another ingested file; the
+            file is recorded and shares that file's chunks).
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not UTF-8 text.
+        """
+        file_path = Path(file_path).resolve()
+        source = file_path.as_posix()
+        stat = file_path.stat()
+        index = self.index
+        with self._lock:
+            old = index["docs"].get(source)
+            if old is not None and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+                return {"source": source, "status": "unchanged", "chunks": 0, "duplicates": 0}
+            if old is not None:
+                # The file changed: its old chunks stop counting (and matching)
+                del index["docs"][source]
+                self._refresh_hashes()
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            doc_id = index["next_id"]
+            index["next_id"] += 1
+            digest = hashlib.sha256()
+            added = duplicates = 0
+            first_chunk = len(index["chunks"])
+            try:
+                with open(file_path, "r", encoding="utf-8") as src, open(self.chunks_path, "ab") as out:
+                    def lines():
+                        for line in read_pieces(src):
+                            digest.update(line.encode("utf-8"))
+                            yield line
+
+                    for text in iter_chunks(lines(), self.chunk_tokens):
+                        key = content_key(text)
+                        chunk_id = self._hashes.get(key)
+                        if chunk_id is not None:
+                            owners = index["chunks"][chunk_id][4]
+                            if doc_id not in owners:
+                                owners.append(doc_id)
+                            duplicates += 1
+                            continue
+                        record = (json.dumps({"source": source, "text": text}, ensure_ascii=False) + "\n").encode("utf-8")
+                        chunk_id = len(index["chunks"])
+                        index["chunks"].append([out.tell(), len(record), estimate_tokens(text), key, [doc_id]])
+                        out.write(record)
+                        self._hashes[key] = chunk_id
+                        counts = {}
+                        for term in terms(text):
+                            counts[term] = counts.get(term, 0) + 1
+                        for term, count in counts.items():
+                            index["postings"].setdefault(term, []).append([chunk_id, count])
+                        added += 1
+                        if on_progress is not None:
+                            on_progress(src.tell())
+            except UnicodeDecodeError as e:
+                self._forget_from(first_chunk, doc_id)
+                if old is not None:
+                    index["docs"][source] = old
+                    self._refresh_hashes()
+                raise ValueError(f"{file_path.name} is not UTF-8 text") from e
+
+            file_hash = digest.hexdigest()
+            status = "replaced" if old is not None else "added"
+            if not added and any(doc["sha256"] == file_hash for doc in index["docs"].values()):
+                status = "duplicate"
+            index["docs"][source] = {
+                "id": doc_id,
+                "name": file_path.name,
+                "sha256": file_hash,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "chunks": added + duplicates,
+                "added": time.time(),
+            }
+            self._compact_if_needed()
+            self._save()
+        return {"source": source, "status": status, "chunks": added, "duplicates": duplicates}
+
+    def _forget_from(self, first_chunk: int, doc_id: int) -> None:
+        """Drop index entries for chunks written (or shared) by a failed ingest."""
+        index = self._index
+        for chunk in index["chunks"][first_chunk:]:
+            self._hashes.pop(chunk[3], None)
+        del index["chunks"][first_chunk:]
+        for chunk in index["chunks"]:
+            if doc_id in chunk[4]:
+                chunk[4].remove(doc_id)
+        for term in list(index["postings"]):
+            postings = [p for p in index["postings"][term] if p[0] < first_chunk]
+            if postings:
+                index["postings"][term] = postings
+            else:
+                del index["postings"][term]
+
+    def _compact_if_needed(self) -> None:
+        """Rewrite chunks.jsonl and the index without dead chunks.
+
+        Runs only once more than COMPACT_RATIO of the chunks is dead, so
+        replacing files repeatedly does not grow the store without bound.
+        Surviving chunks keep their order and get consecutive ids.
+        """
+        index = self._index
+        chunks = index["chunks"]
+        live_ids = self._live_ids()
+        live = [chunk_id for chunk_id, chunk in enumerate(chunks) if self._is_live(chunk, live_ids)]
+        if len(chunks) - len(live) <= len(chunks) * COMPACT_RATIO:
+            return
+
+        renumber = {}
+        compacted = []
+        tmp_path = self.chunks_path.with_suffix(".tmp")
+        with open(self.chunks_path, "rb") as src, open(tmp_path, "wb") as out:
+            for chunk_id in live:
+                offset, length, tokens, key, owners = chunks[chunk_id]
+                src.seek(offset)
+                record = src.read(length)
+                renumber[chunk_id] = len(compacted)
+                compacted.append([out.tell(), length, tokens, key, [i for i in owners if i in live_ids]])
+                out.write(record)
+        tmp_path.replace(self.chunks_path)
+
+        index["chunks"] = compacted
+        for term in list(index["postings"]):
+            postings = [[renumber[p[0]], p[1]] for p in index["postings"][term] if p[0] in renumber]
+            if postings:
+                index["postings"][term] = postings
+            else:
+                del index["postings"][term]
+        self._refresh_hashes()
+
+    def search(self, query: str, limit: int = 4, budget: int = REFERENCE_TOKENS) -> list[dict]:
+        """Return the chunks most relevant to query.
+
+        Args:
+            query: Text to match (usually the user's message).
+            limit: Maximum number of chunks.
+            budget: Maximum total estimated tokens of the returned chunks.
+
+        Returns:
+            [{"source", "text", "score"}], best first.
+        """
+        index = self.index
+        query_terms = set(terms(query))
+        if not query_terms or not index["chunks"]:
+            return []
+
+        with self._lock:
+            sources = {doc["id"]: source for source, doc in index["docs"].items()}
+            chunks = index["chunks"]
+            live = sum(1 for chunk in chunks if self._is_live(chunk, sources))
+            if not live:
+                return []
+            average = sum(chunk[2] for chunk in chunks if self._is_live(chunk, sources)) / live
+            scores = {}
+            for term in query_terms:
+                postings = [p for p in index["postings"].get(term, ()) if self._is_live(chunks[p[0]], sources)]
+                if not postings:
+                    continue
+                idf = math.log(1 + (live - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, count in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * chunks[chunk_id][2] / average)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+            ranked = sorted(scores.items(), key=lambda item: -item[1])
+
+            # Read under the lock: a compaction rewrites chunks.jsonl
+            results = []
+            used = 0
+            with open(self.chunks_path, "rb") as f:
+                for chunk_id, score in ranked:
+                    if len(results) == limit:
+                        break
+                    offset, length, tokens, _, owners = chunks[chunk_id]
+                    if used + tokens > budget:
+                        continue
+                    f.seek(offset)
+                    record = json.loads(f.read(length))
+                    # The file that first stored the chunk may be gone; name one that still has it
+                    source = next(sources[doc_id] for doc_id in owners if doc_id in sources)
+                    results.append({"source": source, "text": record["text"], "score": score})
+                    used += tokens
+        return results
+
+
+class KnowledgeBase:
+    """Knowledge stores for every subject under one subjects directory."""
+
+    def __init__(self, subjects_path: Path | str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS):
+        self.subjects_path = Path(subjects_path)
+        self.chunk_tokens = chunk_tokens
+        self.reference_tokens = REFERENCE_TOKENS
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def store(self, subject_name: str) -> KnowledgeStore:
+        """Return the knowledge store for a subject."""
+        with self._lock:
+            store = self._stores.get(subject_name)
+            if store is None:
+                store = self._stores[subject_name] = KnowledgeStore(
+                    self.subjects_path / subject_name / "knowledge", self.chunk_tokens
+                )
+            return store
+
+    def has_documents(self, subject_name: str) -> bool:
+        """True if the subject has a knowledge store on disk."""
+        return (self.subjects_path / subject_name / "knowledge" / "index.json").exists()
+
+    def reference_for(self, subject_name: str | None, query: str) -> str:
+        """Return the chunks of a subject's documents relevant to query.
+
+        Returns:
+            Markdown text (one "## <file>" section per chunk), or an empty
+            string if the subject has no documents or nothing matches.
+        """
+        if not subject_name or not query or not self.has_documents(subject_name):
+            return ""
+        results = self.store(subject_name).search(query, budget=self.reference_tokens)
+        return "\n\n".join(f"## {Path(result['source']).name}\n{result['text']}" for result in results)
+
+
+def iter_text_files(paths):
+    """Yield text/markdown files from paths, walking directories."""
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file() and child.suffix.lower() in TEXT_SUFFIXES:
+                    yield child
+        else:
+            yield path
+
+
+def ingest_paths(store: KnowledgeStore, paths, on_progress=None):
+    """Ingest every text file under paths into store.
+
+    Yields:
+        (path, result, error) per file: result is KnowledgeStore.ingest's
+        dict, or None with error set if the file could not be read.
+    """
+    for path in iter_text_files(paths):
+        try:
+            yield path, store.ingest(path, on_progress), None
+        except (OSError, ValueError) as e:
+            yield path, None, str(e)
@@ -25,7 +25,8 @@ class ChatLogger:
 
         Args:
             subject_name: Name of the subject folder.
-            conversation_history: List of message dicts produced by ChatSession.
+            conversation_history: List of message dicts (or MessageNodes)
+                produced by ChatSession.
             append: If True, append to chatlog.md; otherwise create a new
                 timestamped chat_*.md file.
 
@@ -46,14 +47,15 @@ class ChatLogger:
             timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M")
             log_file = subject_folder / f"chat_{timestamp}.md"
 
-        log_content = self.format_conversation(conversation_history)
-
         mode = "a" if (append and log_file.exists()) else "w"
         with open(log_file, mode, encoding="utf-8") as f:
             if mode == "a":
                 f.write("\n---\n")
                 f.write(f"# Session {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            f.write(log_content)
+            for index, part in enumerate(self._format_parts(conversation_history)):
+                if index:
+                    f.write("\n")
+                f.write(part)
 
         return log_file
 
@@ -61,17 +63,24 @@ class ChatLogger:
         """Format conversation history as markdown.
 
         Args:
-            conversation_history: List of message dicts with 'role' and 'content'.
+            conversation_history: List of message dicts with 'role' and
+                'content', or MessageNodes.
 
         Returns:
             A markdown-formatted string representation of the conversation.
         """
-        formatted = []
+        return "\n".join(self._format_parts(conversation_history))
+
+    def _format_parts(self, conversation_history):
+        """Yield the markdown block for each message, one at a time."""
         for msg in conversation_history:
-            role = msg["role"].capitalize()
-            content = msg["content"]
-            formatted.append(f"**{role}:**\n{content}\n")
-        return "\n".join(formatted)
+            yield self.format_message(msg)
+
+    def format_message(self, msg) -> str:
+        """Format one message dict or MessageNode as a markdown block."""
+        if isinstance(msg, dict):
+            return f"**{msg['role'].capitalize()}:**\n{msg['content']}\n"
+        return msg.as_markdown()
 
     def create_subject_folder(self, subject_name: str) -> Path:
         """Create a new subject folder with a default instructions template.
@@ -0,0 +1,140 @@
+"""Per-model generation profiles for Ollama requests.
+
+Profiles live in one JSON file (data/model_profiles.json by default):
+
+    {
+      "num_ctx_buckets": [2048, 4096, 8192, 16384, 32768],
+      "num_thread": null,
+      "profiles": {
+        "default": {"num_ctx_max": 8192},
+        "qwen2.5-coder": {"num_ctx_max": 32768},
+        "creative": {"temperature": 0.9}
+      },
+      "personas": {"writer": "creative"},
+      "subjects": {},
+      "commands": {"compare": {"num_predict": 512}}
+    }
+
+A request's options are built from, in order: the model's profile
+(exact name, then the name before ':', then "default"), the profile
+named for the persona, the profile named for the subject, and the
+overrides for the command. Persona/subject entries may also be inline
+option dicts. Keys other than num_ctx_min and num_ctx_max are passed
+to Ollama as options. Reply caps (num_predict) belong under "commands"
+so that chat turns stay uncapped.
+
+Unless a profile pins num_ctx, it is sized from the estimated prompt
+length plus num_predict, rounded up to the next bucket and capped at
+num_ctx_max. Ollama reloads a model when num_ctx changes, so the size
+chosen for a model never shrinks while the process runs. num_thread
+may be pinned globally or per profile.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+DEFAULT_BUCKETS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+DEFAULT_REPLY_TOKENS = 512
+CONTROL_KEYS = ("num_ctx_min", "num_ctx_max")
+
+
+class GenerationProfiles:
+    """JSON-backed generation options per model, persona, subject and command."""
+
+    def __init__(self, path: Path | str):
+        """Create profiles backed by path; the file is read on first use.
+
+        A missing or invalid file means "no profiles": options only
+        carry an auto-sized num_ctx.
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._config = None
+        self._num_ctx = {}
+
+    @property
+    def config(self) -> dict:
+        """Profile configuration, loaded from disk on first access."""
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            self._config = json.load(f)
+                    except (OSError, ValueError):
+                        self._config = {}
+        return self._config
+
+    def reload(self) -> None:
+        """Re-read the file on next use and forget chosen context sizes."""
+        with self._lock:
+            self._config = None
+            self._num_ctx = {}
+
+    @property
+    def buckets(self) -> list[int]:
+        """Allowed num_ctx sizes, ascending."""
+        return sorted(self.config.get("num_ctx_buckets") or DEFAULT_BUCKETS)
+
+    def _profile(self, entry) -> dict:
+        """Resolve a profile name or inline dict to a dict."""
+        if isinstance(entry, dict):
+            return entry
+        if isinstance(entry, str):
+            return self.config.get("profiles", {}).get(entry, {})
+        return {}
+
+    def model_profile(self, model: str) -> dict:
+        """Return the profile for a model name."""
+        profiles = self.config.get("profiles", {})
+        for name in (model, model.split(":")[0], "default"):
+            if name in profiles:
+                return profiles[name]
+        return {}
+
+    def bucket_for(self, tokens: int) -> int:
+        """Smallest bucket that holds tokens (the largest if none does)."""
+        buckets = self.buckets
+        for size in buckets:
+            if size >= tokens:
+                return size
+        return buckets[-1]
+
+    def options_for(self, model: str, persona: str | None = None, subject: str | None = None,
+                    prompt_tokens: int = 0, command: str = "chat") -> dict:
+        """Build Ollama options for one request.
+
+        Args:
+            model: Model the request goes to.
+            persona: Active persona name, if any.
+            subject: Active subject name, if any.
+            prompt_tokens: Estimated tokens in the messages being sent.
+            command: What the request is for ("chat", "compare",
+                "regenerate", "summarize", "title", ...).
+
+        Returns:
+            Options dict (None values removed).
+        """
+        config = self.config
+        merged = {}
+        merged.update(self.model_profile(model))
+        merged.update(self._profile(config.get("personas", {}).get(persona)))
+        merged.update(self._profile(config.get("subjects", {}).get(subject)))
+        merged.update(config.get("commands", {}).get(command, {}))
+
+        ctx_min = merged.get("num_ctx_min") or 0
+        ctx_max = merged.get("num_ctx_max")
+        options = {key: value for key, value in merged.items() if key not in CONTROL_KEYS and value is not None}
+
+        if "num_ctx" not in options:
+            reply_tokens = options.get("num_predict") or DEFAULT_REPLY_TOKENS
+            num_ctx = self.bucket_for(max(prompt_tokens + reply_tokens, ctx_min, self._num_ctx.get(model, 0)))
+            if ctx_max:
+                num_ctx = min(num_ctx, ctx_max)
+            self._num_ctx[model] = max(num_ctx, self._num_ctx.get(model, 0))
+            options["num_ctx"] = num_ctx
+
+        if "num_thread" not in options and config.get("num_thread"):
+            options["num_thread"] = config["num_thread"]
+        return options
@@ -0,0 +1,131 @@
+"""Background generation queue for the interactive REPL.
+
+PromptQueue runs model turns on a single worker thread so the input
+area stays usable while a reply streams: prompts submitted while a
+reply is generating are queued and answered strictly in order. The REPL
+waits for the queue to drain before running slash commands, so commands
+never see a half-finished turn. cancel() drops the queued prompts and
+sets the queue's cancelled event, which the running turn checks between
+chunks (see ChatSession.cancel_event).
+"""
+
+import queue
+import threading
+
+
+class PromptQueue:
+    """Answer prompts one at a time on a worker thread."""
+
+    def __init__(self, run, on_busy=None, on_idle=None):
+        """Create a queue and start its worker thread.
+
+        Args:
+            run: Callable(prompt) that answers one prompt (e.g. streams
+                the reply to stdout). Exceptions are reported and the
+                next prompt is processed.
+            on_busy: Optional callable run before a turn starts when the
+                queue was idle (e.g. pause background jobs).
+            on_idle: Optional callable run after the last queued prompt
+                has been answered (e.g. resume background jobs).
+        """
+        self._run = run
+        self._on_busy = on_busy
+        self._on_idle = on_idle
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self.cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._worker, name="prompt-queue", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        """True while a prompt is being answered or waiting in line."""
+        return not self._idle.is_set()
+
+    @property
+    def pending_count(self) -> int:
+        """Number of prompts submitted but not yet answered."""
+        return self._pending
+
+    def submit(self, prompt: str) -> int:
+        """Queue a prompt.
+
+        Returns:
+            Number of prompts ahead of this one (0 if it starts now).
+        """
+        with self._lock:
+            ahead = self._pending
+            self._pending += 1
+            if ahead == 0:
+                self._idle.clear()
+                if self._on_busy is not None:
+                    self._on_busy()
+        self._queue.put(prompt)
+        return ahead
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until every queued prompt has been answered.
+
+        Returns:
+            True if the queue is idle, False if the timeout expired.
+        """
+        return self._idle.wait(timeout)
+
+    def cancel(self) -> int:
+        """Stop the running turn and drop the prompts queued after it.
+
+        The cancelled event stays set until the running turn returns.
+
+        Returns:
+            Number of queued prompts dropped.
+        """
+        dropped = 0
+        closing = False
+        with self._lock:
+            if self._pending == 0:
+                return 0
+            while True:
+                try:
+                    prompt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if prompt is None:
+                    closing = True
+                else:
+                    dropped += 1
+            self._pending -= dropped
+            if self._pending == 0:
+                # Only queued prompts were dropped; nothing is running
+                if self._on_idle is not None:
+                    self._on_idle()
+                self._idle.set()
+            else:
+                self.cancelled.set()
+        if closing:
+            self._queue.put(None)
+        return dropped
+
+    def close(self) -> None:
+        """Stop the worker after the prompts already queued."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _worker(self):
+        while True:
+            prompt = self._queue.get()
+            if prompt is None:
+                return
+            try:
+                self._run(prompt)
+            except Exception as e:
+                print(f"✗ Error: {e}")
+            with self._lock:
+                self.cancelled.clear()
+                self._pending -= 1
+                if self._pending == 0:
+                    if self._on_idle is not None:
+                        self._on_idle()
+                    self._idle.set()
@@ -1,6 +1,12 @@
 import os
 from pathlib import Path
 
+from core.corpus import parse_chat_text
+from core.summarizer import content_key
+
+SUMMARY_EXCERPT_CHARS = 1500
+PENDING_NOTE = "still being summarized"
+
 
 class SubjectRetriever:
     """Manage personas, subjects, and chat files on disk.
@@ -9,6 +15,8 @@ class SubjectRetriever:
         - Load and update persona instruction files
         - Load and update subject instructions
         - Build system prompts from persona, subject, and chat history
+          (older logs are replaced by summaries once over the budget),
+          plus reference passages from the subject's knowledge store
         - Parse inline persona/subject commands from user input
         - List, load, delete, and move chat markdown files
     """
@@ -25,6 +33,14 @@ class SubjectRetriever:
         self.subjects_path = self.basepath / "subjects"
         self.default_persona = "default"
         self.default_subject = "no_subject"
+        self.chat_log_budget = 24000
+        self.summary_excerpt_chars = SUMMARY_EXCERPT_CHARS
+        self.summarizer = None
+        self._awaiting_prompts = {}
+        self.catalog = None
+        self.knowledge = None
+        self.profiles = None
+        self.usage_rollup = None
 
     def load_persona(self, persona_name: str | None = None) -> str:
         """Load persona instructions from the personas folder.
@@ -142,18 +158,17 @@ class SubjectRetriever:
             print(f"Error updating subject instructions: {e}")
             return False
 
-    def load_chat_logs(self, subject_name: str) -> str:
-        """Load all chat logs for a subject as a single combined string.
+    def load_chat_log_list(self, subject_name: str) -> list[str]:
+        """Load the non-empty chat logs for a subject, oldest first.
 
-        This will merge the rolling chatlog.md (if present) with all
-        timestamped chat_*.md files, separated by '---' markers.
+        The rolling chatlog.md (if present) comes first, followed by the
+        timestamped chat_*.md files in filename order.
 
         Args:
             subject_name: Name of the subject folder.
 
         Returns:
-            Combined markdown text of all chat logs, or an empty string
-            if no logs exist.
+            List of chat log texts (empty if no logs exist).
         """
         subject_folder = self.subjects_path / subject_name
         chat_logs = []
@@ -173,9 +188,105 @@ class SubjectRetriever:
                         if content.strip():
                             chat_logs.append(content)
 
-        return "\n---\n".join(chat_logs) if chat_logs else ""
+        return chat_logs
+
+    def load_chat_logs(self, subject_name: str) -> str:
+        """Load all chat logs for a subject as a single combined string.
+
+        This will merge the rolling chatlog.md (if present) with all
+        timestamped chat_*.md files, separated by '---' markers.
+
+        Args:
+            subject_name: Name of the subject folder.
+
+        Returns:
+            Combined markdown text of all chat logs, or an empty string
+            if no logs exist.
+        """
+        return "\n---\n".join(self.load_chat_log_list(subject_name))
+
+    def load_chat_history_for_prompt(self, subject_name: str) -> str:
+        """Return a subject's chat history sized for the system prompt.
+
+        Logs are included verbatim while they fit in chat_log_budget
+        characters. When they do not, the newest logs that fit are kept
+        and each older log is replaced by its cached summary. Missing
+        summaries are queued on the summarizer and, until they are
+        written, the end of the raw log (summary_excerpt_chars) stands
+        in for them, so building the prompt never waits on the model.
+        Without a summarizer, all logs are included as before.
 
-    def build_system_prompt(self, persona_name: str | None = None, subject_name: str | None = None) -> str:
+        Args:
+            subject_name: Name of the subject folder.
+
+        Returns:
+            Markdown text for the "Previous Chat History" section.
+        """
+        return self._chat_history_section(subject_name)[0]
+
+    def _chat_history_section(self, subject_name: str) -> tuple[str, frozenset]:
+        """Return (history text, keys of the summaries it is still waiting for)."""
+        chat_logs = self.load_chat_log_list(subject_name)
+        if self.summarizer is None or sum(len(log) for log in chat_logs) <= self.chat_log_budget:
+            return "\n---\n".join(chat_logs), frozenset()
+
+        recent = []
+        used = 0
+        while chat_logs and used + len(chat_logs[-1]) <= self.chat_log_budget:
+            log = chat_logs.pop()
+            recent.append(log)
+            used += len(log)
+        recent.reverse()
+
+        summaries = []
+        pending = set()
+        for log in chat_logs:
+            key = content_key(log)
+            summary = self.summarizer.get(key)
+            if summary is None:
+                self.summarizer.request(key, log)
+                pending.add(key)
+                summaries.append(self._excerpt(log))
+            else:
+                summaries.append(summary)
+
+        sections = []
+        if summaries:
+            header = f"## Summaries of {len(chat_logs)} earlier chats"
+            if pending:
+                header += f" ({len(pending)} {PENDING_NOTE}; their last lines are shown instead)"
+            sections.append("\n\n".join([header] + summaries))
+        sections.extend(recent)
+        return "\n---\n".join(sections), frozenset(pending)
+
+    def _excerpt(self, log: str) -> str:
+        """Return the end of a chat log, about summary_excerpt_chars long."""
+        limit = self.summary_excerpt_chars
+        if len(log) <= limit:
+            return log
+        tail = log[-limit:]
+        newline = tail.find("\n")
+        if 0 <= newline < limit // 2:
+            tail = tail[newline + 1:]
+        return "[...]\n" + tail
+
+    def prompt_outdated(self, system_prompt: str) -> bool:
+        """True if a summary that system_prompt shows an excerpt for is now written.
+
+        Prompts built by an earlier run (restored from a snapshot) that
+        still show excerpts count as outdated, so they are rebuilt once.
+        """
+        if self.summarizer is None or not system_prompt or PENDING_NOTE not in system_prompt:
+            return False
+        prompt_key = content_key(system_prompt)
+        keys = self._awaiting_prompts.get(prompt_key)
+        if keys is not None and all(self.summarizer.get(key) is None for key in keys):
+            return False
+        self._awaiting_prompts.pop(prompt_key, None)
+        return True
+
+    def build_system_prompt(self, persona_name: str | None = None, subject_name: str | None = None,
+                            query: str | None = None) -> str:
         """Build the full system prompt combining persona, subject, and history.
 
         Args:
@@ -183,6 +294,9 @@ class SubjectRetriever:
                 default persona if not specified.
             subject_name: Optional subject name; defaults to the default
                 subject if not specified.
+            query: Optional prompt text. With a knowledge base attached,
+                the subject's document chunks relevant to it are added
+                under "Reference Material".
 
         Returns:
             A multiline system prompt string.
@@ -191,8 +305,9 @@ class SubjectRetriever:
         instructions = self.load_subject_instructions(subject_name)
 
         chat_history = ""
+        pending = frozenset()
         if subject_name and subject_name != self.default_subject:
-            chat_history = self.load_chat_logs(subject_name)
+            chat_history, pending = self._chat_history_section(subject_name)
 
         system_prompt = f"""# Persona
 {persona}
@@ -206,8 +321,55 @@ class SubjectRetriever:
 # Previous Chat History
 {chat_history}"""
 
+        if query and self.knowledge is not None:
+            reference = self.knowledge.reference_for(subject_name or self.default_subject, query)
+            if reference:
+                system_prompt += f"""
+
+# Reference Material
+{reference}"""
+
+        if pending:
+            # Remembered so prompt_outdated can tell when to rebuild it
+            self._awaiting_prompts[content_key(system_prompt)] = pending
         return system_prompt
 
+    def prompt_sources(self, persona_name: str | None = None, subject_name: str | None = None) -> dict:
+        """Fingerprint the files build_system_prompt reads for a persona/subject.
+
+        Covers only the prompt inputs: the persona and subject instruction
+        files (and their defaults) and the subject's chat logs. A chat log
+        that is added or removed changes the keys, and an edited file its
+        [mtime_ns, size]; other files in the subject folder (usage.jsonl,
+        knowledge/) do not count.
+
+        Returns:
+            {path relative to basepath: [mtime_ns, size]}, with None for
+            files that do not exist.
+        """
+        persona_name = persona_name or self.default_persona
+        subject_name = subject_name or self.default_subject
+        paths = [
+            self.personas_path / f"{persona_name.lower()}.md",
+            self.personas_path / f"{self.default_persona}.md",
+            self.subjects_path / subject_name / "instructions.md",
+            self.subjects_path / self.default_subject / "instructions.md",
+        ]
+        if subject_name != self.default_subject:
+            subject_folder = self.subjects_path / subject_name
+            paths.append(subject_folder / "chatlog.md")
+            if subject_folder.exists():
+                paths.extend(sorted(subject_folder.glob("chat_*.md")))
+
+        sources = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+                sources[path.relative_to(self.basepath).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                sources[path.relative_to(self.basepath).as_posix()] = None
+        return sources
+
     def parse_subject_command(self, user_input: str):
         """Parse inline Persona/Subject declarations from a user input string.
 
@@ -230,8 +392,11 @@ class SubjectRetriever:
                     there is no prompt text.
         """
         text = user_input.strip()
-        lower_text = text.lower()
+        # Every declaration needs a ':', so most prompts stop here without lowercasing
+        if ":" not in text:
+            return None, None, text, False
 
+        lower_text = text.lower()
         if "persona" not in lower_text and "subject" not in lower_text:
             return None, None, text, False
 
@@ -319,8 +484,6 @@ class SubjectRetriever:
             List of message dicts with 'role' and 'content' keys. Returns an
             empty list if parsing fails.
         """
-        conversation_history = []
-
         try:
             with open(chat_file_path, "r", encoding="utf-8") as f:
                 content = f.read()
@@ -328,33 +491,7 @@ class SubjectRetriever:
             print(f"Error reading chat file: {e}")
             return []
 
-        lines = content.split("\n")
-        current_role = None
-        current_content = []
-
-        for line in lines:
-            if line.strip().lower().startswith("**user:**"):
-                if current_role and current_content:
-                    conversation_history.append(
-                        {"role": current_role, "content": "\n".join(current_content).strip()}
-                    )
-                current_role = "user"
-                current_content = []
-            elif line.strip().lower().startswith("**assistant:**"):
-                if current_role and current_content:
-                    conversation_history.append(
-                        {"role": current_role, "content": "\n".join(current_content).strip()}
-                    )
-                current_role = "assistant"
-                current_content = []
-            elif current_role is not None:
-                current_content.append(line)
-
-        if current_role and current_content:
-            conversation_history.append(
-                {"role": current_role, "content": "\n".join(current_content).strip()}
-            )
-
+        conversation_history = parse_chat_text(content)
         print(f"Loaded {len(conversation_history)} messages from chat file")
         return conversation_history if conversation_history else []
 
@@ -0,0 +1,122 @@
+"""Automatic small/large model routing for ChatSession.
+
+ModelRouter decides per prompt whether the fast small model is good
+enough or the request should go straight to the large model. The
+decision uses cheap text heuristics (code markers, prompt length, total
+context size). Answers from the small model are then checked for signs
+of low confidence; a failing answer is escalated to the large model.
+
+Per-route counts, latencies, and escalations are kept so thresholds can
+be tuned with /route stats and /route set.
+"""
+
+import re
+
+CODE_PATTERN = re.compile(
+    r"```|^\s*(def|class|import|from|function|const|let|var|public|private|#include)\b"
+    r"|Traceback \(most recent call last\)|\w+\(.*\)\s*[{:;]\s*$",
+    re.MULTILINE,
+)
+CODE_KEYWORDS = ("refactor", "debug", "stack trace", "regex", "sql", "algorithm", "compile", "unit test")
+HEDGE_PHRASES = (
+    "i'm not sure",
+    "i am not sure",
+    "i don't know",
+    "i do not know",
+    "i'm unable",
+    "i am unable",
+    "i cannot help",
+    "i can't help",
+    "not able to answer",
+)
+
+
+class ModelRouter:
+    """Pick a model per prompt and track per-route latency."""
+
+    TUNABLE = ("long_prompt_chars", "long_context_chars")
+
+    def __init__(self, small_model: str = "llama3", large_model: str = "qwen2.5-coder:32b"):
+        """Create a router between a small and a large model.
+
+        Args:
+            small_model: Fast model used for easy prompts.
+            large_model: Model used for code-heavy or long-context prompts
+                and for escalations.
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.long_prompt_chars = 1500
+        self.long_context_chars = 16000
+        self.stats = {}
+
+    def classify(self, prompt: str, context_chars: int = 0) -> tuple[str, str]:
+        """Choose a route for a prompt.
+
+        Args:
+            prompt: User prompt text.
+            context_chars: Size of the system prompt plus history.
+
+        Returns:
+            (route, reason) where route is "small" or "large".
+        """
+        if CODE_PATTERN.search(prompt):
+            return "large", "code"
+
+        lower = prompt.lower()
+        if any(keyword in lower for keyword in CODE_KEYWORDS):
+            return "large", "code keyword"
+
+        if len(prompt) > self.long_prompt_chars:
+            return "large", "long prompt"
+
+        if context_chars > self.long_context_chars:
+            return "large", "long context"
+
+        return "small", "simple"
+
+    def model_for(self, route: str) -> str:
+        """Return the model name for a route."""
+        return self.large_model if route == "large" else self.small_model
+
+    def is_confident(self, answer: str) -> bool:
+        """Return False if a small-model answer should be escalated.
+
+        Only empty answers and answers that open with a hedge are
+        escalated; short answers to simple prompts ("4", "Paris.") are
+        kept.
+        """
+        text = answer.strip()
+        if not text:
+            return False
+        opening = text[:300].lower()
+        return not any(phrase in opening for phrase in HEDGE_PHRASES)
+
+    def record(self, route: str, latency: float) -> None:
+        """Record one completed request.
+
+        Args:
+            route: "small", "large", or "escalated" (small answer rejected,
+                then answered by the large model).
+            latency: Wall-clock seconds for the request(s) on this route.
+        """
+        entry = self.stats.setdefault(route, {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += latency
+        entry["max"] = max(entry["max"], latency)
+
+    def format_stats(self) -> str:
+        """Return a table of per-route request counts and latencies."""
+        if not self.stats:
+            return "No routed requests yet."
+
+        lines = [f"{'route':<10} {'count':>6} {'avg s':>8} {'max s':>8}"]
+        for route, entry in sorted(self.stats.items()):
+            avg = entry["total"] / entry["count"]
+            lines.append(f"{route:<10} {entry['count']:>6} {avg:>8.2f} {entry['max']:>8.2f}")
+
+        small = self.stats.get("small", {}).get("count", 0)
+        escalated = self.stats.get("escalated", {}).get("count", 0)
+        if small + escalated:
+            lines.append(f"\nEscalation rate: {escalated / (small + escalated):.0%}")
+        return "\n".join(lines)
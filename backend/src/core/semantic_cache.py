@@ -0,0 +1,234 @@
+"""Embedding-based second-tier response cache.
+
+SemanticCache catches paraphrases that the exact-match ResponseCache
+misses. Each incoming prompt is embedded with an Ollama embedding model
+and compared (cosine similarity) against cached prompts recorded under
+the same persona/subject/model context. All vectors live in a single
+normalized float32 matrix, so a lookup is one matrix-vector product.
+The matrix grows by doubling its row capacity, so an insert writes one
+row instead of copying every vector.
+
+The index is saved as vectors.npy (memory-mapped on load) plus an
+entries.json sidecar, at most every SAVE_INTERVAL seconds while entries
+are being added and when the owning session closes (ChatSession.close),
+and the least recently used row is evicted once max_entries is reached.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.client import get_client
+
+SAVE_INTERVAL = 30.0
+MIN_CAPACITY = 64
+
+
+class SemanticCache:
+    """Cosine-similarity cache of responses keyed on prompt embeddings."""
+
+    def __init__(
+        self,
+        cache_dir: Path | str,
+        embed_model: str = "nomic-embed-text",
+        threshold: float = 0.92,
+        max_entries: int = 2000,
+    ):
+        """Create or load a semantic cache.
+
+        Args:
+            cache_dir: Directory holding vectors.npy and entries.json.
+            embed_model: Ollama model used to embed prompts.
+            threshold: Minimum cosine similarity counted as a hit.
+            max_entries: Maximum cached prompts before LRU eviction.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._entries = []
+        self._contexts = np.zeros(0, dtype=np.int32)
+        self._context_ids = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+
+    def _load(self) -> None:
+        """Load the index from disk, memory-mapping the vector matrix."""
+        vectors_file = self.cache_dir / "vectors.npy"
+        entries_file = self.cache_dir / "entries.json"
+        if not (vectors_file.exists() and entries_file.exists()):
+            return
+
+        try:
+            with open(entries_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(vectors_file, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"⚠ Could not load semantic cache: {e}")
+            return
+
+        if data.get("embed_model") != self.embed_model or len(data["entries"]) != len(vectors):
+            return
+
+        self._vectors = vectors
+        self._entries = data["entries"]
+        self._contexts = np.array(
+            [self._context_id(tuple(e["context"])) for e in self._entries], dtype=np.int32
+        )
+
+    def save(self) -> None:
+        """Write the index to disk if it changed since the last save."""
+        with self._lock:
+            if not self._dirty or self._vectors is None:
+                return
+            count = len(self._entries)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(self.cache_dir / "vectors.npy", np.asarray(self._vectors[:count]))
+            with open(self.cache_dir / "entries.json", "w", encoding="utf-8") as f:
+                json.dump({"embed_model": self.embed_model, "entries": self._entries}, f, ensure_ascii=False)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _context_id(self, context: tuple) -> int:
+        return self._context_ids.setdefault(context, len(self._context_ids))
+
+    def embed(self, text: str):
+        """Return the normalized embedding for text, or None on failure."""
+        try:
+            response = get_client().embed(model=self.embed_model, input=text)
+        except Exception as e:
+            print(f"⚠ Embedding failed ({self.embed_model}): {e}")
+            return None
+
+        vector = np.asarray(response["embeddings"][0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, context: tuple, prompt: str):
+        """Find the closest cached prompt in the same context.
+
+        Args:
+            context: Hashable context tuple (see ChatSession._cache_context).
+            prompt: Incoming user prompt.
+
+        Returns:
+            (match, vector) where match is a dict with 'prompt', 'response'
+            and 'similarity' keys (or None on a miss), and vector is the
+            prompt embedding to pass to add() after a fresh generation.
+        """
+        vector = self.embed(prompt)
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            match = self._match(self._context_ids.get(context), vector)
+            if match is None:
+                self.misses += 1
+                return None, vector
+
+            best, similarity = match
+            entry = self._entries[best]
+            entry["last_used"] = time.time()
+            self._dirty = True
+            self.hits += 1
+            return {"prompt": entry["prompt"], "response": entry["response"], "similarity": similarity}, vector
+
+    def _match(self, context_id: int | None, vector) -> tuple[int, float] | None:
+        """Return (row, similarity) of the closest entry in a context, if above threshold."""
+        count = len(self._entries)
+        if self._vectors is None or context_id is None or not count or self._vectors.shape[1] != vector.shape[0]:
+            return None
+        scores = self._vectors[:count] @ vector
+        scores = np.where(self._contexts[:count] == context_id, scores, -1.0)
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        return (best, similarity) if similarity >= self.threshold else None
+
+    def add(self, context: tuple, prompt: str, response: str, vector) -> None:
+        """Insert a prompt/response pair, evicting the LRU entry if full.
+
+        If the prompt matches a cached one in the same context (as in
+        lookup), that entry is replaced instead, so a regenerated answer
+        overwrites the stale one. The index is saved if SAVE_INTERVAL has
+        passed since the last save.
+
+        Args:
+            context: Hashable context tuple (see ChatSession._cache_context).
+            prompt: User prompt that was answered.
+            response: Assistant response text.
+            vector: Normalized prompt embedding from lookup().
+        """
+        if vector is None:
+            return
+
+        entry = {"context": list(context), "prompt": prompt, "response": response, "last_used": time.time()}
+        with self._lock:
+            context_id = self._context_id(context)
+            count = len(self._entries)
+            match = self._match(context_id, vector)
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.empty((MIN_CAPACITY, vector.shape[0]), dtype=np.float32)
+                self._contexts = np.empty(MIN_CAPACITY, dtype=np.int32)
+                self._entries = []
+                row = 0
+            elif match is not None or count >= self.max_entries:
+                row = match[0] if match is not None else min(range(count), key=lambda i: self._entries[i]["last_used"])
+                if not self._vectors.flags.writeable:
+                    self._vectors = np.array(self._vectors)
+            else:
+                if count == len(self._vectors) or not self._vectors.flags.writeable:
+                    self._grow(max(count + 1, min(max(MIN_CAPACITY, 2 * count), self.max_entries)))
+                row = count
+
+            self._vectors[row] = vector
+            self._contexts[row] = context_id
+            if row == len(self._entries):
+                self._entries.append(entry)
+            else:
+                self._entries[row] = entry
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def _grow(self, capacity: int) -> None:
+        """Move the vectors and contexts into writable arrays of capacity rows."""
+        count = len(self._entries)
+        vectors = np.empty((capacity, self._vectors.shape[1]), dtype=np.float32)
+        vectors[:count] = self._vectors[:count]
+        contexts = np.empty(capacity, dtype=np.int32)
+        contexts[:count] = self._contexts[:count]
+        self._vectors = vectors
+        self._contexts = contexts
+
+    def clear(self) -> None:
+        """Drop every cached entry, in memory and on disk."""
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+            self._contexts = np.zeros(0, dtype=np.int32)
+            self._dirty = False
+            self.hits = self.misses = 0
+            for name in ("vectors.npy", "entries.json"):
+                (self.cache_dir / name).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and index size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "embed_model": self.embed_model,
+        }
@@ -0,0 +1,313 @@
+"""Named chat sessions in one process.
+
+SessionManager keeps several ChatSessions open at once, each with its
+own persona, subject, model and history, and one PromptQueue per
+session so a session keeps generating after the user switches away.
+All sessions share the retriever (and its caches), the Ollama client
+from core.client, and a single AutosaveWriter that stores each
+session's active branch under data/sessions/<name>.md after every turn
+(and at each partial-reply checkpoint while a reply streams). The file
+is a BranchFile, so a turn appends only its own messages.
+The same writer keeps a snapshot of every session (see core.snapshot)
+up to date, so the next run can resume instantly. Partial-reply
+checkpoints refresh the snapshot at most every SNAPSHOT_INTERVAL
+seconds; finished turns always do.
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from core.autosave import BranchFile
+from core.prompt_queue import PromptQueue
+from core.snapshot import dump_snapshot, journal_line, load_snapshot, restore_chat, session_state
+
+SESSION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+SNAPSHOT_INTERVAL = 10.0
+
+
+class Session:
+    """One named session: a ChatSession and its prompt queue."""
+
+    __slots__ = ("name", "chat", "queue", "unseen", "state", "transcript", "journal")
+
+    def __init__(self, name: str, chat, queue: PromptQueue):
+        self.name = name
+        self.chat = chat
+        self.queue = queue
+        self.unseen = 0
+        self.state = None
+        self.transcript = None
+        self.journal = None
+
+
+class SessionManager:
+    """Create, switch and close named sessions."""
+
+    def __init__(self, chat, run, logger, autosave, autosave_dir: Path | str,
+                 spill_dir: Path | str | None = None, on_busy=None, on_idle=None,
+                 name: str = "main", retriever=None, snapshot_path: Path | str | None = None):
+        """Create a manager whose first (active) session wraps chat.
+
+        Args:
+            chat: ChatSession for the first session.
+            run: Callable(session, prompt) -> bool that answers one prompt
+                and returns True if the reply was shown to the user.
+            logger: ChatLogger used to format autosave transcripts.
+            autosave: Shared AutosaveWriter.
+            autosave_dir: Directory for <name>.md autosave files.
+            spill_dir: Directory for per-session spill segment files.
+            on_busy: Called when the first session starts generating.
+            on_idle: Called when the last generating session finishes.
+            name: Name of the first session.
+            retriever: SubjectRetriever used to fingerprint and rebuild
+                system prompts for snapshots.
+            snapshot_path: Snapshot file kept up to date while running.
+                A snapshot left by the previous run is moved to
+                previous_snapshot_path for /resume. Session journals
+                are kept in a "journal" folder next to it.
+        """
+        self._run = run
+        self.logger = logger
+        self.autosave = autosave
+        self.autosave_dir = Path(autosave_dir)
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self._on_busy = on_busy
+        self._on_idle = on_idle
+        self._lock = threading.Lock()
+        self._busy = 0
+        self.retriever = retriever
+        self.snapshot_path = Path(snapshot_path) if snapshot_path is not None else None
+        self.journal_dir = self.snapshot_path.parent / "journal" if self.snapshot_path is not None else None
+        self._run_id = f"{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+        self._snapshot_at = 0.0
+        if self.snapshot_path is not None:
+            if self.snapshot_path.exists():
+                self.snapshot_path.replace(self.previous_snapshot_path)
+            self._prune_journals()
+        self.sessions = {}
+        self.active = self._add(name, chat)
+
+    def _add(self, name: str, chat) -> Session:
+        session = Session(name, chat, None)
+        session.transcript = BranchFile(self.autosave, self.autosave_path(name), self._format_message)
+        if self.journal_dir is not None:
+            session.journal = BranchFile(self.autosave, self.journal_dir / f"{self._run_id}_{name}.jsonl", journal_line)
+        chat.on_checkpoint = lambda: self.save(session, partial=True)
+        session.queue = PromptQueue(
+            lambda prompt: self._answer(session, prompt),
+            on_busy=self._queue_busy,
+            on_idle=self._queue_idle,
+        )
+        chat.cancel_event = session.queue.cancelled
+        self.sessions[name] = session
+        return session
+
+    def _queue_busy(self):
+        with self._lock:
+            self._busy += 1
+            if self._busy == 1 and self._on_busy is not None:
+                self._on_busy()
+
+    def _queue_idle(self):
+        with self._lock:
+            self._busy -= 1
+            if self._busy == 0 and self._on_idle is not None:
+                self._on_idle()
+
+    def _answer(self, session: Session, prompt: str) -> None:
+        self._refresh_prompt(session)
+        try:
+            shown = self._run(session, prompt)
+        finally:
+            self.save(session)
+        if not shown:
+            session.unseen += 1
+            print(f"[session] '{session.name}' has a new reply. Use /session switch {session.name}")
+
+    def _refresh_prompt(self, session: Session) -> None:
+        """Rebuild the session's system prompt once summaries it waited for are written."""
+        chat = session.chat
+        if self.retriever is not None and self.retriever.prompt_outdated(chat.system_prompt):
+            chat.set_system_prompt(self.retriever.build_system_prompt(chat.current_persona, chat.current_subject))
+
+    def _format_message(self, message, first: bool) -> str:
+        """Autosave text of one message (blocks are separated by a blank line)."""
+        text = self.logger.format_message(message)
+        return text if first else "\n" + text
+
+    @property
+    def any_busy(self) -> bool:
+        """True while any session is generating or has queued prompts."""
+        return self._busy > 0
+
+    def autosave_path(self, name: str) -> Path:
+        """Autosave file for a session."""
+        return self.autosave_dir / f"{name}.md"
+
+    @property
+    def previous_snapshot_path(self) -> Path | None:
+        """Snapshot left by the previous run (read by /resume)."""
+        if self.snapshot_path is None:
+            return None
+        return self.snapshot_path.with_suffix(".prev.json")
+
+    def _prune_journals(self) -> None:
+        """Delete journals that the previous run's snapshot does not use."""
+        if not self.journal_dir.is_dir():
+            return
+        previous = self.load_previous_snapshot() or {}
+        keep = {state.get("journal") for state in previous.get("sessions", [])}
+        for path in self.journal_dir.glob("*.jsonl"):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    def save(self, session: Session, partial: bool = False) -> None:
+        """Queue the session's active branch and the snapshot for autosave.
+
+        Args:
+            session: Session to save.
+            partial: True for a checkpoint while a reply streams; the
+                snapshot is then refreshed at most every SNAPSHOT_INTERVAL.
+        """
+        chat = session.chat
+        if chat.history.nodes() or chat.spilled_count():
+            session.transcript.update(chat)
+        if not partial or time.monotonic() - self._snapshot_at >= SNAPSHOT_INTERVAL:
+            self.checkpoint(session)
+
+    def checkpoint(self, session: Session) -> None:
+        """Append new turns to one session's journal and queue the snapshot.
+
+        Call it from the thread that owns the session's history: its
+        queue worker, or the REPL thread while the queue is idle.
+        """
+        if self.snapshot_path is None or self.retriever is None:
+            return
+        session.state = session_state(session.name, session.chat, self.retriever, session.journal)
+        self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        """Queue the snapshot built from the latest session records."""
+        if self.snapshot_path is None:
+            return
+        states = [session.state for session in list(self.sessions.values()) if session.state is not None]
+        self.autosave.write(self.snapshot_path, dump_snapshot(states, self.active.name))
+        self._snapshot_at = time.monotonic()
+
+    def restore(self, snapshot: dict) -> list[tuple[str, bool | None]]:
+        """Open (or overwrite) sessions from a snapshot.
+
+        Sessions that are generating right now are left alone.
+
+        Returns:
+            (name, fresh) per snapshot session: fresh is True if the saved
+            system prompt was reused, False if it was rebuilt because its
+            files changed, and None if the session was busy and skipped.
+        """
+        results = []
+        for state in snapshot.get("sessions", []):
+            name = state["name"]
+            session = self.sessions.get(name)
+            if session is not None and session.queue.busy:
+                results.append((name, None))
+                continue
+            if session is None:
+                session = self._add(name, self.active.chat.spawn(self._spill_path(name)))
+            fresh = restore_chat(session.chat, state, self.retriever, self.journal_dir)
+            session.transcript.reset()
+            session.journal.reset()
+            session.unseen = 0
+            session.state = None
+            results.append((name, fresh))
+
+        active = self.sessions.get(snapshot.get("active"))
+        if active is not None:
+            self.active = active
+        for session in self.sessions.values():
+            if session.state is None and not session.queue.busy:
+                session.state = session_state(session.name, session.chat, self.retriever, session.journal)
+        self.write_snapshot()
+        return results
+
+    def load_previous_snapshot(self) -> dict | None:
+        """Read the snapshot left by the previous run, if any."""
+        if self.previous_snapshot_path is None:
+            return None
+        return load_snapshot(self.previous_snapshot_path)
+
+    def _spill_path(self, name: str) -> Path | None:
+        if self.spill_dir is None:
+            return None
+        return self.spill_dir / f"session_{os.getpid()}_{name}.seg"
+
+    def get(self, name: str) -> Session | None:
+        """Return the session called name, if open."""
+        return self.sessions.get(name)
+
+    def new(self, name: str) -> Session:
+        """Open a session that starts from the active session's settings.
+
+        The new session copies persona, subject, system prompt, model and
+        cache/routing settings, and starts with an empty history.
+
+        Raises:
+            ValueError: If the name is invalid or already in use.
+        """
+        if not SESSION_NAME.match(name):
+            raise ValueError("Session names may use letters, digits, '_' and '-' (max 40).")
+        if name in self.sessions:
+            raise ValueError(f"Session '{name}' already exists.")
+        session = self._add(name, self.active.chat.spawn(self._spill_path(name)))
+        self.checkpoint(session)
+        return session
+
+    def switch(self, name: str) -> Session:
+        """Make name the active session.
+
+        Raises:
+            KeyError: If no session has that name.
+        """
+        session = self.sessions[name]
+        self.active = session
+        self.write_snapshot()
+        return session
+
+    def close(self, name: str) -> Session:
+        """Close an idle session; the active one hands over to another.
+
+        Raises:
+            KeyError: If no session has that name.
+            ValueError: If it is the last session or still generating.
+        """
+        session = self.sessions[name]
+        if len(self.sessions) == 1:
+            raise ValueError("Cannot close the only session.")
+        if session.queue.busy:
+            raise ValueError(f"Session '{name}' is still generating.")
+        del self.sessions[name]
+        session.queue.close()
+        session.chat.close()
+        if self.active is session:
+            self.active = next(iter(self.sessions.values()))
+        self.write_snapshot()
+        return session
+
+    def wait_idle(self) -> None:
+        """Block until no session is generating."""
+        for session in list(self.sessions.values()):
+            session.queue.wait_idle()
+
+    def close_all(self) -> None:
+        """Finish queued prompts, snapshot and close every session, and flush autosaves."""
+        for session in list(self.sessions.values()):
+            session.queue.close()
+        if self.snapshot_path is not None and self.retriever is not None:
+            for session in self.sessions.values():
+                session.state = session_state(session.name, session.chat, self.retriever, session.journal)
+            self.write_snapshot()
+        for session in self.sessions.values():
+            session.chat.close()
+        self.autosave.flush()
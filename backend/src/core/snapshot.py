@@ -0,0 +1,130 @@
+"""Session snapshots for fast resume.
+
+A snapshot is one compact JSON file holding every open session's
+persona, subject, model, options, window size and system prompt, plus
+a fingerprint of the persona, subject and chat-log files the system
+prompt was built from (see SubjectRetriever.prompt_sources). Restoring
+a session reuses the saved system prompt, so nothing is re-read from
+disk, unless one of those files changed since the snapshot was taken;
+then the prompt is rebuilt and the history is still restored.
+
+Each session's active branch is kept in a journal next to the snapshot:
+one JSON [role, content] line per message, maintained as a BranchFile
+(see core.autosave), so a checkpoint appends only the turns added since
+the last one. The snapshot records the journal's file name, its size
+and message count; restoring reads the journal up to that size, so
+bytes written after the snapshot are ignored.
+"""
+
+import json
+import time
+from pathlib import Path
+
+SNAPSHOT_VERSION = 2
+
+
+def journal_line(message, first: bool) -> str:
+    """Journal text of one message (render function for BranchFile)."""
+    return json.dumps([message["role"], message["content"]], ensure_ascii=False) + "\n"
+
+
+def read_journal(path: Path | str, size: int):
+    """Yield the message dicts stored in the first size bytes of a journal.
+
+    Reading stops at the first incomplete or unreadable line; a missing
+    journal yields nothing.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        read = 0
+        for line in f:
+            read += len(line)
+            if read > size or not line.endswith(b"\n"):
+                return
+            try:
+                role, content = json.loads(line)
+            except ValueError:
+                return
+            yield {"role": role, "content": content}
+
+
+def session_state(name: str, chat, retriever, journal) -> dict:
+    """Bring a session's journal up to date and return its snapshot record.
+
+    Args:
+        name: Session name.
+        chat: The session's ChatSession.
+        retriever: SubjectRetriever used to fingerprint the prompt sources.
+        journal: The session's BranchFile journal.
+    """
+    journal.update(chat)
+    return {
+        "name": name,
+        "persona": chat.current_persona,
+        "subject": chat.current_subject,
+        "model": chat.model,
+        "options": chat.options,
+        "window": chat.window_messages,
+        "system_prompt": chat.system_prompt,
+        "sources": retriever.prompt_sources(chat.current_persona, chat.current_subject),
+        "journal": journal.path.name,
+        "journal_size": journal.size,
+        "messages": journal.count,
+        "saved": time.time(),
+    }
+
+
+def dump_snapshot(states, active: str) -> str:
+    """Serialize session records into snapshot text."""
+    return json.dumps(
+        {"version": SNAPSHOT_VERSION, "active": active, "sessions": list(states)},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def load_snapshot(path: Path | str) -> dict | None:
+    """Read a snapshot file.
+
+    Returns:
+        The snapshot dict, or None if the file is missing, unreadable or
+        from another snapshot version.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def restore_chat(chat, state: dict, retriever, journal_dir: Path | str) -> bool:
+    """Load a snapshot record into a ChatSession, replacing its history.
+
+    Args:
+        chat: ChatSession to load into.
+        state: Snapshot record from session_state.
+        retriever: SubjectRetriever used to check and rebuild the prompt.
+        journal_dir: Directory holding the snapshot's journals.
+
+    Returns:
+        True if the saved system prompt was reused, False if its source
+        files changed and the prompt was rebuilt.
+    """
+    persona, subject = state["persona"], state["subject"]
+    fresh = state.get("sources") == retriever.prompt_sources(persona, subject)
+    system_prompt = state["system_prompt"] if fresh else retriever.build_system_prompt(persona, subject)
+
+    chat.clear_history()
+    chat.model = state["model"]
+    chat.options = state.get("options")
+    chat.set_system_prompt(system_prompt)
+    chat.set_subject_info(persona, subject)
+    chat.load_history(read_journal(Path(journal_dir) / state["journal"], state["journal_size"]))
+    chat.set_window(state.get("window"))
+    return fresh
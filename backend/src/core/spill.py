@@ -0,0 +1,182 @@
+"""On-disk spill segment for old conversation turns.
+
+Long-running sessions keep only a bounded window of recent messages in
+memory. Older messages are appended to a per-session segment file and
+read back lazily through mmap when they are searched or exported.
+
+The spilled prefix of a branch is represented in the ConversationTree by
+a SpillMarker node: it keeps the depth, running token total and user
+turn count of the messages it replaces (so counts and turn numbers stay
+correct) and points at a range of
+records in the SpillStore. Markers chain through `prev` when a branch
+is spilled more than once. A marker's `digest` names the background
+summary of its records (see core.summarizer), once one is requested.
+
+Segment files are named session_<pid>[_<name>].seg and deleted when
+their session closes; remove_stale_segments deletes the ones left by
+processes that crashed.
+"""
+
+import mmap
+import os
+from array import array
+from pathlib import Path
+
+ROLE_CODES = {"system": 0, "user": 1, "assistant": 2}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+def _running(pid: int) -> bool:
+    """True if a process with this id exists (always False on Windows).
+
+    On Windows a running process keeps its segment open, which makes
+    deleting it fail, so no check is needed there.
+    """
+    if os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def remove_stale_segments(directory: Path | str) -> int:
+    """Delete segment files in directory whose process is no longer running.
+
+    Returns:
+        Number of files deleted.
+    """
+    removed = 0
+    for path in Path(directory).glob("session_*.seg"):
+        pid = path.stem.split("_")[1]
+        if not pid.isdigit() or int(pid) == os.getpid() or _running(int(pid)):
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+class SpillMarker:
+    """Placeholder for a spilled prefix of the conversation tree."""
+
+    __slots__ = ("prev", "start", "count", "depth", "total_tokens", "turns", "parent", "digest")
+
+    def __init__(self, prev, start: int, count: int, depth: int, total_tokens: int, turns: int = 0):
+        """Create a marker for `count` records starting at record `start`.
+
+        Args:
+            prev: Earlier SpillMarker of the same lineage, or None.
+            start: Index of the first spilled record in the SpillStore.
+            count: Number of records spilled under this marker.
+            depth: Depth of the last spilled message.
+            total_tokens: Running token total of the last spilled message.
+            turns: Number of user messages up to the last spilled one.
+        """
+        self.prev = prev
+        self.start = start
+        self.count = count
+        self.depth = depth
+        self.total_tokens = total_tokens
+        self.turns = turns
+        self.parent = None
+        self.digest = None
+
+    def markers(self) -> list:
+        """Return the markers of this lineage, oldest first."""
+        markers = []
+        marker = self
+        while marker is not None:
+            markers.append(marker)
+            marker = marker.prev
+        markers.reverse()
+        return markers
+
+    def ranges(self) -> list[tuple[int, int]]:
+        """Return (start, count) record ranges for this lineage, oldest first."""
+        return [(marker.start, marker.count) for marker in self.markers()]
+
+
+class SpillStore:
+    """Append-only segment file of spilled messages, read via mmap."""
+
+    def __init__(self, path: Path | str):
+        """Create (or truncate) the segment file at path.
+
+        Args:
+            path: Segment file location; parent folders are created.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w+b")
+        self._offsets = array("q")
+        self._lengths = array("l")
+        self._roles = array("b")
+        self._map = None
+        self._mapped_size = 0
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, role: str, content: str) -> int:
+        """Write one message and return its record index."""
+        data = content.encode("utf-8")
+        self._file.seek(0, os.SEEK_END)
+        self._offsets.append(self._file.tell())
+        self._lengths.append(len(data))
+        self._roles.append(ROLE_CODES.get(role, 1))
+        self._file.write(data)
+        return len(self._offsets) - 1
+
+    def _view(self):
+        """Return an mmap covering everything written so far."""
+        self._file.flush()
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is None or size != self._mapped_size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else None
+            self._mapped_size = size
+        return self._map
+
+    def read(self, index: int) -> tuple[str, str]:
+        """Return (role, content) for one record."""
+        view = self._view()
+        offset = self._offsets[index]
+        length = self._lengths[index]
+        content = view[offset : offset + length].decode("utf-8") if length else ""
+        return CODE_ROLES[self._roles[index]], content
+
+    def iter_records(self, ranges):
+        """Yield (role, content) for every record in the given ranges."""
+        for start, count in ranges:
+            for index in range(start, start + count):
+                yield self.read(index)
+
+    def search(self, query: str, ranges) -> list[tuple[int, str, str]]:
+        """Case-insensitive substring search over the given ranges.
+
+        Returns:
+            List of (position, role, content) where position is the
+            message's 0-based index within the ranges.
+        """
+        needle = query.lower()
+        matches = []
+        for position, (role, content) in enumerate(self.iter_records(ranges)):
+            if needle in content.lower():
+                matches.append((position, role, content))
+        return matches
+
+    def close(self, delete: bool = True) -> None:
+        """Close the segment file, deleting it by default."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+        if delete:
+            self.path.unlink(missing_ok=True)
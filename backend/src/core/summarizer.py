@@ -0,0 +1,163 @@
+"""Background summarization of old conversation material.
+
+Summarizer compresses text that no longer fits in the context budget
+(old subject chat logs, spilled session turns) with a configurable,
+ideally small and fast, model. Requests are queued and processed on a
+background thread only while the app is idle, i.e. not while a reply is
+being generated. Summaries are cached on disk keyed by a hash of the
+source text, so callers only ever read finished summaries and never
+wait on the model at turn time. A text whose summary failed is not
+queued again until a backoff (doubling from RETRY_DELAY up to
+MAX_RETRY_DELAY seconds) has passed.
+
+The app starts without a summarizer; `/summarize on` attaches one.
+"""
+
+import hashlib
+import queue
+import threading
+import time
+from pathlib import Path
+
+from core.client import get_client
+from core.history import estimate_tokens
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation log for use as background context "
+    "in a later conversation. Keep names, decisions, facts, open questions and "
+    "any user preferences. Use short bullet points and at most 200 words.\n\n"
+)
+
+RETRY_DELAY = 60.0
+MAX_RETRY_DELAY = 3600.0
+
+
+def content_key(text: str) -> str:
+    """Return the cache key (sha256 hex digest) for a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Summarizer:
+    """Disk-cached, idle-time summarizer running on a worker thread."""
+
+    def __init__(self, cache_dir: Path | str, model: str = "llama3", idle: threading.Event | None = None):
+        """Create a summarizer.
+
+        Args:
+            cache_dir: Directory for cached summaries (<key>.md files).
+            model: Ollama model used to write summaries.
+            idle: Event that is set while the app is idle, normally the
+                JobScheduler's; a private one is used if omitted.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.model = model
+        self.profiles = None
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        if idle is None:
+            idle = threading.Event()
+            idle.set()
+        self._idle = idle
+        self._worker = None
+        self._summaries = {}
+        self._failures = {}  # key -> (failure count, time.monotonic() of next retry)
+        self.completed = 0
+        self.failed = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.md"
+
+    def get(self, key: str) -> str | None:
+        """Return the cached summary for key, or None if not ready yet."""
+        summary = self._summaries.get(key)
+        if summary is None:
+            try:
+                summary = self._path(key).read_text(encoding="utf-8")
+            except OSError:
+                return None
+            self._summaries[key] = summary
+        return summary
+
+    def get_or_request(self, text: str) -> str | None:
+        """Return the cached summary of text, queueing it if missing."""
+        key = content_key(text)
+        summary = self.get(key)
+        if summary is None:
+            self.request(key, text)
+        return summary
+
+    def request(self, key: str, text: str) -> None:
+        """Queue text for background summarization.
+
+        Deduplicated by key; a key whose last attempt failed is skipped
+        until its retry time.
+        """
+        with self._lock:
+            if key in self._pending or self._path(key).exists():
+                return
+            failure = self._failures.get(key)
+            if failure is not None and time.monotonic() < failure[1]:
+                return
+            self._pending.add(key)
+        self._queue.put((key, text))
+        self._ensure_worker()
+
+    def pending_count(self) -> int:
+        """Number of summaries queued or in progress."""
+        with self._lock:
+            return len(self._pending)
+
+    def backing_off_count(self) -> int:
+        """Number of failed summaries waiting for their retry time."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for _, retry_at in self._failures.values() if now < retry_at)
+
+    def pause(self) -> None:
+        """Hold back new summaries while a reply is being generated."""
+        self._idle.clear()
+
+    def resume(self) -> None:
+        """Allow queued summaries to run again."""
+        self._idle.set()
+
+    def summarize_now(self, text: str) -> str:
+        """Summarize text with the model immediately (blocking)."""
+        messages = [{"role": "user", "content": SUMMARY_PROMPT + text}]
+        options = None
+        if self.profiles is not None:
+            options = self.profiles.options_for(self.model, prompt_tokens=estimate_tokens(messages[0]["content"]), command="summarize")
+        response = get_client().chat(model=self.model, messages=messages, options=options)
+        return response["message"]["content"].strip()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="summarizer", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        """Worker loop: wait for idle time, then summarize one item."""
+        while True:
+            key, text = self._queue.get()
+            self._idle.wait()
+            try:
+                summary = self.summarize_now(text)
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._path(key).with_suffix(".tmp")
+                tmp_path.write_text(summary, encoding="utf-8")
+                tmp_path.replace(self._path(key))
+                self._summaries[key] = summary
+                self.completed += 1
+                with self._lock:
+                    self._failures.pop(key, None)
+            except Exception:
+                self.failed += 1
+                with self._lock:
+                    count = self._failures.get(key, (0, 0.0))[0] + 1
+                    delay = min(RETRY_DELAY * 2 ** (count - 1), MAX_RETRY_DELAY)
+                    self._failures[key] = (count, time.monotonic() + delay)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
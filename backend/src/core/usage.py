@@ -0,0 +1,286 @@
+"""Per-turn usage records and an incrementally updated rollup.
+
+Every model turn appends one JSON line to subjects/<subject>/usage.jsonl,
+next to the subject's chats:
+
+    {"ts", "day", "persona", "subject", "model", "prompt_tokens",
+     "completion_tokens", "ttft", "duration", "tokens_per_s", "cached",
+     "escalated"}
+
+A routed turn whose small-model answer was escalated writes two lines;
+the small model's is marked "escalated" and counts its tokens and time
+but not as a message, so each turn is one message.
+
+UsageRollup folds those lines into one group per (subject, persona,
+model, day) holding counts, token totals and TTFT / throughput
+histograms, saved in data/cache/usage_rollup.json together with how far
+each usage file has been read. Updating reads only lines appended since
+the last update (a file that shrank, e.g. a deleted subject, is re-read
+from the start), so a report costs about the same after years of logs
+as after a day. Histogram buckets are about 5% wide, so percentiles are
+mergeable across groups and accurate to that resolution.
+"""
+
+import json
+import math
+import threading
+import time
+from pathlib import Path
+
+ROLLUP_VERSION = 1
+USAGE_FILE = "usage.jsonl"
+DIMENSIONS = ("subject", "persona", "model", "day")
+PERCENTILES = (50, 90, 99)
+
+# Histogram bucket i covers [HIST_BASE * HIST_RATIO**i, HIST_BASE * HIST_RATIO**(i+1))
+HIST_BASE = 0.001
+HIST_RATIO = 1.05
+
+
+def _bucket(value: float) -> str:
+    """Histogram bucket for a positive value (JSON object keys are strings)."""
+    return str(max(0, int(math.log(max(value, HIST_BASE) / HIST_BASE) / math.log(HIST_RATIO))))
+
+
+def _bucket_value(bucket: str) -> float:
+    """Representative (geometric middle) value of a bucket."""
+    return HIST_BASE * HIST_RATIO ** (int(bucket) + 0.5)
+
+
+def _rounded(value: float | None, digits: int) -> float | None:
+    return None if value is None else round(value, digits)
+
+
+def percentile(histogram: dict, pct: float) -> float | None:
+    """Approximate percentile of the values counted in a histogram."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = math.ceil(total * pct / 100)
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return _bucket_value(bucket)
+    return None
+
+
+class UsageLog:
+    """Append per-turn usage records next to each subject's chats."""
+
+    def __init__(self, subjects_path: Path | str, default_subject: str = "no_subject"):
+        self.subjects_path = Path(subjects_path)
+        self.default_subject = default_subject
+        self._lock = threading.Lock()
+
+    def record(self, persona: str | None, subject: str | None, model: str, metrics: dict,
+               cached: bool = False, escalated: bool = False) -> None:
+        """Append one turn.
+
+        Args:
+            persona: Active persona.
+            subject: Active subject (default subject if None).
+            model: Model that answered.
+            metrics: chunk_metrics-style dict ("ttft", "duration",
+                "tokens", "tokens_per_s", "prompt_tokens").
+            cached: True if the answer came from the response cache.
+            escalated: True if this answer was replaced by a larger
+                model's (the turn is counted with that answer).
+        """
+        subject = subject or self.default_subject
+        folder = self.subjects_path / subject
+        if not folder.is_dir():
+            return
+        now = time.time()
+        entry = {
+            "ts": round(now, 3),
+            "day": time.strftime("%Y-%m-%d", time.localtime(now)),
+            "persona": persona,
+            "subject": subject,
+            "model": model,
+            "prompt_tokens": metrics.get("prompt_tokens") or 0,
+            "completion_tokens": metrics.get("tokens") or 0,
+            "ttft": _rounded(metrics.get("ttft"), 4),
+            "duration": _rounded(metrics.get("duration"), 4),
+            "tokens_per_s": _rounded(metrics.get("tokens_per_s"), 2),
+            "cached": cached,
+            "escalated": escalated,
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(folder / USAGE_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class UsageRollup:
+    """Aggregated usage per (subject, persona, model, day), kept up to date incrementally."""
+
+    def __init__(self, subjects_path: Path | str, path: Path | str):
+        """Create a rollup over subjects_path stored in path (read on first update)."""
+        self.subjects_path = Path(subjects_path)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == ROLLUP_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": ROLLUP_VERSION, "files": {}, "groups": {}}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._data, separators=(",", ":")), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    @staticmethod
+    def _add(groups: dict, entry: dict) -> None:
+        key = "\t".join(str(entry.get(name) or "-") for name in DIMENSIONS)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "messages": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "duration": 0.0, "ttft": {}, "tps": {},
+            }
+        if not entry.get("escalated"):
+            group["messages"] += 1
+        if entry.get("cached"):
+            group["cached"] += 1
+            return
+        group["prompt_tokens"] += entry.get("prompt_tokens") or 0
+        group["completion_tokens"] += entry.get("completion_tokens") or 0
+        group["duration"] += entry.get("duration") or 0.0
+        if entry.get("ttft"):
+            bucket = _bucket(entry["ttft"])
+            group["ttft"][bucket] = group["ttft"].get(bucket, 0) + 1
+        if entry.get("tokens_per_s"):
+            bucket = _bucket(entry["tokens_per_s"])
+            group["tps"][bucket] = group["tps"].get(bucket, 0) + 1
+
+    def update(self) -> int:
+        """Fold usage lines appended since the last update into the rollup.
+
+        Returns:
+            Number of new usage records read.
+        """
+        with self._lock:
+            if self._data is None:
+                self._data = self._load()
+            data = self._data
+            files = data["files"]
+            groups = data["groups"]
+            added = 0
+            changed = False
+            seen = set()
+            paths = sorted(self.subjects_path.glob(f"*/{USAGE_FILE}")) if self.subjects_path.exists() else []
+            for path in paths:
+                subject = path.parent.name
+                seen.add(subject)
+                size = path.stat().st_size
+                offset = files.get(subject, 0)
+                if size == offset:
+                    continue
+                if size < offset:
+                    self._drop_subject(subject)
+                    changed = True
+                    offset = 0
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    for raw in f:
+                        if not raw.endswith(b"\n"):
+                            break  # being written; read it next time
+                        offset += len(raw)
+                        try:
+                            entry = json.loads(raw)
+                        except ValueError:
+                            continue
+                        entry["subject"] = subject
+                        self._add(groups, entry)
+                        added += 1
+                        changed = True
+                files[subject] = offset
+            for subject in [name for name in files if name not in seen]:
+                self._drop_subject(subject)
+                changed = True
+            if changed:
+                self._save()
+            return added
+
+    def _drop_subject(self, subject: str) -> None:
+        prefix = subject + "\t"
+        groups = self._data["groups"]
+        for key in [key for key in groups if key.startswith(prefix)]:
+            del groups[key]
+        self._data["files"].pop(subject, None)
+
+    def report(self, by=("subject",), since: str | None = None) -> list[dict]:
+        """Aggregate the rollup by some of subject, persona, model and day.
+
+        Args:
+            by: Dimension names to group by (others are merged).
+            since: Only include days on or after this YYYY-MM-DD date.
+
+        Returns:
+            One dict per group, most model time first, with the group's
+            dimension values, "messages", "cached", "prompt_tokens",
+            "completion_tokens", "duration", and "ttft_p50/p90/p99" and
+            "tps_p50/p90/p99" (None when there are no timed turns).
+        """
+        for name in by:
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{name}' (use {', '.join(DIMENSIONS)})")
+        self.update()
+        rows = {}
+        with self._lock:
+            for key, group in self._data["groups"].items():
+                values = dict(zip(DIMENSIONS, key.split("\t")))
+                if since and values["day"] < since:
+                    continue
+                row_key = tuple(values[name] for name in by)
+                row = rows.get(row_key)
+                if row is None:
+                    row = rows[row_key] = {name: values[name] for name in by}
+                    row.update(messages=0, cached=0, prompt_tokens=0, completion_tokens=0, duration=0.0, ttft={}, tps={})
+                for field in ("messages", "cached", "prompt_tokens", "completion_tokens", "duration"):
+                    row[field] += group[field]
+                for field in ("ttft", "tps"):
+                    for bucket, count in group[field].items():
+                        row[field][bucket] = row[field].get(bucket, 0) + count
+
+        result = []
+        for row in rows.values():
+            ttft, tps = row.pop("ttft"), row.pop("tps")
+            for pct in PERCENTILES:
+                row[f"ttft_p{pct}"] = percentile(ttft, pct)
+            for pct in PERCENTILES:
+                row[f"tps_p{pct}"] = percentile(tps, pct)
+            result.append(row)
+        result.sort(key=lambda row: -row["duration"])
+        return result
+
+
+def format_report(rows: list[dict], by) -> str:
+    """Render report rows as a fixed-width text table."""
+    if not rows:
+        return "No usage recorded yet."
+
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    header = "".join(f"{name:<18}" for name in by)
+    header += f"{'msgs':>7}{'cached':>7}{'prompt tok':>12}{'compl tok':>11}{'model s':>9}"
+    header += f"{'ttft p50/p90/p99 s':>22}{'tok/s p50/p90/p99':>21}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        line = "".join(f"{str(row[name])[:17]:<18}" for name in by)
+        line += f"{row['messages']:>7}{row['cached']:>7}{row['prompt_tokens']:>12}{row['completion_tokens']:>11}"
+        line += f"{row['duration']:>9.1f}"
+        line += f"{'/'.join(fmt(row[f'ttft_p{p}'], '.2f') for p in PERCENTILES):>22}"
+        line += f"{'/'.join(fmt(row[f'tps_p{p}'], '.0f') for p in PERCENTILES):>21}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -2,39 +2,77 @@
 
 This module wires together the SubjectRetriever, ChatSession, ChatLogger,
 and CommandHandler, then runs an interactive REPL in the terminal.
+
+Only lightweight modules are imported at the top level. The interactive
+UI (prompt_toolkit, command handlers) and the ollama package are loaded
+by the code paths that need them, so the one-shot `--prompt` mode and
+the batch subcommand start quickly.
 """
 
 """Version: 1.0.0"""
 
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import argparse
+import json
+import os
 import sys
+import threading
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from core.retriever import SubjectRetriever
-from core.chat import ChatSession
-from core.logger import ChatLogger
-from commands.command_handler import CommandHandler
-from utils.ui import print_welcome, get_user_input, print_warning
+
+_IMPORT_END = time.perf_counter()
+
+DATA_PATH = Path(__file__).parent.parent / "data"
+SNAPSHOT_PATH = DATA_PATH / "sessions" / "snapshot.json"
+PROFILES_FILE = "model_profiles.json"
+USAGE_ROLLUP_FILE = Path("cache") / "usage_rollup.json"
 
 def initialize_components():
     """Create and configure retriever, chat session, logger, and data path.
 
     Returns:
-        (retriever, chat, logger, data_path) tuple where:
+        (retriever, chat, logger, data_path, scheduler) tuple where:
             retriever: SubjectRetriever instance
             chat: ChatSession instance
             logger: ChatLogger instance
             data_path: Path to the data directory containing personas/subjects
+            scheduler: JobScheduler for idle-time background jobs
     """
-    base_path = Path(__file__).parent.parent
-    data_path = base_path / "data"
+    from core.chat import ChatSession
+    from core.logger import ChatLogger
+    from core.jobs import JobScheduler
+    from core.catalog import ChatCatalog
+    from core.profiles import GenerationProfiles
+    from core.coalesce import SingleFlight
+    from core.knowledge import KnowledgeBase
+    from core.usage import UsageLog, UsageRollup
+    from core.spill import remove_stale_segments
+
+    data_path = DATA_PATH
 
     retriever = SubjectRetriever(basepath=str(data_path))
     chat = ChatSession(model="llama3")  # default model
+    remove_stale_segments(data_path / "spill")
+    chat.enable_spill(data_path / "spill" / f"session_{os.getpid()}.seg")
+    scheduler = JobScheduler(data_path / "jobs.json")
+    retriever.catalog = ChatCatalog(data_path / "cache" / "catalog.json")
+    profiles = GenerationProfiles(data_path / PROFILES_FILE)
+    retriever.profiles = profiles
+    chat.profiles = profiles
+    chat.flights = SingleFlight()
+    retriever.knowledge = KnowledgeBase(retriever.subjects_path)
+    chat.knowledge = retriever.knowledge
+    chat.usage = UsageLog(retriever.subjects_path, retriever.default_subject)
+    retriever.usage_rollup = UsageRollup(retriever.subjects_path, data_path / USAGE_ROLLUP_FILE)
     logger = ChatLogger(str(data_path))
 
-    return retriever, chat, logger, data_path
+    return retriever, chat, logger, data_path, scheduler
 
 
 def load_defaults(retriever, chat):
@@ -48,57 +86,621 @@ def load_defaults(retriever, chat):
         chat.set_system_prompt(default_system_prompt)
         chat.set_subject_info(retriever.default_persona, retriever.default_subject)
     except Exception as e:
+        from utils.ui import print_warning
+
         print_warning(f"Could not load defaults: {e}")
 
 
-def process_message(chat, user_input: str, text_streaming: bool):
+def start_load_defaults(retriever, chat) -> threading.Thread:
+    """Run load_defaults on a background thread and return the thread.
+
+    The default system prompt is built while the welcome banner and the
+    first prompt are already on screen; join the thread before the first
+    line of input is handled.
+    """
+    thread = threading.Thread(target=load_defaults, args=(retriever, chat), name="load-defaults", daemon=True)
+    thread.start()
+    return thread
+
+
+def process_message(chat, user_input: str, text_streaming: bool, flush: bool = True, visible=None,
+                    fps: int | None = None, markdown: bool = False) -> bool:
     """Send a user message to the model and print the assistant response.
 
+    Output goes through a StreamRenderer, which writes streamed chunks as
+    frames at most fps times per second (raw passthrough when stdout is
+    not a terminal) and optionally styles markdown.
+
     Args:
         chat: ChatSession used to talk to the model.
         user_input: User prompt to send.
         text_streaming: Whether to stream the response chunk‑by‑chunk.
+        flush: Flush after every frame. Pass False when stdout is patched
+            to print above the prompt, so output is drawn a line at a time.
+        visible: Optional callable; while it returns False nothing is
+            printed (used for sessions generating in the background).
+        fps: Maximum frames per second (default utils.renderer.DEFAULT_FPS).
+        markdown: Style headings, code and bold text with ANSI codes.
+
+    Returns:
+        True if the whole reply was printed.
     """
-    print()
+    from utils.renderer import DEFAULT_FPS, StreamRenderer
+
+    renderer = StreamRenderer(sys.stdout, DEFAULT_FPS if fps is None else fps, markdown, flush)
+    shown = visible is None or visible()
+    if shown:
+        print()
 
     if text_streaming:
-        print("Assistant:")
+        if shown:
+            print("Assistant:")
         for chunk in chat.send_message_stream(user_input):
-            print(chunk, end="", flush=True)
-        print()
+            if shown and visible is not None and not visible():
+                shown = False
+                renderer.close()
+                print()
+            if shown:
+                renderer.write(chunk)
+        if shown:
+            renderer.close()
+            print()
     else:
         response = chat.send_message(user_input)
-        print("Assistant:\n" + response)
+        shown = visible is None or visible()
+        if shown:
+            print("Assistant:")
+            renderer.write(response)
+            renderer.close()
+            print()
+
+    if not shown:
+        return False
+    if chat.cancelled:
+        print("[cancelled] Reply stopped; the text so far is kept.")
+        return True
+
+    route = chat.last_route
+    if route is not None:
+        print(f"\n[route] {route['route']} ({route['reason']}) via {route['model']}")
+
+    hit = chat.last_cache_hit
+    if hit is not None:
+        if hit["tier"] == "semantic":
+            print(f"\n[cache] Similar prompt ({hit['similarity']:.2f}): \"{hit['prompt']}\"")
+        else:
+            print("\n[cache] Exact repeat of an earlier prompt.")
+        print("[cache] Use /fresh to generate a new answer.")
+    return True
+
+
+def parse_args(argv=None):
+    """Parse command line flags for the chat application."""
+    parser = argparse.ArgumentParser(description="Subject-aware local chat")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and initialization time, and save a startup profile",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Restore the sessions (persona, subject, model, history) saved when the last run ended",
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=None,
+        help="Maximum redraws per second while a reply streams (default 30; 0 = every chunk)",
+    )
+    parser.add_argument(
+        "--markdown",
+        action="store_true",
+        help="Style headings, code blocks and bold text in replies (terminal only)",
+    )
+    parser.add_argument(
+        "--titles",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Title up to N untitled chats with the chat model while idle (default 0: no titles)",
+    )
+    parser.add_argument(
+        "--startup-benchmark",
+        action="store_true",
+        help="Start up to the first prompt, print timings as JSON and exit (see benchmarks/bench_startup.py)",
+    )
+    parser.add_argument(
+        "--prompt",
+        default=None,
+        help="Answer one prompt and exit, streaming raw text to stdout ('-' reads stdin)",
+    )
+    parser.add_argument("--persona", default=None, help="Persona for --prompt (default persona if omitted)")
+    parser.add_argument("--subject", default=None, help="Subject for --prompt (default subject if omitted)")
+    parser.add_argument("--model", default="llama3", help="Ollama model for --prompt (default: llama3)")
+
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser(
+        "batch",
+        help="Answer every prompt in a JSONL/text file without the interactive UI",
+        description="Run prompts from a file (or stdin) and write JSONL results with timings.",
+    )
+    batch.add_argument("input", help="Prompt file (JSONL or one prompt per line), or - for stdin")
+    batch.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    batch.add_argument("--persona", default=None, help="Persona name (default persona if omitted)")
+    batch.add_argument("--subject", default=None, help="Subject name (default subject if omitted)")
+    batch.add_argument("--model", default="llama3", help="Ollama model (default: llama3)")
+    batch.add_argument("--workers", type=int, default=4, help="Concurrent requests (default: 4)")
+    batch.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Overwrite the output file instead of skipping IDs it already completed",
+    )
+
+    ingest = subparsers.add_parser(
+        "ingest",
+        help="Add text/markdown files to a subject's knowledge store",
+        description="Chunk, index and deduplicate documents so chats on the subject can draw on them.",
+    )
+    ingest.add_argument("paths", nargs="+", help="Files or directories (.md, .markdown, .txt, .text, .rst)")
+    ingest.add_argument("--subject", required=True, help="Subject whose knowledge store receives the files")
+
+    index = subparsers.add_parser(
+        "index",
+        help="Rebuild the chat catalog (message counts, previews, tokens) in parallel",
+        description="Parse every saved chat on a process pool and refresh data/cache/catalog.json.",
+    )
+    index.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, max 8)")
+    index.add_argument("--full", action="store_true", help="Re-parse every chat, not only changed ones")
+
+    stats = subparsers.add_parser(
+        "stats",
+        help="Report token usage and latency per subject, persona, model or day",
+        description="Aggregate the per-turn usage logs (subjects/*/usage.jsonl) through the incremental rollup.",
+    )
+    stats.add_argument("--by", default="subject", help="Comma-separated: subject, persona, model, day (default: subject)")
+    stats.add_argument("--days", type=int, default=None, help="Only the last N days")
+    stats.add_argument("--json", action="store_true", help="Print rows as JSON")
+    return parser.parse_args(argv)
+
+
+def run_oneshot(args) -> int:
+    """Answer a single prompt for shell pipelines; return the exit code.
+
+    The reply is streamed to stdout exactly as generated (frame-limited,
+    and optionally styled, only when stdout is a terminal), with no banner,
+    labels or history. Errors go to stderr. Neither prompt_toolkit nor
+    the ollama package is imported.
+    """
+    from core.client import stream_chat
+
+    prompt = sys.stdin.read() if args.prompt == "-" else args.prompt
+    if not prompt.strip():
+        print("✗ Empty prompt.", file=sys.stderr)
+        return 2
+
+    from core.knowledge import KnowledgeBase
+
+    retriever = SubjectRetriever(basepath=str(DATA_PATH))
+    retriever.knowledge = KnowledgeBase(retriever.subjects_path)
+    try:
+        system_prompt = retriever.build_system_prompt(args.persona, args.subject, query=prompt)
+    except FileNotFoundError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    from core.history import estimate_tokens
+    from core.profiles import GenerationProfiles
+
+    options = GenerationProfiles(DATA_PATH / PROFILES_FILE).options_for(
+        args.model,
+        args.persona or retriever.default_persona,
+        args.subject or retriever.default_subject,
+        sum(estimate_tokens(m["content"]) for m in messages),
+    )
+    from utils.renderer import DEFAULT_FPS, StreamRenderer
+
+    out = sys.stdout
+    renderer = StreamRenderer(out, DEFAULT_FPS if args.fps is None else args.fps, args.markdown)
+    text = ""
+    try:
+        for text in stream_chat(args.model, messages, options):
+            renderer.write(text)
+        renderer.close()
+        if not text.endswith("\n"):
+            out.write("\n")
+        out.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        return 0
+    except (ConnectionError, RuntimeError) as e:
+        print(f"\n✗ {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+def run_batch_mode(args) -> int:
+    """Run the batch subcommand; return the process exit code."""
+    from core.batch import read_prompts, completed_ids, run_batch, print_progress
+    from core.profiles import GenerationProfiles
+    from core.coalesce import SingleFlight
+    from core.knowledge import KnowledgeBase
+    from core.usage import UsageLog
+
+    retriever = SubjectRetriever(basepath=str(DATA_PATH))
+    persona = args.persona or retriever.default_persona
+    subject = args.subject or retriever.default_subject
+    try:
+        system_prompt = retriever.build_system_prompt(persona, subject)
+    except FileNotFoundError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+
+    flights = SingleFlight()
+    skip_ids = set()
+    # Open the input first, so a wrong input path never truncates the results
+    try:
+        source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    except OSError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        if not args.no_resume:
+            skip_ids = completed_ids(args.output)
+        try:
+            output = open(args.output, "w" if args.no_resume else "a", encoding="utf-8")
+        except OSError as e:
+            if source is not sys.stdin:
+                source.close()
+            print(f"✗ {e}", file=sys.stderr)
+            return 2
+
+    try:
+        done, failed, skipped = run_batch(
+            read_prompts(source),
+            output,
+            system_prompt,
+            args.model,
+            persona,
+            subject,
+            workers=max(1, args.workers),
+            skip_ids=skip_ids,
+            on_progress=print_progress,
+            profiles=GenerationProfiles(DATA_PATH / PROFILES_FILE),
+            flights=flights,
+            knowledge=KnowledgeBase(retriever.subjects_path),
+            usage=UsageLog(retriever.subjects_path, retriever.default_subject),
+        )
+    except KeyboardInterrupt:
+        print("\n[batch] Interrupted; re-run the same command to resume.", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f"\n✗ {e}", file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"\n[batch] Finished: {done} answered ({failed} failed), {skipped} already done.", file=sys.stderr)
+    if flights.joined:
+        print(f"[batch] {flights.joined} prompt(s) shared a generation with an identical prompt in flight.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_ingest_mode(args) -> int:
+    """Run the ingest subcommand; return the process exit code."""
+    from core.knowledge import KnowledgeBase, ingest_paths
+
+    retriever = SubjectRetriever(basepath=str(DATA_PATH))
+    if args.subject not in retriever.list_subjects():
+        print(f"✗ Subject '{args.subject}' not found.", file=sys.stderr)
+        return 2
+
+    store = KnowledgeBase(retriever.subjects_path).store(args.subject)
+    failed = 0
+    for path, result, error in ingest_paths(store, args.paths):
+        if error is not None:
+            failed += 1
+            print(f"✗ {path}: {error}", file=sys.stderr)
+        else:
+            print(f"{result['status']:<10} {path}  ({result['chunks']} chunks, {result['duplicates']} duplicate)")
+    print(f"[ingest] {len(store.documents)} document(s) in '{args.subject}'.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_index_mode(args) -> int:
+    """Run the index subcommand; return the process exit code."""
+    from core.catalog import ChatCatalog
+    from core.corpus import chat_file_summary, scan_corpus
+
+    retriever = SubjectRetriever(basepath=str(DATA_PATH))
+    catalog = ChatCatalog(DATA_PATH / "cache" / "catalog.json")
+    keys = []
+    changed = []
+    fields = {}
+    for subject_name, chat_filename, path in retriever.list_all_chats():
+        key = ChatCatalog.key(subject_name, chat_filename)
+        keys.append(key)
+        stat = path.stat()
+        entry = catalog.entries.get(key)
+        unchanged = entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size
+        if unchanged and not args.full:
+            continue
+        # Stored with the parse result, so a cancelled run re-parses this file
+        fields[key] = {"mtime": stat.st_mtime, "size": stat.st_size, "title": entry.get("title") if unchanged else None}
+        changed.append((key, path))
+
+    def progress(done, total):
+        print(f"\r[index] {done}/{total} chats parsed", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    cancel = threading.Event()
+    failed = 0
+    try:
+        for key, result, error in scan_corpus(changed, chat_file_summary, args.workers, on_progress=progress, cancel=cancel):
+            if error is not None:
+                failed += 1
+                print(f"\n✗ {key}: {error}", file=sys.stderr)
+            catalog.update(key, **fields[key], **(result or {"messages": 0, "preview": "", "tokens": 0}))
+    except KeyboardInterrupt:
+        cancel.set()
+        catalog.save()
+        print("\n[index] Cancelled; parsed chats were saved. Run again to finish.", file=sys.stderr)
+        return 130
+    catalog.remove_missing(keys)
+    catalog.save()
+    elapsed = time.perf_counter() - start
+    print(f"\n[index] {len(changed)} of {len(keys)} chats parsed in {elapsed:.2f}s ({failed} failed).", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_stats_mode(args) -> int:
+    """Run the stats subcommand; return the process exit code."""
+    from core.usage import UsageRollup, format_report
+
+    retriever = SubjectRetriever(basepath=str(DATA_PATH))
+    by = tuple(name.strip() for name in args.by.split(",") if name.strip())
+    since = None
+    if args.days:
+        since = time.strftime("%Y-%m-%d", time.localtime(time.time() - (args.days - 1) * 86400))
+    try:
+        rows = UsageRollup(retriever.subjects_path, DATA_PATH / USAGE_ROLLUP_FILE).report(by, since)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(rows, indent=2) if args.json else format_report(rows, by))
+    return 0
+
+
+def profile_startup():
+    """Initialize the app under cProfile and report where startup time went.
+
+    Returns:
+        (retriever, chat, logger, data_path, scheduler) tuple, as
+        initialize_components.
+    """
+    from utils.profiler import profile_call
+    from utils.ui import print_section_header
+
+    components, init_time, init_profile = profile_call(initialize_components)
+    retriever, chat, logger, data_path, scheduler = components
+    _, defaults_time, defaults_profile = profile_call(load_defaults, retriever, chat)
+
+    output_dir = data_path / "profiling"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    init_profile.dump_stats(str(output_dir / "startup_initialize_components.prof"))
+    defaults_profile.dump_stats(str(output_dir / "startup_load_defaults.prof"))
+
+    import_time = _IMPORT_END - _IMPORT_START
+    print_section_header("Startup profile")
+    print(f"Imports:               {import_time * 1000:8.1f} ms")
+    print(f"initialize_components: {init_time * 1000:8.1f} ms")
+    print(f"load_defaults:         {defaults_time * 1000:8.1f} ms")
+    print(f"Total:                 {(import_time + init_time + defaults_time) * 1000:8.1f} ms")
+    print(f"Profiles written to {output_dir}")
 
+    return retriever, chat, logger, data_path, scheduler
 
-def main():
-    """Run the interactive chat loop until the user chooses to exit."""
-    retriever, chat, logger, data_path = initialize_components()
-    load_defaults(retriever, chat)
 
-    command_handler = CommandHandler(retriever, chat, logger)
+def main(argv=None):
+    """Run the interactive chat loop until the user chooses to exit.
+
+    With --prompt or the batch subcommand, prompts are answered
+    headlessly instead and the exit code is returned.
+    """
+    args = parse_args(argv)
+    if args.command == "batch":
+        return run_batch_mode(args)
+    if args.command == "ingest":
+        return run_ingest_mode(args)
+    if args.command == "index":
+        return run_index_mode(args)
+    if args.command == "stats":
+        return run_stats_mode(args)
+    if args.prompt is not None:
+        return run_oneshot(args)
+
+    snapshot = None
+    if args.resume:
+        from core.snapshot import load_snapshot
+
+        snapshot = load_snapshot(SNAPSHOT_PATH)
+        if snapshot is None:
+            print("[info] No saved sessions to resume; starting fresh.")
+
+    defaults = None
+    if args.profile_startup:
+        retriever, chat, logger, data_path, scheduler = profile_startup()
+    else:
+        retriever, chat, logger, data_path, scheduler = initialize_components()
+        if snapshot is None:
+            defaults = start_load_defaults(retriever, chat)
+        elif all(state["name"] != "main" for state in snapshot.get("sessions", [])):
+            # The first session is not restored, so it needs the defaults now
+            load_defaults(retriever, chat)
+
+    from commands.command_handler import CommandHandler
+    from core.background_jobs import start_default_jobs
+    from utils.ui import print_welcome, load_prompt_toolkit
+
+    command_handler = CommandHandler(retriever, chat, logger, scheduler)
+    if args.fps is not None:
+        command_handler.render_fps = max(0, args.fps)
+    command_handler.render_markdown = args.markdown
+    profiler = command_handler.profiler
 
     print_welcome()
+    if args.startup_benchmark:
+        return report_startup(defaults, load_prompt_toolkit)
+    start_default_jobs(scheduler, retriever, chat, retriever.catalog, max(0, args.titles), defaults)
+
+    try:
+        run_loop(command_handler, scheduler, chat, profiler, defaults, snapshot)
+    finally:
+        scheduler.shutdown()
+        chat.close()
+
+
+def report_startup(defaults, load_prompt_toolkit) -> int:
+    """Finish startup up to the first prompt and print timings as JSON.
 
-    while True:
+    Times are in milliseconds since main.py started executing; the
+    interpreter's own startup is measured by the benchmark script.
+    """
+    load_prompt_toolkit()
+    to_prompt = time.perf_counter()
+    if defaults is not None:
+        defaults.join()
+    defaults_done = time.perf_counter()
+    print(json.dumps({
+        "imports_ms": round((_IMPORT_END - _IMPORT_START) * 1000, 1),
+        "to_prompt_ms": round((to_prompt - _IMPORT_START) * 1000, 1),
+        "defaults_ready_ms": round((defaults_done - _IMPORT_START) * 1000, 1),
+        "modules": len(sys.modules),
+    }))
+    return 0
+
+
+def run_loop(command_handler, scheduler, chat, profiler, defaults=None, snapshot=None):
+    """Read prompts and commands until /exit.
+
+    Each named session (see core.sessions) answers its prompts on its own
+    PromptQueue worker while the input area stays open; output is
+    printed above the prompt. Prompts typed while the active session is
+    generating are queued and sent in order, and sessions that are not
+    active keep generating without printing. Slash commands (other than
+    /session and /cancel) and persona/subject switches wait for the
+    active session's queue to drain first, since they may change the
+    conversation. Ctrl+C while the active session is generating stops
+    the reply and drops the prompts queued after it.
+
+    Background jobs (and summaries) only run while waiting for input
+    with no session generating, so they never compete with the model.
+    If defaults is the start_load_defaults thread, it is joined before
+    the first input is handled.
+
+    Every session is snapshotted to SNAPSHOT_PATH after each turn and
+    command and on exit; a snapshot passed in (from --resume) is
+    restored before the first prompt.
+    """
+    from commands.registry import parse_command
+    from commands.session_commands import report_restore
+    from core.autosave import AutosaveWriter
+    from core.sessions import SessionManager
+    from utils.ui import get_user_input, patch_output
+
+    def answer(session, prompt):
+        with profiler.section("turn"):
+            return process_message(
+                session.chat, prompt, command_handler.text_streaming,
+                flush=False, visible=lambda: sessions.active is session,
+                fps=command_handler.render_fps, markdown=command_handler.render_markdown,
+            )
+
+    retriever = command_handler.retriever
+    sessions = SessionManager(
+        chat, answer, command_handler.logger, AutosaveWriter(),
+        retriever.basepath / "sessions", spill_dir=retriever.basepath / "spill",
+        on_busy=scheduler.pause, on_idle=scheduler.resume,
+        retriever=retriever, snapshot_path=SNAPSHOT_PATH,
+    )
+    command_handler.sessions = sessions
+    if snapshot is not None:
+        report_restore(sessions, snapshot)
+
+    with patch_output():
         try:
-            user_input = get_user_input()
-            if not user_input:
-                continue
+            while True:
+                try:
+                    active = sessions.active
+                    label = f"User [{active.name}]" if len(sessions.sessions) > 1 else "User"
+                    if active.queue.busy:
+                        label += f" ({active.queue.pending_count} in progress or queued)"
+                    if sessions.any_busy:
+                        user_input = get_user_input(f"\n{label}:\n", interrupt=True)
+                    else:
+                        with profiler.section("input"):
+                            scheduler.resume()
+                            user_input = get_user_input(f"\n{label}:\n", interrupt=True)
+                            scheduler.pause()
+                    if defaults is not None:
+                        defaults.join()
+                        defaults = None
+                    if not user_input:
+                        continue
+
+                    active = sessions.active
+                    parsed = parse_command(user_input)
+                    is_prompt = parsed is None and retriever.parse_subject_command(user_input)[:2] == (None, None)
+                    if is_prompt and active.queue.busy:
+                        ahead = active.queue.submit(user_input)
+                        print(f"[queue] Prompt queued ({ahead} ahead).")
+                        continue
 
-            should_exit, modified_input = command_handler.handle_command(user_input)
+                    if parsed is not None and parsed[0].lower() == "exit" and sessions.any_busy:
+                        print("[queue] Waiting for every session to finish its replies before exiting.")
+                        sessions.wait_idle()
+                    elif (parsed is None or parsed[0].lower() not in ("session", "cancel")) and active.queue.busy:
+                        print(f"[queue] Waiting for {active.queue.pending_count} queued prompt(s) before running this.")
+                        active.queue.wait_idle()
+                    if not sessions.any_busy:
+                        scheduler.pause()
 
-            if should_exit:
-                break
+                    with profiler.section("command"):
+                        should_exit, modified_input = command_handler.handle_command(user_input)
 
-            if modified_input:
-                process_message(chat, modified_input, command_handler.text_streaming)
+                    if should_exit:
+                        if profiler.enabled:
+                            for path in profiler.dump():
+                                print(f"[info] Profile written: {path}")
+                        break
 
-        except KeyboardInterrupt:
-            print("\n⚠ Use /exit to save and quit.")
-        except Exception as e:
-            print(f"✗ Error: {e}")
+                    if modified_input:
+                        sessions.active.queue.submit(modified_input)
+                    elif not sessions.active.queue.busy:
+                        sessions.checkpoint(sessions.active)
 
+                except KeyboardInterrupt:
+                    if sessions.active.queue.busy:
+                        dropped = sessions.active.queue.cancel()
+                        print(f"\n[queue] Stopping the reply ({dropped} queued prompt(s) dropped).")
+                    else:
+                        print("\n⚠ Use /exit to save and quit.")
+                except Exception as e:
+                    print(f"✗ Error: {e}")
+        finally:
+            sessions.close_all()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
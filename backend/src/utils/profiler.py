@@ -0,0 +1,206 @@
+"""Lightweight profiling hooks for the chat REPL.
+
+SessionProfiler wraps sections of the main loop (prompt input, command
+handling, model turns) in cProfile so the time spent in prompt_toolkit,
+SubjectRetriever file I/O, and the Ollama client can be told apart.
+Optionally, tracemalloc snapshots are captured as well.
+
+Sections run on several threads (model turns run on the session's
+prompt-queue worker while the REPL thread reads input). Before Python
+3.12 cProfile only hooks the thread that enables it, so each thread
+gets its own Profile and dumps merge them. From 3.12 on cProfile hooks
+every thread and refuses a second active profiler, so one Profile is
+shared and stays enabled while any section is open.
+
+Dumps are written under the data directory:
+    - profile_<ts>.prof : pstats file (open with snakeviz, flameprof,
+                          or `python -m pstats`)
+    - profile_<ts>.txt  : top functions by cumulative time plus wall-clock
+                          totals for each wrapped section
+    - memory_<ts>.txt   : top allocation sites (when memory tracing is on)
+    - memory_<ts>.snap  : raw tracemalloc snapshot for offline comparison
+"""
+
+import cProfile
+import io
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SHARED_PROFILE = sys.version_info >= (3, 12)
+
+
+class SessionProfiler:
+    """Accumulate cProfile and tracemalloc data across REPL sections."""
+
+    def __init__(self, output_dir: Path | str):
+        """Create a profiler that writes its dumps to output_dir.
+
+        Args:
+            output_dir: Directory for .prof/.txt/.snap files. Created on
+                first dump.
+        """
+        self.output_dir = Path(output_dir)
+        self.enabled = False
+        self.trace_memory = False
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._active = {}
+        self._depth = {}
+        self._section_times = {}
+        self._memory = None
+
+    def start(self, trace_memory: bool = False) -> None:
+        """Start collecting profile data for wrapped sections.
+
+        Args:
+            trace_memory: Also start tracemalloc so dumps include the top
+                allocation sites.
+        """
+        self.enabled = True
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        self.trace_memory = trace_memory or self.trace_memory
+
+    def stop(self) -> None:
+        """Stop collecting data. Accumulated stats are kept until dumped.
+
+        With memory tracing on, a tracemalloc snapshot is taken before
+        tracing stops, so the next dump still includes it.
+        """
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._memory = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory())
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    @contextmanager
+    def section(self, label: str):
+        """Profile the wrapped block under the given section label.
+
+        When the profiler is disabled this is a no-op, so it is safe to
+        leave around hot paths in the main loop.
+
+        Args:
+            label: Section name used in the wall-clock summary.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        key = None if SHARED_PROFILE else threading.get_ident()
+        start = time.perf_counter()
+        with self._lock:
+            depth = self._depth.get(key, 0)
+            if depth == 0:
+                profile = self._profiles.get(key)
+                if profile is None:
+                    profile = self._profiles[key] = cProfile.Profile()
+                profile.enable()
+                self._active[key] = profile
+            self._depth[key] = depth + 1
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._depth[key] -= 1
+                if self._depth[key] == 0:
+                    self._active.pop(key).disable()
+                count, total = self._section_times.get(label, (0, 0.0))
+                self._section_times[label] = (count + 1, total + elapsed)
+
+    def format_section_times(self) -> str:
+        """Return a small table of wall-clock totals per section."""
+        with self._lock:
+            section_times = dict(self._section_times)
+        if not section_times:
+            return "No sections recorded."
+
+        lines = [f"{'section':<12} {'calls':>6} {'total s':>10} {'avg ms':>10}"]
+        for label, (count, total) in sorted(
+            section_times.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            lines.append(f"{label:<12} {count:>6} {total:>10.3f} {total / count * 1000:>10.1f}")
+        return "\n".join(lines)
+
+    def dump(self, top: int = 40) -> list[Path]:
+        """Write collected stats to disk and reset the accumulated data.
+
+        Args:
+            top: Number of functions to include in the text summary.
+
+        Returns:
+            List of paths that were written (empty if nothing was recorded).
+        """
+        written = []
+        memory = self._memory
+        if tracemalloc.is_tracing():
+            memory = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory())
+        if not self._profiles and memory is None:
+            return written
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+
+        if self._profiles:
+            section_times = self.format_section_times()
+            with self._lock:
+                # Open sections keep their (now dumped) profile until they end
+                profiles = list(self._profiles.values())
+                self._profiles = {}
+                self._section_times = {}
+
+            import pstats
+
+            buffer = io.StringIO()
+            stats = pstats.Stats(*profiles, stream=buffer)
+            prof_file = self.output_dir / f"profile_{timestamp}.prof"
+            stats.dump_stats(str(prof_file))
+            written.append(prof_file)
+            stats.sort_stats("cumulative").print_stats(top)
+
+            summary_file = self.output_dir / f"profile_{timestamp}.txt"
+            with open(summary_file, "w", encoding="utf-8") as f:
+                f.write("# Section wall-clock times\n")
+                f.write(section_times)
+                f.write("\n\n# Top functions by cumulative time\n")
+                f.write(buffer.getvalue())
+            written.append(summary_file)
+
+        if memory is not None:
+            snapshot, (current, peak) = memory
+            self._memory = None
+            snap_file = self.output_dir / f"memory_{timestamp}.snap"
+            snapshot.dump(str(snap_file))
+            written.append(snap_file)
+
+            memory_file = self.output_dir / f"memory_{timestamp}.txt"
+            with open(memory_file, "w", encoding="utf-8") as f:
+                f.write(f"# Traced memory: current={current / 1024:.1f} KiB, peak={peak / 1024:.1f} KiB\n\n")
+                for stat in snapshot.statistics("lineno")[:top]:
+                    f.write(f"{stat}\n")
+            written.append(memory_file)
+
+        return written
+
+
+def profile_call(func, *args, **kwargs):
+    """Run func under a temporary cProfile.Profile.
+
+    Returns:
+        (result, elapsed_seconds, profile) tuple.
+    """
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profile.disable()
+    return result, time.perf_counter() - start, profile
@@ -0,0 +1,184 @@
+"""Frame-rate-limited rendering of streamed model output.
+
+Writing and flushing every streamed chunk costs one syscall and one
+terminal repaint per token, which is slow over SSH and in tmux.
+StreamRenderer collects chunks and writes them as one frame at most
+`fps` times per second, plus a final frame on close.
+
+With markdown enabled, MarkdownStyler adds ANSI styling as text
+arrives: headings are bold, fenced code blocks are coloured and
+**bold** and `inline code` spans are styled (their markers are
+dropped). Styling is decided once per character, so earlier output is
+never redrawn.
+
+When the stream is not a TTY, chunks are passed through unchanged and
+flushed as they arrive, so pipes still see the reply as it streams.
+"""
+
+import time
+
+BOLD = "\033[1m"
+CODE = "\033[36m"
+FENCE = "\033[2m"
+RESET = "\033[0m"
+
+DEFAULT_FPS = 30
+
+
+def is_tty(stream) -> bool:
+    """Return True if stream is an interactive terminal."""
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+class MarkdownStyler:
+    """Incrementally add ANSI styles to streamed markdown."""
+
+    def __init__(self):
+        self.line_start = True
+        self.in_fence = False
+        self.fence_line = False
+        self.heading = False
+        self.bold = False
+        self.code = False
+        self._pending = ""
+
+    def _style(self) -> str:
+        """ANSI codes for the current inline state."""
+        if self.in_fence:
+            return CODE
+        codes = ""
+        if self.heading or self.bold:
+            codes += BOLD
+        if self.code:
+            codes += CODE
+        return codes
+
+    def feed(self, text: str) -> str:
+        """Return styled output for text; undecidable characters are held back."""
+        out = []
+        text = self._pending + text
+        self._pending = ""
+        i = 0
+        while i < len(text):
+            char = text[i]
+
+            if self.line_start:
+                # Decide line-level style from the first few characters
+                rest = text[i:]
+                if rest.startswith("```"):
+                    self.in_fence = not self.in_fence
+                    self.fence_line = True
+                    out.append(RESET + FENCE)
+                    self.line_start = False
+                    continue
+                if ("```".startswith(rest) or rest.strip("#") == "") and "\n" not in rest:
+                    self._pending = rest
+                    break
+                if not self.in_fence:
+                    hashes = len(rest) - len(rest.lstrip("#"))
+                    if 0 < hashes <= 6 and rest[hashes:hashes + 1] == " ":
+                        self.heading = True
+                        out.append(BOLD)
+                self.line_start = False
+                if self.in_fence:
+                    out.append(CODE)
+
+            if char == "\n":
+                out.append(RESET + "\n")
+                self.line_start = True
+                self.fence_line = False
+                self.heading = False
+                self.bold = False
+                self.code = False
+                i += 1
+                continue
+
+            if self.in_fence or self.fence_line:
+                out.append(char)
+                i += 1
+                continue
+
+            if char == "`":
+                self.code = not self.code
+                out.append(RESET + self._style())
+                i += 1
+                continue
+
+            if char == "*" and not self.code:
+                if i + 1 == len(text):
+                    self._pending = "*"
+                    break
+                if text[i + 1] == "*":
+                    self.bold = not self.bold
+                    out.append(RESET + self._style())
+                    i += 2
+                    continue
+
+            out.append(char)
+            i += 1
+        return "".join(out)
+
+    def close(self) -> str:
+        """Return any held-back text and reset the terminal style."""
+        pending, self._pending = self._pending, ""
+        return pending + RESET
+
+
+class StreamRenderer:
+    """Coalesce streamed chunks into frames written at a limited rate."""
+
+    def __init__(self, stream, fps: int = DEFAULT_FPS, markdown: bool = False, flush: bool = True):
+        """Create a renderer for one reply.
+
+        Args:
+            stream: Text stream to write to (usually sys.stdout).
+            fps: Maximum frames per second on a TTY (0 writes every chunk).
+            markdown: Style markdown with ANSI codes (TTY only).
+            flush: Flush the stream after each frame. Pass False when the
+                stream itself decides when to draw (e.g. prompt_toolkit's
+                patch_stdout, which draws complete lines).
+        """
+        self.stream = stream
+        self.raw = not is_tty(stream)
+        self.interval = 1.0 / fps if fps and not self.raw else 0.0
+        self.styler = MarkdownStyler() if markdown and not self.raw else None
+        self.flush = flush
+        self.frames = 0
+        self._buffer = []
+        self._last_frame = 0.0
+
+    def write(self, chunk: str) -> None:
+        """Add a chunk; a frame is written if the frame interval has passed."""
+        if not chunk:
+            return
+        if self.raw:
+            self.stream.write(chunk)
+            if self.flush:
+                self.stream.flush()
+            return
+        self._buffer.append(self.styler.feed(chunk) if self.styler else chunk)
+        now = time.monotonic()
+        if now - self._last_frame >= self.interval:
+            self._frame(now)
+
+    def _frame(self, now: float) -> None:
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._last_frame = now
+        if text:
+            self.stream.write(text)
+            self.frames += 1
+        if self.flush:
+            self.stream.flush()
+
+    def close(self) -> None:
+        """Write whatever is still buffered."""
+        if self.styler is not None:
+            self._buffer.append(self.styler.close())
+        if self.raw:
+            self.stream.flush()
+            return
+        self._frame(time.monotonic())
@@ -5,12 +5,15 @@ This module contains helper functions for:
     - Rendering welcome and commands help text
     - Collecting user input with prompt_toolkit
     - Displaying previous chat history in a readable format
+
+prompt_toolkit is imported when the first prompt is shown, so modules
+that only print messages stay cheap to import.
 """
 
-from prompt_toolkit import prompt
-from prompt_toolkit.key_binding import KeyBindings
 from core import __version__
 
+_prompt = None
+
 COMMANDS_TEXT = f'''
 {"=" * 60}
 Commands:
@@ -23,11 +26,54 @@ General
 • /status - Show current meta data for chat
 • /clear - Clear conversation history
 • /swap - Change AI model 
+• /route on|off - Automatically send easy prompts to the small model
+• /route stats - Show per-route latency and escalation rate
+• /compare [model_a] [model_b] ... - Ask several models the same prompt and keep one answer
+• /regenerate [n] - Generate n new answers to the last prompt and keep one
 • /pref_streaming - Toggle text streaming on/off
+• /render fps [n] - Redraw streamed replies at most n times per second (0 = every chunk)
+• /render markdown on|off - Style headings, code blocks and bold text in replies
+
+Sessions
+• /session [list] - List open sessions
+• /session new [name] - Open a new session with the current persona, subject and model
+• /session switch [name] - Switch sessions; others keep generating in the background
+• /session close [name] - Close a session (its transcript stays in data/sessions)
+• /resume - Restore the sessions from the previous run (or start with --resume)
+• /cancel [all] - Stop the reply being generated and drop queued prompts (or press Ctrl+C)
+
+Diagnostics
+• /profile on [mem] - Profile turns and commands (optionally with memory snapshots)
+• /profile off - Stop profiling
+• /profile dump - Write profile files to data/profiling
+• /cache on|off - Reuse answers for exact repeats of a prompt
+• /cache stats - Show cache hit rate and size
+• /cache bypass - Toggle caching for the current subject
+• /cache clear - Delete all cached answers
+• /cache semantic on [threshold]|off - Also reuse answers for paraphrased prompts
+• /fresh - Re-ask the last prompt and replace its cached answer
+• /summarize on [model]|off - Summarize old chat logs and turns in the background
+• /summarize model [name] - Model used for summaries
+• /jobs - Show background jobs (model warm-up, chat titles, summaries)
+• /jobs pause|resume - Hold or release background jobs
+• /gen [reload] - Show the generation options of the last request (or re-read data/model_profiles.json)
+• /stats [subject|persona|model|day ...] [days N] - Messages, tokens, TTFT and tokens/s per group
+
+Branches
+• /turns - List the prompts on the current branch
+• /fork [k] [name] - Start a new branch after turn k
+• /edit [k] - Rewrite prompt k and continue on a new branch
+• /branch - List branches
+• /branch [name] - Switch to a branch
+• /branch_delete [name] - Delete a branch
+• /save - Save the current branch as a chat file
+• /h_search [text] - Search the whole conversation, including turns moved to disk
+• /window [n|off] - Set how many recent messages stay in memory (default 200)
 
 Create new
 • /s_new [subject_name]- Create a new subject by entering the command followed by the subject name
 • /p_new [persona_name] - Create a new persona by entering the command followed by the persona name
+• /attach [path] - Add a text/markdown file (or folder) to the current subject's documents; without a path, list them
 
 View / Update
 • /help - List all commands
@@ -108,7 +154,28 @@ def print_warning(message: str):
     print(f"⚠ {message}")
 
 
-def get_user_input(prompt_text: str = "\nUser:\n") -> str:
+def load_prompt_toolkit():
+    """Import prompt_toolkit on first use and return its prompt function."""
+    global _prompt
+    if _prompt is None:
+        from prompt_toolkit import prompt
+
+        _prompt = prompt
+    return _prompt
+
+
+def patch_output():
+    """Return a context manager that prints other threads' output above the prompt.
+
+    Output is passed through raw so the renderer's ANSI styling survives;
+    the default proxy would escape it to '?'.
+    """
+    from prompt_toolkit.patch_stdout import patch_stdout
+
+    return patch_stdout(raw=True)
+
+
+def get_user_input(prompt_text: str = "\nUser:\n", interrupt: bool = False) -> str:
     """Get multi‑line user input with basic arrow-key navigation.
 
     Shows a small hint about how to submit, then uses prompt_toolkit
@@ -116,16 +183,22 @@ def get_user_input(prompt_text: str = "\nUser:\n") -> str:
 
     Args:
         prompt_text: Prompt label shown above the input area.
+        interrupt: Re-raise KeyboardInterrupt on Ctrl+C instead of
+            returning an empty string (the REPL uses it to stop a reply).
 
     Returns:
-        The trimmed user input. Returns an empty string on Ctrl+C,
-        or the literal string "exit" on EOF (Ctrl+D).
+        The trimmed user input. Returns an empty string on Ctrl+C
+        (unless interrupt is set), or the literal string "exit" on EOF
+        (Ctrl+D).
     """
+    prompt = load_prompt_toolkit()
     print("(Press Alt+Enter to submit)")
     try:
         user_input = prompt(prompt_text, multiline=True)
         return user_input.strip()
     except KeyboardInterrupt:
+        if interrupt:
+            raise
         return ""
     except EOFError:
         return "exit"
@@ -148,11 +221,14 @@ def display_chat_history(history):
     """Display formatted chat history in the terminal.
 
     Args:
-        history: Iterable of message dicts with 'role' and 'content' keys.
+        history: Iterable of message dicts with 'role' and 'content' keys,
+            or MessageNodes.
     """
     print_section_header("Previous Chat:")
     for msg in history:
-        role = msg["role"].capitalize()
-        content = msg["content"]
-        print(f"\n{role}: {content}")
+        if isinstance(msg, dict):
+            role, content = msg["role"], msg["content"]
+        else:
+            role, content = msg.role, msg.content
+        print(f"\n{role.capitalize()}: {content}")
     print("\n" + "=" * 60)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app imports its packages (core, utils, commands) from backend/src
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from core.autosave import AutosaveWriter, BranchFile
+from core.chat import ChatSession
+from core.logger import ChatLogger
+
+
+@pytest.fixture
+def writer():
+    writer = AutosaveWriter()
+    yield writer
+    writer.close()
+
+
+def test_append_merges_with_queued_writes(tmp_path, writer):
+    path = tmp_path / "chat.md"
+    with writer._condition:
+        # Hold the thread off so every call below is merged before writing
+        writer.write(path, "hello world")
+        writer.append(path, 6, "there")
+        writer.append(path, 11, "!")
+    writer.flush()
+    assert path.read_text(encoding="utf-8") == "hello there!"
+
+    writer.append(path, 5, ", again")
+    writer.flush()
+    assert path.read_text(encoding="utf-8") == "hello, again"
+
+
+@pytest.mark.parametrize("window", [None, 8, 40])
+def test_branch_file_mirrors_the_active_branch(tmp_path, writer, window):
+    logger = ChatLogger(tmp_path)
+    path = tmp_path / "autosave.md"
+    branch_file = BranchFile(writer, path, lambda message, first: ("" if first else "\n") + logger.format_message(message))
+    rng = random.Random(window or 0)
+    chat = ChatSession()
+    if window:
+        chat.enable_spill(tmp_path / "spill.seg", window)
+
+    for step in range(300):
+        op = rng.random()
+        if op < 0.5:
+            chat.add_message("user", f"question ü {step} " + "x" * rng.randint(0, 50))
+            chat.add_message("assistant", f"answer ✓ {step}")
+        elif op < 0.65:
+            node = chat.history.last()
+            if node is not None and node.role == "assistant":
+                chat._store_partial(node.parent, ["partial " * rng.randint(1, 5)])
+        elif op < 0.72:
+            chat.history.pop()
+        elif op < 0.76:
+            offset = chat.history.spilled_turns()
+            chat.history.fork(offset + rng.randint(0, len(chat.history.user_turns())))
+        elif op < 0.78:
+            chat.history.switch("main")
+        branch_file.update(chat)
+
+        if step % 7 == 0:
+            writer.flush()
+            expected = logger.format_conversation(chat.iter_full_history())
+            assert path.read_text(encoding="utf-8") == expected
+            assert branch_file.size == len(expected.encode("utf-8"))
+            assert branch_file.count == chat.spilled_count() + len(chat.history.nodes())
@@ -0,0 +1,99 @@
+import json
+import threading
+
+import core.background_jobs
+from core.background_jobs import chat_catalog_job, warm_model_job
+from core.catalog import ChatCatalog
+from core.chat import ChatSession
+from core.profiles import GenerationProfiles
+
+
+class TitleClient:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, model, messages, options=None):
+        self.calls += 1
+        return {"message": {"content": f"Title {self.calls}"}}
+
+
+class Chats:
+    profiles = None
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def list_all_chats(self):
+        return [("lore", path.name, path) for path in self.paths]
+
+
+def _run(retriever, catalog, **kwargs):
+    return list(chat_catalog_job({}, retriever, catalog, "llama3", **kwargs))
+
+
+def test_catalog_titles_only_when_asked_and_at_most_max_titles(tmp_path, monkeypatch):
+    client = TitleClient()
+    monkeypatch.setattr(core.background_jobs, "get_client", lambda: client)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"chat_{i}.txt"
+        path.write_text(f"User: question {i}\nAssistant: answer {i}\n", encoding="utf-8")
+        paths.append(path)
+    retriever = Chats(paths)
+    catalog = ChatCatalog(tmp_path / "catalog.json")
+
+    _run(retriever, catalog)
+    assert client.calls == 0
+    assert len(catalog.entries) == 3
+
+    _run(retriever, catalog, max_titles=2)
+    assert client.calls == 2
+    _run(retriever, catalog, max_titles=2)
+    assert client.calls == 3
+    assert sorted(entry["title"] for entry in catalog.entries.values()) == ["Title 1", "Title 2", "Title 3"]
+
+
+def test_catalog_progress_survives_a_stopped_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.background_jobs, "CATALOG_STEP_FILES", 1)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"chat_{i}.txt"
+        path.write_text(f"User: question {i}\nAssistant: answer {i}\n", encoding="utf-8")
+        paths.append(path)
+
+    steps = chat_catalog_job({}, Chats(paths), ChatCatalog(tmp_path / "catalog.json"), "llama3")
+    assert next(steps) == "indexed 1/3"
+    steps.close()
+
+    assert len(ChatCatalog(tmp_path / "catalog.json").entries) == 1
+
+
+class WarmClient:
+    def __init__(self):
+        self.options = []
+
+    def generate(self, model, prompt, options=None):
+        self.options.append(options)
+
+
+def test_warm_up_waits_for_defaults_and_is_not_shown_as_a_request(tmp_path, monkeypatch):
+    client = WarmClient()
+    monkeypatch.setattr(core.background_jobs, "get_client", lambda: client)
+    path = tmp_path / "model_profiles.json"
+    path.write_text(json.dumps({"personas": {"writer": {"temperature": 0.9}}}), encoding="utf-8")
+    chat = ChatSession("llama3")
+    chat.profiles = GenerationProfiles(path)
+
+    def load_defaults():
+        chat.set_system_prompt("word " * 3000)
+        chat.set_subject_info("writer", "lore")
+
+    defaults = threading.Thread(target=load_defaults)
+    defaults.start()
+    assert list(warm_model_job({}, chat, defaults)) == ["loaded llama3"]
+
+    # Sized for the default prompt and persona, not an empty session
+    [options] = client.options
+    assert options["temperature"] == 0.9
+    assert options["num_ctx"] > 2048
+    assert chat.last_options is None
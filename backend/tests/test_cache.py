@@ -0,0 +1,37 @@
+import os
+import time
+
+from core.cache import ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Name a dwarf."}]
+
+
+def test_key_ignores_runtime_options():
+    small = ResponseCache.make_key("llama3", {"num_ctx": 2048, "temperature": 0.2}, "sys", MESSAGES)
+    large = ResponseCache.make_key("llama3", {"num_ctx": 8192, "num_thread": 4, "temperature": 0.2}, "sys", MESSAGES)
+    assert small == large
+    assert small != ResponseCache.make_key("llama3", {"num_ctx": 2048, "temperature": 0.7}, "sys", MESSAGES)
+
+
+
+def _key(i):
+    return ResponseCache.make_key("llama3", None, "", [{"role": "user", "content": str(i)}])
+
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=1500)
+    now = time.time()
+    for i in range(8):
+        cache.put(_key(i), "x" * 100)
+        os.utime(cache._entry_path(_key(i)), (now - 100 + i, now - 100 + i))
+    assert cache.get(_key(0)) is not None  # used again: now the most recent
+
+    for i in range(8, 14):
+        cache.put(_key(i), "x" * 100)
+
+    on_disk = sum(size for _, size, _ in cache._entries())
+    assert cache._bytes == on_disk <= 1500
+    assert cache._count == len(list(cache._entries()))
+    assert cache._entry_path(_key(0)).exists()
+    assert not cache._entry_path(_key(1)).exists()
+    assert cache._entry_path(_key(13)).exists()
@@ -0,0 +1,64 @@
+import pytest
+
+import core.chat
+from core.cache import ResponseCache
+from core.chat import ChatSession
+
+
+class FakeClient:
+    """Answers with a counter; embeds every prompt to the same vector."""
+
+    def __init__(self):
+        self.answers = 0
+
+    def chat(self, model, messages, stream=False, options=None):
+        self.answers += 1
+        return {"message": {"content": f"answer {self.answers}"}}
+
+    def embed(self, model, input):
+        return {"embeddings": [[1.0, 0.0, 0.0]]}
+
+
+def _ask_fresh(chat, prompt):
+    """Send prompt again with the cache bypassed once, as /fresh does."""
+    chat.pop_last_exchange()
+    chat.skip_cache_once = True
+    return chat.send_message(prompt)
+
+
+def test_fresh_answer_replaces_cached_entry(tmp_path, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    chat = ChatSession("llama3")
+    chat.response_cache = ResponseCache(tmp_path / "responses")
+
+    assert chat.send_message("Who forged the rings?") == "answer 1"
+    chat.pop_last_exchange()
+    assert chat.send_message("Who forged the rings?") == "answer 1"
+    assert chat.last_cache_hit["tier"] == "exact"
+
+    assert _ask_fresh(chat, "Who forged the rings?") == "answer 2"
+
+    chat.pop_last_exchange()
+    assert chat.send_message("Who forged the rings?") == "answer 2"
+    assert chat.last_cache_hit["tier"] == "exact"
+
+
+def test_fresh_answer_replaces_semantic_entry(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    import core.semantic_cache
+    from core.semantic_cache import SemanticCache
+
+    client = FakeClient()
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    monkeypatch.setattr(core.semantic_cache, "get_client", lambda: client)
+    chat = ChatSession("llama3")
+    chat.semantic_cache = SemanticCache(tmp_path / "semantic")
+
+    assert chat.send_message("Who forged the rings?") == "answer 1"
+    assert _ask_fresh(chat, "Who forged the rings?") == "answer 2"
+
+    chat.pop_last_exchange()
+    assert chat.send_message("Who made the rings?") == "answer 2"
+    assert chat.last_cache_hit["tier"] == "semantic"
+    assert len(chat.semantic_cache._entries) == 1
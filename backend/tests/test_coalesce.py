@@ -0,0 +1,66 @@
+import queue
+
+import pytest
+
+from core.coalesce import SingleFlight, request_key
+
+
+class Upstream:
+    """An upstream stream the test feeds one chunk at a time."""
+
+    def __init__(self, error=None):
+        self.chunks = queue.Queue()
+        self.error = error
+        self.started = 0
+
+    def start(self):
+        self.started += 1
+        return self._stream()
+
+    def _stream(self):
+        while (chunk := self.chunks.get()) is not None:
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def feed(self, *chunks):
+        for chunk in chunks:
+            self.chunks.put(chunk)
+
+
+def test_identical_requests_share_one_upstream_stream():
+    flights = SingleFlight()
+    upstream = Upstream()
+    key = request_key("llama3", [{"role": "user", "content": "hi"}])
+
+    first = flights.stream(key, upstream.start)
+    upstream.feed("a")
+    assert next(first) == "a"
+
+    joins = []
+    second = flights.stream(key, upstream.start, on_join=lambda: joins.append(True))
+    upstream.feed("b", "c", None)
+    assert list(second) == ["a", "b", "c"]
+    assert list(first) == ["b", "c"]
+
+    assert upstream.started == 1
+    assert joins == [True]
+    assert (flights.started, flights.joined, flights.in_flight) == (1, 1, 0)
+
+    # A finished flight is not reused
+    upstream.feed("d", None)
+    assert list(flights.stream(key, upstream.start)) == ["d"]
+    assert upstream.started == 2
+
+
+def test_upstream_error_reaches_the_reader_after_its_chunks():
+    flights = SingleFlight()
+    upstream = Upstream(ConnectionError("lost"))
+    upstream.feed("a", None)
+
+    chunks = []
+    with pytest.raises(ConnectionError):
+        for chunk in flights.stream("key", upstream.start):
+            chunks.append(chunk)
+    assert chunks == ["a"]
+    assert flights.in_flight == 0
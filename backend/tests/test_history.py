@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from core.chat import ChatSession
+from core.history import ConversationTree
+from core.spill import remove_stale_segments
+
+
+def _conversation(tmp_path, turns=10, window=8):
+    chat = ChatSession("llama3")
+    chat.enable_spill(tmp_path / "spill" / f"session_{os.getpid()}.seg", window)
+    for i in range(1, turns + 1):
+        chat.add_message("user", f"question {i}")
+        chat.add_message("assistant", f"answer {i}")
+    return chat
+
+
+def test_turns_are_numbered_from_the_start_after_a_spill(tmp_path):
+    chat = _conversation(tmp_path)
+    history = chat.history
+    offset = history.spilled_turns()
+    turns = history.user_turns()
+
+    assert offset > 0
+    assert offset + len(turns) == 10
+    assert turns[0].content == f"question {offset + 1}"
+    assert chat.search_history("question 10")[0][0] == 19
+
+    branch, original = history.edit(10)
+    assert original == "question 10"
+    assert history.head.content == "answer 9"
+    history.switch("main")
+
+    with pytest.raises(ValueError):
+        history.edit(offset)
+    with pytest.raises(ValueError):
+        history.fork(offset - 1)
+
+    history.fork(offset + 1)
+    assert history.head.content == f"answer {offset + 1}"
+    assert history.spilled_turns() == offset
+
+
+def test_log_text_includes_spilled_messages(tmp_path):
+    chat = _conversation(tmp_path)
+    text = chat.get_history_for_logging()
+    assert text.startswith("User:\nquestion 1\n")
+    assert text.count("User:\n") == 10
+    assert "Assistant:\nanswer 10\n" in text
+
+
+def test_stale_segments_of_dead_processes_are_removed(tmp_path):
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    mine = spill / f"session_{os.getpid()}_work.seg"
+    parent = spill / f"session_{os.getppid()}.seg"
+    dead = spill / "session_999999999_old.seg"
+    for path in (mine, parent, dead):
+        path.write_bytes(b"x")
+
+    assert remove_stale_segments(spill) == 1
+    assert mine.exists() and parent.exists() and not dead.exists()
+
+
+def test_branches_share_their_prefix():
+    history = ConversationTree()
+    for i in range(1, 4):
+        history.append("user", f"q{i}")
+        history.append("assistant", f"a{i}")
+    main_nodes = list(history.nodes())
+
+    history.fork(2, "alt")
+    history.append("user", "q3 alt")
+    assert [node.content for node in history.nodes()] == ["q1", "a1", "q2", "a2", "q3 alt"]
+    assert history.nodes()[3] is main_nodes[3]
+    assert history.token_count() == sum(node.tokens for node in history.nodes())
+
+    branch, original = history.edit(1)
+    assert original == "q1" and history.head is None and len(history) == 0
+
+    history.switch("main")
+    assert history.nodes() == main_nodes
+    assert history.list_branches() == [("main", 6, True), ("alt", 5, False), (branch, 0, False)]
+    with pytest.raises(ValueError):
+        history.delete_branch("main")
+    with pytest.raises(ValueError):
+        history.fork(4)
+
+
+def test_spill_keeps_counts_and_full_history(tmp_path):
+    chat = _conversation(tmp_path, turns=30, window=12)
+    reference = ConversationTree()
+    for i in range(1, 31):
+        reference.append("user", f"question {i}")
+        reference.append("assistant", f"answer {i}")
+
+    assert len(chat.history.nodes()) <= 12
+    assert chat.history.nodes()[0].role == "user"
+    assert len(chat.history) == 60
+    assert chat.spilled_count() + len(chat.history.nodes()) == 60
+    assert chat.history.token_count() == reference.token_count()
+    assert [m["content"] for m in chat.iter_full_history()] == [n.content for n in reference.nodes()]
@@ -0,0 +1,114 @@
+import os
+from types import SimpleNamespace
+
+import core.chat
+import core.compare
+from core.chat import ChatSession
+from core.knowledge import KnowledgeStore
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_replaced_document_chunks_are_not_searched(tmp_path):
+    doc = tmp_path / "dragons.md"
+    store_path = tmp_path / "knowledge"
+    store = KnowledgeStore(store_path)
+
+    _write(doc, "Smaug the dragon sleeps under the mountain.\n", 1_000_000_000)
+    assert store.ingest(doc)["status"] == "added"
+
+    _write(doc, "Glaurung the dragon crawls out of Angband.\n", 2_000_000_000)
+    assert store.ingest(doc)["status"] == "replaced"
+
+    for current in (store, KnowledgeStore(store_path)):
+        texts = [result["text"] for result in current.search("dragon")]
+        assert texts == ["Glaurung the dragon crawls out of Angband."]
+        assert current.search("smaug") == []
+
+
+def test_restoring_old_content_ingests_it_again(tmp_path):
+    doc = tmp_path / "notes.txt"
+    store = KnowledgeStore(tmp_path / "knowledge")
+
+    _write(doc, "First version about wizards.\n", 1_000_000_000)
+    store.ingest(doc)
+    _write(doc, "Second version about hobbits.\n", 2_000_000_000)
+    store.ingest(doc)
+    _write(doc, "First version about wizards.\n", 3_000_000_000)
+    result = store.ingest(doc)
+
+    assert result["chunks"] == 1
+    assert [r["text"] for r in store.search("wizards")] == ["First version about wizards."]
+    assert store.search("hobbits") == []
+
+
+def test_shared_passage_survives_replacing_one_document(tmp_path):
+    first, second = tmp_path / "a.md", tmp_path / "b.md"
+    store_path = tmp_path / "knowledge"
+    store = KnowledgeStore(store_path)
+
+    _write(first, "Ents guard the forest of Fangorn.\n", 1_000_000_000)
+    _write(second, "Ents guard the forest of Fangorn.\n", 1_000_000_000)
+    store.ingest(first)
+    assert store.ingest(second)["status"] == "duplicate"
+
+    _write(first, "Orcs march from Isengard.\n", 2_000_000_000)
+    store.ingest(first)
+
+    for current in (store, KnowledgeStore(store_path)):
+        results = current.search("fangorn")
+        assert [r["text"] for r in results] == ["Ents guard the forest of Fangorn."]
+        assert results[0]["source"] == second.resolve().as_posix()
+
+
+def test_dead_chunks_are_compacted(tmp_path):
+    doc = tmp_path / "log.md"
+    other = tmp_path / "keep.md"
+    store_path = tmp_path / "knowledge"
+    store = KnowledgeStore(store_path)
+
+    _write(other, "The shire is green and quiet.\n", 1_000_000_000)
+    store.ingest(other)
+    for version in range(1, 6):
+        _write(doc, f"Entry number {version} about rangers.\n", version * 1_000_000_000)
+        store.ingest(doc)
+
+    chunks = store.index["chunks"]
+    assert len(chunks) <= 4
+    assert all(p[0] < len(chunks) for postings in store.index["postings"].values() for p in postings)
+    assert "entry" in store.index["postings"]
+    with open(store.chunks_path, "rb") as f:
+        assert len(f.readlines()) == len(chunks)
+
+    for current in (store, KnowledgeStore(store_path)):
+        assert [r["text"] for r in current.search("rangers")] == ["Entry number 5 about rangers."]
+        assert [r["text"] for r in current.search("shire")] == ["The shire is green and quiet."]
+
+
+class RecordingClient:
+    def __init__(self):
+        self.system = []
+
+    def chat(self, model, messages, stream=False, options=None):
+        self.system.append(messages[0]["content"])
+        return iter([{"message": {"content": "An answer."}}])
+
+
+def test_compare_sends_the_same_reference_as_a_normal_turn(tmp_path, monkeypatch):
+    client = RecordingClient()
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    monkeypatch.setattr(core.compare, "get_client", lambda: client)
+    knowledge = SimpleNamespace(reference_for=lambda subject, query: f"{subject} notes on {query}")
+    chat = ChatSession("llama3")
+    chat.set_system_prompt("Lore keeper.")
+    chat.set_subject_info("default", "lore")
+    chat.knowledge = knowledge
+
+    chat.compare("Who is Smaug?", ["llama3"])
+    "".join(chat.send_message_stream("Who is Smaug?"))
+
+    assert client.system[0] == client.system[1]
+    assert "lore notes on Who is Smaug?" in client.system[0]
@@ -0,0 +1,56 @@
+import threading
+
+import core.chat
+from core.chat import ChatSession
+from core.prompt_queue import PromptQueue
+
+
+class EndlessClient:
+    """Streams words until the stream is closed."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.closed = threading.Event()
+
+    def chat(self, model, messages, stream=False, options=None):
+        return self._stream()
+
+    def _stream(self):
+        try:
+            while True:
+                self.started.set()
+                yield {"message": {"content": "word "}}
+        finally:
+            self.closed.set()
+
+
+def test_cancel_stops_the_stream_and_drops_queued_prompts(monkeypatch):
+    client = EndlessClient()
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    chat = ChatSession("llama3")
+    answered = []
+
+    def run(prompt):
+        answered.append(prompt)
+        for _ in chat.send_message_stream(prompt):
+            pass
+
+    prompts = PromptQueue(run)
+    chat.cancel_event = prompts.cancelled
+    prompts.submit("first")
+    prompts.submit("second")
+    prompts.submit("third")
+    assert client.started.wait(5)
+
+    assert prompts.cancel() == 2
+    assert prompts.wait_idle(5)
+    assert client.closed.is_set()
+    assert answered == ["first"]
+    assert not prompts.cancelled.is_set()
+
+    # The partial reply is kept, and an idle queue has nothing to cancel
+    nodes = chat.history.nodes()
+    assert [node.role for node in nodes] == ["user", "assistant"]
+    assert nodes[1].content.startswith("word ")
+    assert prompts.cancel() == 0
+    prompts.close()
@@ -0,0 +1,44 @@
+import sys
+import types
+
+from commands.command_handler import CommandHandler
+from commands.registry import BUILTIN_COMMANDS, CommandRegistry, parse_command
+
+
+class Retriever:
+    def __init__(self, basepath):
+        self.basepath = basepath
+
+
+def test_parse_command():
+    assert parse_command("hello") is None
+    assert parse_command("/") == ("", "")
+    assert parse_command("/fork 3  alt ") == ("fork", "3  alt")
+    assert parse_command("/HELP") == ("HELP", "")
+
+
+def test_builtin_handlers_import():
+    registry = CommandRegistry()
+    for name, *_ in BUILTIN_COMMANDS:
+        command, _ = registry.resolve(name, "")
+        assert callable(command.handler()), name
+
+
+def test_dispatch_passes_params_and_translates_results(tmp_path, monkeypatch):
+    calls = []
+    module = types.ModuleType("fake_commands")
+    module.echo = lambda chat, args: calls.append((chat, args)) or f"prompt: {args}"
+    module.stop = lambda: True
+    monkeypatch.setitem(sys.modules, "fake_commands", module)
+
+    chat = object()
+    handler = CommandHandler(Retriever(tmp_path), chat, logger=None)
+    handler.registry.register("echo", "fake_commands:echo", ("chat", "args"), "prompt")
+    handler.registry.register("stop", "fake_commands:stop", (), "exit")
+    handler.registry.register("pre_", "fake_commands:echo", ("chat", "args"), "prompt", prefix=True)
+
+    assert handler.handle_command("/Echo hi there") == (False, "prompt: hi there")
+    assert handler.handle_command("/pre_abc more") == (False, "prompt: abc more")
+    assert handler.handle_command("/stop") == (True, None)
+    assert handler.handle_command("just a prompt") == (False, "just a prompt")
+    assert calls == [(chat, "hi there"), (chat, "abc more")]
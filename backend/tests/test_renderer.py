@@ -0,0 +1,30 @@
+import io
+import sys
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from utils.renderer import MarkdownStyler, StreamRenderer
+from utils.ui import patch_output
+
+
+def test_styled_output_survives_patched_stdout():
+    buffer = io.StringIO()
+    output = Vt100_Output(buffer, lambda: Size(rows=24, columns=80), term="xterm")
+    styled = MarkdownStyler().feed("**bold** and `code`\n")
+    with create_app_session(output=output):
+        with patch_output():
+            sys.stdout.write(styled)
+    text = buffer.getvalue()
+    assert "\x1b[1m" in text
+    assert "?[1m" not in text
+
+
+def test_renderer_passes_chunks_through_when_not_a_tty():
+    stream = io.StringIO()
+    renderer = StreamRenderer(stream, markdown=True)
+    renderer.write("**bold**")
+    renderer.write(" text\n")
+    renderer.close()
+    assert stream.getvalue() == "**bold** text\n"
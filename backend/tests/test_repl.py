@@ -0,0 +1,101 @@
+import contextlib
+import threading
+from types import SimpleNamespace
+
+import core.chat
+import main
+import utils.ui
+from core.chat import ChatSession
+
+
+class EndlessClient:
+    """Streams words until the stream is closed."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.closed = threading.Event()
+        self.prompts = []
+
+    def chat(self, model, messages, stream=False, options=None):
+        self.prompts.append(messages[-1]["content"])
+        return self._stream()
+
+    def _stream(self):
+        try:
+            while True:
+                self.started.set()
+                yield {"message": {"content": "word "}}
+        finally:
+            self.closed.set()
+
+
+class Retriever:
+    def __init__(self, basepath):
+        self.basepath = basepath
+
+    def parse_subject_command(self, user_input):
+        return None, None, user_input, False
+
+    def prompt_outdated(self, system_prompt):
+        return False
+
+
+class Handler:
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self.logger = SimpleNamespace(format_message=lambda message: message["content"])
+        self.text_streaming = True
+        self.render_fps = 0
+        self.render_markdown = False
+        self.sessions = None
+        self.commands = []
+
+    def handle_command(self, user_input):
+        if not user_input.startswith("/"):
+            return False, user_input
+        self.commands.append(user_input)
+        return user_input == "/exit", None
+
+
+class Profiler:
+    enabled = False
+
+    def section(self, name):
+        return contextlib.nullcontext()
+
+
+def test_ctrl_c_at_the_prompt_stops_the_reply_and_drops_queued_prompts(tmp_path, monkeypatch):
+    client = EndlessClient()
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    monkeypatch.setattr(main, "SNAPSHOT_PATH", None)
+    monkeypatch.setattr(utils.ui, "patch_output", contextlib.nullcontext)
+    handler = Handler(Retriever(tmp_path))
+
+    def inputs():
+        yield "Tell me a long story"
+        assert client.started.wait(5)
+        yield "And another one"
+        raise KeyboardInterrupt
+
+    steps = inputs()
+
+    stopped = []
+
+    def prompt(prompt_text, multiline=False):
+        try:
+            return next(steps)
+        except StopIteration:
+            queue = handler.sessions.active.queue
+            stopped.append(queue.wait_idle(5))
+            queue.cancel()  # so a failing run still exits
+            return "/exit"
+
+    # Ctrl+C is raised by prompt_toolkit inside the real get_user_input
+    monkeypatch.setattr(utils.ui, "load_prompt_toolkit", lambda: prompt)
+    scheduler = SimpleNamespace(pause=lambda: None, resume=lambda: None)
+    main.run_loop(handler, scheduler, ChatSession("llama3"), Profiler())
+
+    assert stopped == [True]
+    assert client.closed.is_set()
+    assert client.prompts == ["Tell me a long story"]
+    assert handler.commands == ["/exit"]
@@ -0,0 +1,12 @@
+from core.router import ModelRouter
+
+
+def test_short_answers_stay_on_the_small_model():
+    router = ModelRouter()
+
+    assert router.classify("What is 2 + 2?") == ("small", "simple")
+    for answer in ("4", "Paris.", "Yes, it does."):
+        assert router.is_confident(answer)
+
+    assert not router.is_confident("  ")
+    assert not router.is_confident("I'm not sure, but it may be Paris.")
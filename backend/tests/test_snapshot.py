@@ -0,0 +1,18 @@
+from core.retriever import SubjectRetriever
+
+
+def test_prompt_sources_ignore_non_prompt_files_in_the_subject_folder(tmp_path):
+    (tmp_path / "personas").mkdir()
+    (tmp_path / "personas" / "default.md").write_text("Be helpful.", encoding="utf-8")
+    subject = tmp_path / "subjects" / "lore"
+    subject.mkdir(parents=True)
+    (subject / "instructions.md").write_text("Middle-earth lore.", encoding="utf-8")
+    retriever = SubjectRetriever(basepath=str(tmp_path))
+    sources = retriever.prompt_sources(subject_name="lore")
+
+    (subject / "usage.jsonl").write_text("{}\n", encoding="utf-8")
+    (subject / "knowledge").mkdir()
+    assert retriever.prompt_sources(subject_name="lore") == sources
+
+    (subject / "chat_2026-01-01.md").write_text("User: hi\n", encoding="utf-8")
+    assert retriever.prompt_sources(subject_name="lore") != sources
@@ -0,0 +1,74 @@
+import core.summarizer
+from core.summarizer import Summarizer, content_key
+
+
+class FailingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, model, messages, options=None):
+        self.calls += 1
+        raise ConnectionError("model not available")
+
+
+def test_failed_summary_is_not_requeued_until_retry(tmp_path, monkeypatch):
+    client = FailingClient()
+    monkeypatch.setattr(core.summarizer, "get_client", lambda: client)
+    summarizer = Summarizer(tmp_path / "summaries")
+    text = "user: hello\nassistant: hi"
+
+    assert summarizer.get_or_request(text) is None
+    summarizer._queue.join()
+    for _ in range(5):
+        assert summarizer.get_or_request(text) is None
+    summarizer._queue.join()
+
+    assert client.calls == 1
+    assert summarizer.failed == 1
+    assert summarizer.backing_off_count() == 1
+
+    # Once the retry time has passed, the text is queued again
+    count, _ = summarizer._failures[content_key(text)]
+    summarizer._failures[content_key(text)] = (count, 0.0)
+    summarizer.get_or_request(text)
+    summarizer._queue.join()
+    assert client.calls == 2
+    assert summarizer._failures[content_key(text)][0] == 2
+
+
+class StubRetriever:
+    def __init__(self, basepath):
+        self.basepath = basepath
+        self.summarizer = None
+
+    def build_system_prompt(self, persona, subject):
+        state = "summaries" if self.summarizer is not None else "full logs"
+        return f"{persona}/{subject} with {state}"
+
+
+class StubScheduler:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, name, func, *args):
+        self.submitted.append(name)
+        return True
+
+
+def test_summarize_on_queues_subject_summaries_and_rebuilds_the_prompt(tmp_path):
+    from commands.perf_commands import handle_summarize
+    from core.chat import ChatSession
+
+    retriever = StubRetriever(tmp_path)
+    scheduler = StubScheduler()
+    chat = ChatSession()
+    chat.set_subject_info("writer", "fantasy_story")
+    chat.set_system_prompt(retriever.build_system_prompt("writer", "fantasy_story"))
+
+    handle_summarize(retriever, chat, "on", scheduler=scheduler)
+    assert retriever.summarizer is chat.summarizer is not None
+    assert scheduler.submitted == ["subject_summaries"]
+    assert chat.system_prompt == "writer/fantasy_story with summaries"
+
+    handle_summarize(retriever, chat, "off", scheduler=scheduler)
+    assert chat.system_prompt == "writer/fantasy_story with full logs"
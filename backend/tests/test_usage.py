@@ -0,0 +1,126 @@
+import json
+import threading
+
+import core.chat
+import core.compare
+from core.chat import ChatSession
+from core.coalesce import SingleFlight
+from core.router import ModelRouter
+from core.usage import UsageLog, UsageRollup
+
+
+class FakeClient:
+    """Streams a canned reply per model; the small model hedges."""
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.release = release
+
+    def chat(self, model, messages, stream=False, options=None):
+        self.calls.append(model)
+        text = "I'm not sure." if model == "small" else "Mithril is a precious silver metal from Moria."
+        if not stream:
+            return {"message": {"content": text}}
+        return self._stream(text)
+
+    def _stream(self, text):
+        if self.release is not None:
+            self.release.wait()
+        for word in text.split(" "):
+            yield {"message": {"content": word + " "}}
+
+
+def _session(tmp_path, client, monkeypatch):
+    (tmp_path / "subjects" / "lore").mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(core.chat, "get_client", lambda: client)
+    chat = ChatSession("small")
+    chat.current_subject = "lore"
+    chat.usage = UsageLog(tmp_path / "subjects")
+    return chat
+
+
+def _messages(tmp_path):
+    rows = UsageRollup(tmp_path / "subjects", tmp_path / "rollup.json").report(by=("model",))
+    return {row["model"]: row["messages"] for row in rows}
+
+
+def test_escalated_turn_counts_as_one_message(tmp_path, monkeypatch):
+    client = FakeClient()
+    chat = _session(tmp_path, client, monkeypatch)
+    chat.router = ModelRouter(small_model="small", large_model="large")
+
+    "".join(chat.send_message_stream("What is mithril?"))
+    chat.send_message("What is mithril made of?")
+
+    assert client.calls == ["small", "large", "small", "large"]
+    assert _messages(tmp_path) == {"small": 0, "large": 2}
+
+
+def test_joined_stream_records_usage_once(tmp_path, monkeypatch):
+    release = threading.Event()
+    client = FakeClient(release)
+    flights = SingleFlight()
+    sessions = [_session(tmp_path, client, monkeypatch) for _ in range(2)]
+    for chat in sessions:
+        chat.model = "large"
+        chat.flights = flights
+
+    replies = [None, None]
+
+    def ask(i):
+        replies[i] = "".join(sessions[i].send_message_stream("What is mithril?"))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    while flights.started + flights.joined < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert replies[0] == replies[1]
+    assert (flights.started, flights.joined) == (1, 1)
+    assert _messages(tmp_path) == {"large": 1}
+
+
+def test_compare_and_regenerate_record_every_generation(tmp_path, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(core.compare, "get_client", lambda: client)
+    chat = _session(tmp_path, client, monkeypatch)
+    chat.model = "large"
+
+    chat.compare("What is mithril?", ["small", "large"])
+    chat.keep_exchange("What is mithril?", "A silver metal.")
+    chat.regenerate(3)
+
+    assert _messages(tmp_path) == {"small": 1, "large": 4}
+
+
+def test_rollup_reads_only_new_lines_and_drops_removed_subjects(tmp_path):
+    subjects = tmp_path / "subjects"
+    for name in ("lore", "maps"):
+        (subjects / name).mkdir(parents=True)
+    log = UsageLog(subjects)
+    metrics = {"prompt_tokens": 10, "tokens": 20, "ttft": 0.5, "duration": 2.0, "tokens_per_s": 10.0}
+    log.record("sage", "lore", "llama3", metrics)
+    log.record("sage", "maps", "llama3", metrics)
+    log.record("sage", "lore", "llama3", {}, cached=True)
+
+    rollup = UsageRollup(subjects, tmp_path / "rollup.json")
+    assert rollup.update() == 3
+    assert rollup.update() == 0
+    log.record("sage", "lore", "qwen", metrics)
+    assert UsageRollup(subjects, tmp_path / "rollup.json").update() == 1
+
+    rows = {row["subject"]: row for row in UsageRollup(subjects, tmp_path / "rollup.json").report()}
+    assert rows["lore"]["messages"] == 3
+    assert rows["lore"]["cached"] == 1
+    assert rows["lore"]["completion_tokens"] == 40
+    assert abs(rows["lore"]["ttft_p50"] - 0.5) < 0.5 * 0.05
+
+    rollup.update()
+    (subjects / "maps" / "usage.jsonl").unlink()
+    assert [row["subject"] for row in rollup.report()] == ["lore"]
+    saved = json.loads((tmp_path / "rollup.json").read_text(encoding="utf-8"))
+    assert list(saved["files"]) == ["lore"]